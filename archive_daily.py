@@ -0,0 +1,310 @@
+"""
+End-of-day compaction of collector output into compressed archives.
+
+The collector appends to {symbol}_{dte}DTE_{YYYYMMDD}.ndjson/.csv files all day and
+never touches them again. This job archives every finished day's files (dated before
+--before, by default today by the host's local date, as the collector dates its files)
+from <data_dir> into <archive_dir>:
+
+    parquet   NDJSON files become a typed, compressed Parquet file, with the column types
+              of --output_format parquet; CSV files, being untyped text, are compressed
+              as a stream
+    stream    every file is compressed as a stream, byte for byte
+
+--compression is zstd (default) or gzip, for Parquet pages and streams alike. Each
+archive is written under a temporary name and checked before it is renamed into place:
+its row count must match the source's, and a stream must decompress to exactly the
+source bytes. SHA-256 checksums of the source and the archive are kept with the row
+counts in <archive_dir>/manifest.json, which is also how reruns skip files that are
+already archived. --delete_source removes each source file once its archive is in the
+manifest, and only while the file still has the checksum recorded there.
+
+    python archive_daily.py data2
+    python archive_daily.py /data/spxdata --archive_dir /data/archive --format stream --delete_source --workers 4
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from parquet_sink import rows_to_batch, schema_for
+from reprocess import FILE_PATTERN, _normalize_date, file_date_today, find_files
+
+ARCHIVE_FORMATS = ('parquet', 'stream')
+COMPRESSIONS = ('zstd', 'gzip')
+STREAM_SUFFIXES = {'zstd': '.zst', 'gzip': '.gz'}
+MANIFEST_NAME = 'manifest.json'
+
+# NDJSON rows converted per Parquet row group
+BATCH_ROWS = 50000
+CHUNK_SIZE = 1 << 20
+
+
+def _open_stream(path: str, compression: str, mode: str):
+    """Binary file object compressing to (mode 'wb') or decompressing from (mode 'rb') path"""
+    if compression == 'gzip':
+        return gzip.open(path, mode)
+    import pyarrow as pa
+
+    if mode == 'wb':
+        return pa.CompressedOutputStream(path, 'zstd')
+    return pa.CompressedInputStream(pa.OSFile(path), 'zstd')
+
+
+def _sha256(stream) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    with open(path, 'rb') as f:
+        return _sha256(f)
+
+
+def count_rows(stream, file_format: str) -> int:
+    """Data rows in a binary NDJSON or CSV stream; a CSV header row is not counted"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace',
+                            newline='' if file_format == 'csv' else None)
+    if file_format == 'ndjson':
+        return sum(1 for line in text if line.strip())
+    records = csv.reader(text)
+    first = next(records, None)
+    if first is None:
+        return 0
+    return sum(1 for _ in records) + (0 if first[:1] == ['Time'] else 1)
+
+
+def _ndjson_rows(path: str) -> Iterator[Dict]:
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def archive_name(source_name: str, archive_format: str, compression: str) -> str:
+    stem, file_format = source_name.rsplit('.', 1)
+    if archive_format == 'parquet' and file_format == 'ndjson':
+        return f'{stem}.parquet'
+    return source_name + STREAM_SUFFIXES[compression]
+
+
+def _write_parquet(path: str, temp_path: str, compression: str) -> int:
+    """Convert an NDJSON file to Parquet; returns the rows in the written file"""
+    import pyarrow.parquet as pq
+
+    # Columns in order of first appearance, so files whose columns changed during the day keep all of them
+    columns = {}
+    for row in _ndjson_rows(path):
+        columns.update(dict.fromkeys(row))
+    schema = schema_for(list(columns))
+    with pq.ParquetWriter(temp_path, schema, compression=compression) as writer:
+        batch = []
+        for row in _ndjson_rows(path):
+            batch.append(row)
+            if len(batch) >= BATCH_ROWS:
+                writer.write_batch(rows_to_batch(batch, schema))
+                batch = []
+        if batch:
+            writer.write_batch(rows_to_batch(batch, schema))
+    parquet_file = pq.ParquetFile(temp_path)
+    if parquet_file.schema_arrow.names != list(columns):
+        raise ValueError(f"Parquet columns differ from the source's in {temp_path}")
+    return parquet_file.metadata.num_rows
+
+
+def _write_stream(path: str, temp_path: str, compression: str, file_format: str, source_sha256: str) -> int:
+    """Compress a file as a stream; returns the rows it decompresses to"""
+    with open(path, 'rb') as source, _open_stream(temp_path, compression, 'wb') as out:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            out.write(chunk)
+    with _open_stream(temp_path, compression, 'rb') as stream:
+        if _sha256(stream) != source_sha256:
+            raise ValueError(f"{temp_path} does not decompress to the source bytes")
+    with _open_stream(temp_path, compression, 'rb') as stream:
+        return count_rows(stream, file_format)
+
+
+def archive_file(path: str, archive_dir: str, archive_format: str = 'parquet',
+                 compression: str = 'zstd') -> Dict:
+    """Archive one output file into archive_dir, atomically; returns its manifest entry and timing"""
+    start = time.perf_counter()
+    name = os.path.basename(path)
+    file_format = FILE_PATTERN.match(name)['format']
+    source_bytes = os.path.getsize(path)
+    source_sha256 = file_sha256(path)
+    with open(path, 'rb') as f:
+        rows = count_rows(f, file_format)
+    entry = {
+        'source': name,
+        'source_bytes': source_bytes,
+        'source_sha256': source_sha256,
+        'rows': rows,
+        'format': archive_format,
+        'compression': compression,
+        'archive': None,
+        'archive_bytes': 0,
+        'archive_sha256': None,
+    }
+    # Files created for a day without data (e.g. a holiday) have nothing to archive
+    if rows == 0:
+        entry['seconds'] = round(time.perf_counter() - start, 3)
+        return entry
+
+    output_name = archive_name(name, archive_format, compression)
+    output_path = os.path.join(archive_dir, output_name)
+    temp_path = f'{output_path}.{os.getpid()}.tmp'
+    try:
+        if output_name.endswith('.parquet'):
+            written = _write_parquet(path, temp_path, compression)
+        else:
+            written = _write_stream(path, temp_path, compression, file_format, source_sha256)
+        if written != rows:
+            raise ValueError(f"Archive holds {written} rows, source {rows}")
+        entry.update(archive=output_name, archive_bytes=os.path.getsize(temp_path),
+                     archive_sha256=file_sha256(temp_path))
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    entry['seconds'] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def load_manifest(archive_dir: str) -> Dict[str, Dict]:
+    """Manifest entries by source file name; empty if there is no manifest yet"""
+    try:
+        with open(os.path.join(archive_dir, MANIFEST_NAME), 'r') as f:
+            return json.load(f)['files']
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(archive_dir: str, files: Dict[str, Dict]):
+    path = os.path.join(archive_dir, MANIFEST_NAME)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'files': dict(sorted(files.items()))}, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def is_archived(entry: Optional[Dict], path: str, archive_dir: str, archive_format: str,
+                compression: str) -> bool:
+    """Whether a manifest entry already covers the file at path as it is now"""
+    if not entry or entry['format'] != archive_format or entry['compression'] != compression:
+        return False
+    if entry['archive'] is not None and not os.path.exists(os.path.join(archive_dir, entry['archive'])):
+        return False
+    # Size first, as the cheap check; a file rewritten to the same size still needs archiving again
+    return entry['source_bytes'] == os.path.getsize(path) and entry['source_sha256'] == file_sha256(path)
+
+
+def delete_source(path: str, entry: Dict) -> bool:
+    """Delete a source file if it still has the checksum its manifest entry recorded"""
+    if file_sha256(path) != entry['source_sha256']:
+        print(f"Keeping {path}: it changed since it was archived", file=sys.stderr)
+        return False
+    os.remove(path)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact finished days of collector output into compressed archives")
+    parser.add_argument('data_dir', help='Directory of {symbol}_{dte}DTE_{date} output files')
+    parser.add_argument('--archive_dir', type=str, default=None,
+                        help='Directory for the archives and manifest.json (default: <data_dir>/archive)')
+    parser.add_argument('--before', type=_normalize_date, default=None,
+                        help='Archive files dated before this day, YYYYMMDD or YYYY-MM-DD (default: today by the '
+                             "host's local date, as the collector dates its files)")
+    parser.add_argument('--symbol', type=str, default=None,
+                        help='Only files for this symbol (default: all)')
+    parser.add_argument('--format', choices=ARCHIVE_FORMATS, default='parquet',
+                        help='parquet converts NDJSON to Parquet, stream compresses every file as is (default: parquet)')
+    parser.add_argument('--compression', choices=COMPRESSIONS, default='zstd',
+                        help='Codec for Parquet pages and compressed streams (default: zstd)')
+    parser.add_argument('--delete_source', action='store_true',
+                        help='Delete each source file once its archive is verified and in the manifest')
+    parser.add_argument('--force', action='store_true',
+                        help='Archive files again even if the manifest already covers them')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processes to spread files across (default: all cores)')
+    args = parser.parse_args()
+
+    if args.format == 'parquet' or args.compression == 'zstd':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("pyarrow is required for parquet and zstd archives; install it with pip install pyarrow "
+                         "or use --format stream --compression gzip")
+    archive_dir = args.archive_dir or os.path.join(args.data_dir, 'archive')
+    os.makedirs(archive_dir, exist_ok=True)
+    before = datetime.strptime(args.before or file_date_today(), '%Y%m%d')
+    last_day = (before - timedelta(days=1)).strftime('%Y%m%d')
+
+    manifest = load_manifest(archive_dir)
+    paths = []
+    skipped: List[str] = []
+    for path in find_files(args.data_dir, end=last_day, symbol=args.symbol):
+        if not args.force and is_archived(manifest.get(os.path.basename(path)), path, archive_dir,
+                                          args.format, args.compression):
+            skipped.append(path)
+        else:
+            paths.append(path)
+    if args.delete_source:
+        # Left behind by an earlier run that was stopped before deleting
+        for path in skipped:
+            delete_source(path, manifest[os.path.basename(path)])
+    if not paths:
+        print(f"Nothing to archive ({len(skipped)} files already archived)")
+        return
+
+    # Largest files first so one big file doesn't finish last on an otherwise idle pool
+    paths.sort(key=os.path.getsize, reverse=True)
+    start = time.perf_counter()
+    source_bytes = archive_bytes = failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(archive_file, path, archive_dir, args.format, args.compression): path
+                   for path in paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                entry = future.result()
+                seconds = entry.pop('seconds')
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(paths)}] Error archiving {path}: {str(e)}", file=sys.stderr)
+                continue
+            entry['archived_at'] = datetime.now().astimezone().strftime('%Y-%m-%dT%H:%M:%S%z')
+            manifest[entry['source']] = entry
+            save_manifest(archive_dir, manifest)
+            if args.delete_source:
+                delete_source(path, entry)
+            source_bytes += entry['source_bytes']
+            archive_bytes += entry['archive_bytes']
+            if entry['archive'] is None:
+                print(f"[{done}/{len(paths)}] {path}: no rows, nothing to archive")
+            else:
+                print(f"[{done}/{len(paths)}] {entry['archive']}: {entry['rows']} rows, "
+                      f"{entry['source_bytes']} -> {entry['archive_bytes']} bytes in {seconds}s")
+
+    seconds = time.perf_counter() - start
+    ratio = archive_bytes / source_bytes if source_bytes else 0.0
+    print(f"Archived {len(paths) - failed} files ({source_bytes} -> {archive_bytes} bytes, {ratio:.1%}) "
+          f"in {seconds:.1f}s{f', {failed} failed' if failed else ''}"
+          f"{f', {len(skipped)} already archived' if skipped else ''}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
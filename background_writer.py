@@ -0,0 +1,133 @@
+"""
+Background write stage for the collector.
+
+Processed snapshots are queued and written by a dedicated thread, so slow disks or bind
+mounts don't delay the next fetch. The queue is bounded; when it is full the policy
+decides what happens:
+
+    block        wait for the writer to catch up (no data is lost)
+    drop_oldest  discard the oldest queued write to make room
+    drop_newest  discard the write being submitted
+"""
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """Runs submitted write calls in order on a single writer thread"""
+
+    def __init__(self, max_pending: int = 64, policy: str = 'block', logger=None,
+                 name: str = 'output-writer'):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy '{policy}', expected one of {POLICIES}")
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.policy = policy
+        self.logger = logger
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.blocked_seconds = 0.0
+        self.max_depth = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._drain, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable, *args) -> bool:
+        """Queue fn(*args) for the writer thread; returns False if the write was dropped"""
+        if self._closed:
+            raise RuntimeError("BackgroundWriter is closed")
+        item = (fn, args)
+        if self.policy == 'block':
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                started = time.monotonic()
+                self._queue.put(item)
+                waited = time.monotonic() - started
+                with self._lock:
+                    self.blocked_seconds += waited
+                self._warn(f"Write queue full, waited {waited:.2f}s for the writer")
+        elif self.policy == 'drop_newest':
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._record_drop("Write queue full, dropped the newest write")
+                return False
+        else:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self._queue.task_done()
+                        self._record_drop("Write queue full, dropped the oldest queued write")
+                    except queue.Empty:
+                        pass
+
+        with self._lock:
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def flush(self):
+        """Block until every write submitted so far has completed"""
+        self._queue.join()
+
+    def close(self, timeout: Optional[float] = None):
+        """Write everything still queued, then stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive() and self.logger:
+            self.logger.error(f"Writer thread still busy after {timeout}s, {self._queue.qsize()} writes pending")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'written': self.written,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'pending': self._queue.qsize(),
+                'max_depth': self.max_depth,
+                'blocked_seconds': round(self.blocked_seconds, 3),
+            }
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                fn, args = item
+                try:
+                    fn(*args)
+                    with self._lock:
+                        self.written += 1
+                except Exception as e:
+                    with self._lock:
+                        self.errors += 1
+                    if self.logger:
+                        self.logger.error(f"Error writing data: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _record_drop(self, message: str):
+        with self._lock:
+            self.dropped += 1
+        self._warn(message)
+
+    def _warn(self, message: str):
+        if self.logger:
+            self.logger.warning(message)
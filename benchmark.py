@@ -0,0 +1,328 @@
+"""
+Micro-benchmarks for the collectors' hot paths on synthetic data.
+
+Synthetic Tradier payloads (option chains, quotes and 1-minute timesales) are generated
+with a configurable number of strikes, DTEs and missing quotes, so runs are repeatable
+and need no API key or network. Each case reports the best and median time over the
+repeats, throughput in contracts (or bars) per second and the peak memory allocated
+during one run, measured separately with tracemalloc.
+
+    python benchmark.py --strikes 400 --dtes 4 --missing_ratio 0.1
+    python benchmark.py --compare benchmarks/benchmark_20250102_093000.json
+    python benchmark.py --memory --memory_contracts 10000
+
+--memory also measures the peak memory allocated (with tracemalloc, from after the
+inputs are generated) while one cycle of chains is processed, held and encoded, once per
+representation of the processed snapshots (row dicts from either engine, and the
+vectorized engine's ContractTable), each in a fresh process so the peaks don't mix.
+
+Results are saved as JSON under benchmarks/. --compare prints the change of every case
+against an earlier result file and exits with status 1 if any case is slower by more
+than --threshold.
+"""
+import argparse
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import fetch_SPX_1min_data as minute_data
+from contracts import ContractTable
+from fetch_xDTE_prices_with_IB_calculations_V2 import ENGINES, MarketDataCollector
+from greeks import apply_local_greeks
+from ndjson_writer import encode_rows
+from strike_index import StrikeIndex
+from synthetic import synthetic_chain, synthetic_quotes, synthetic_timesales
+
+# Memory case -> (engine, whether the snapshots are turned into row dicts)
+MEMORY_CASES = {
+    'rows[python]': ('python', True),
+    'rows[vectorized]': ('vectorized', True),
+    'table[vectorized]': ('vectorized', False),
+}
+
+
+def measure(fn: Callable[[], object], items: int, repeat: int) -> Dict:
+    """Best/median seconds over repeat runs, items per second and peak traced memory"""
+    fn()  # warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    # Memory is traced in a separate run since tracemalloc slows allocation down
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'items': items,
+        'best_seconds': round(best, 6),
+        'median_seconds': round(statistics.median(times), 6),
+        'items_per_second': round(items / best, 1) if best > 0 else None,
+        'peak_memory_bytes': peak,
+    }
+
+
+def run_benchmarks(strikes: int = 200, dtes: int = 4, missing_ratio: float = 0.05,
+                   repeat: int = 10, seed: int = 0) -> Dict[str, Dict]:
+    output_dir = tempfile.mkdtemp(prefix='benchmark_')
+    collector = MarketDataCollector('benchmark', max_dte=dtes - 1, output_dir=output_dir,
+                                    check_market_hours=False, write_queue_size=0,
+                                    expiration_source='probe', metrics_dir=None)
+    collector.logger.setLevel(logging.WARNING)
+    minute_data.logger.setLevel(logging.WARNING)
+
+    today = date.today()
+    market_data = synthetic_quotes(collector.symbol)
+    chains = [(dte, today + timedelta(days=dte),
+               synthetic_chain(strikes, missing_ratio=missing_ratio,
+                               expiration=today + timedelta(days=dte), seed=seed + dte))
+              for dte in range(dtes)]
+    contracts = sum(len(chain) for _, _, chain in chains)
+    results = {}
+
+    def process_all():
+        return [collector.process_options_data(chain, market_data, expiration)
+                for _, expiration, chain in chains]
+
+    for engine in ENGINES:
+        collector.engine = engine
+        results[f'process_options_data[{engine}]'] = measure(process_all, contracts, repeat)
+    collector.engine = 'vectorized'
+    tables = process_all()
+    collector.engine = 'python'
+    rows = process_all()
+
+    # Leg lookups over every strike of the first chain
+    _, _, chain = chains[0]
+    option_buffer = {}
+    for option in chain:
+        bid = option['bid'] or 0
+        ask = option['ask'] or 0
+        mid = round((bid + ask) / 2, 2) if bid > 0 or ask > 0 else 0
+        option_buffer.setdefault(float(option['strike']), {'put': None, 'call': None})[option['option_type']] = mid
+    strike_index = StrikeIndex.from_buffer(option_buffer)
+    chain_strikes = list(option_buffer)
+
+    def ib_values():
+        return [collector.calculate_ib_value(strike_index, strike, 20) for strike in chain_strikes]
+
+    def spread_values():
+        return [collector.calculate_spread_value(strike_index, strike, 20, option_type)
+                for strike in chain_strikes for option_type in ('call', 'put')]
+
+    results['calculate_ib_value'] = measure(ib_values, len(chain_strikes), repeat)
+    results['calculate_spread_value'] = measure(spread_values, 2 * len(chain_strikes), repeat)
+
+    def save_with(save, snapshots):
+        def run():
+            for (dte, _, _), data in zip(chains, snapshots):
+                save(data, dte, today)
+        return run
+
+    results['save_data'] = measure(save_with(collector.save_data, rows), contracts, repeat)
+    results['save_data_csv'] = measure(save_with(collector.save_data_csv, rows), contracts, repeat)
+    results['save_data[table]'] = measure(save_with(collector.save_data, tables), contracts, repeat)
+    results['save_data_csv[table]'] = measure(save_with(collector.save_data_csv, tables), contracts, repeat)
+
+    def local_greeks():
+        as_of = datetime.now().astimezone()
+        price = float(market_data[collector.symbol]['last'])
+        return [apply_local_greeks(data, price, expiration, as_of, collector.risk_free_rate)
+                for (_, expiration, _), data in zip(chains, rows)]
+
+    results['apply_local_greeks'] = measure(local_greeks, contracts, repeat)
+
+    bars = synthetic_timesales(seed=seed)
+    results['process_market_data'] = measure(lambda: minute_data.process_market_data(bars, 'SPX'),
+                                             len(bars), repeat)
+    frame = minute_data.process_market_data(bars, 'SPX')
+    results['is_complete_trading_day'] = measure(lambda: minute_data.is_complete_trading_day(frame, '2025-01-02'),
+                                                 len(frame), repeat)
+
+    collector.close()
+    for name in os.listdir(output_dir):
+        os.remove(os.path.join(output_dir, name))
+    os.rmdir(output_dir)
+    return results
+
+
+def memory_case(engine: str, as_rows: bool, contracts: int = 10000, dtes: int = 4,
+                missing_ratio: float = 0.05, seed: int = 0) -> Dict:
+    """Peak memory allocated while one cycle's chains are processed, held and encoded; run in a fresh process"""
+    output_dir = tempfile.mkdtemp(prefix='benchmark_')
+    collector = MarketDataCollector('benchmark', max_dte=dtes - 1, output_dir=output_dir,
+                                    check_market_hours=False, write_queue_size=0,
+                                    expiration_source='probe', metrics_dir=None, engine=engine)
+    collector.logger.setLevel(logging.WARNING)
+
+    today = date.today()
+    strikes = max(1, contracts // (2 * dtes))
+    market_data = synthetic_quotes(collector.symbol)
+    chains = [(today + timedelta(days=dte),
+               synthetic_chain(strikes, missing_ratio=missing_ratio,
+                               expiration=today + timedelta(days=dte), seed=seed + dte))
+              for dte in range(dtes)]
+    gc.collect()
+
+    # Traced from here, so only what the cycle allocates counts, not the inputs or imports.
+    # Snapshots stay alive together, as they do while queued for the writer thread
+    tracemalloc.start()
+    try:
+        snapshots = []
+        for expiration, chain in chains:
+            data = collector.process_options_data(chain, market_data, expiration)
+            if as_rows and isinstance(data, ContractTable):
+                data = data.to_rows()
+            snapshots.append(data)
+        encoded = sum(len(encode_rows(data)) for data in snapshots)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rows = sum(len(data) for data in snapshots)
+
+    collector.close()
+    for name in os.listdir(output_dir):
+        os.remove(os.path.join(output_dir, name))
+    os.rmdir(output_dir)
+    return {
+        'contracts': rows,
+        'encoded_bytes': encoded,
+        'peak_memory_bytes': peak,
+        'peak_memory_bytes_per_10k': round(peak * 10000 / rows) if rows else None,
+    }
+
+
+def run_memory_benchmarks(contracts: int = 10000, dtes: int = 4, missing_ratio: float = 0.05,
+                          seed: int = 0) -> Dict[str, Dict]:
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for case, (engine, as_rows) in MEMORY_CASES.items():
+        with context.Pool(1) as pool:
+            results[case] = pool.apply(memory_case, (engine, as_rows, contracts, dtes, missing_ratio, seed))
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: Dict[str, Dict]):
+    print(f"{'case':<34}{'best ms':>10}{'median ms':>11}{'items/s':>13}{'peak KiB':>11}")
+    for case, result in results.items():
+        rate = result['items_per_second']
+        print(f"{case:<34}{result['best_seconds'] * 1000:>10.2f}{result['median_seconds'] * 1000:>11.2f}"
+              f"{rate if rate is not None else 0:>13,.0f}{result['peak_memory_bytes'] / 1024:>11,.0f}")
+
+
+def print_memory_results(results: Dict[str, Dict]):
+    print(f"{'memory case':<34}{'contracts':>10}{'peak MiB':>14}{'MiB per 10k':>13}")
+    for case, result in results.items():
+        per_10k = result['peak_memory_bytes_per_10k'] or 0
+        print(f"{case:<34}{result['contracts']:>10,}{result['peak_memory_bytes'] / 2 ** 20:>14.1f}"
+              f"{per_10k / 2 ** 20:>13.1f}")
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Print the change of each case against a baseline; returns the cases that regressed"""
+    regressions = []
+    print(f"{'case':<34}{'before ms':>11}{'after ms':>10}{'change':>9}{'memory':>9}")
+    for case, result in results.items():
+        before = baseline.get(case)
+        if before is None:
+            print(f"{case:<34}{'-':>11}{result['best_seconds'] * 1000:>10.2f}{'new':>9}")
+            continue
+        change = result['best_seconds'] / before['best_seconds'] - 1 if before['best_seconds'] else 0.0
+        memory = (result['peak_memory_bytes'] / before['peak_memory_bytes'] - 1
+                  if before['peak_memory_bytes'] else 0.0)
+        flag = ''
+        if change > threshold:
+            regressions.append(case)
+            flag = '  REGRESSION'
+        print(f"{case:<34}{before['best_seconds'] * 1000:>11.2f}{result['best_seconds'] * 1000:>10.2f}"
+              f"{change:>+9.1%}{memory:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the collectors on synthetic Tradier data')
+    parser.add_argument('--strikes', type=int, default=200,
+                        help='Strikes per expiration, each with a call and a put (default: 200)')
+    parser.add_argument('--dtes', type=int, default=4,
+                        help='Number of expirations processed per cycle (default: 4)')
+    parser.add_argument('--missing_ratio', type=float, default=0.05,
+                        help='Fraction of contracts without a bid/ask quote or greeks (default: 0.05)')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Timed runs per case (default: 10)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for the synthetic data (default: 0)')
+    parser.add_argument('--output_dir', type=str, default='benchmarks',
+                        help='Directory for the JSON result files (default: benchmarks)')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Earlier result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Slowdown counted as a regression with --compare (default: 0.10)')
+    parser.add_argument('--memory', action='store_true',
+                        help='Also measure peak memory per representation of processed snapshots')
+    parser.add_argument('--memory_contracts', type=int, default=10000,
+                        help='Contracts per cycle in the memory cases (default: 10000)')
+    args = parser.parse_args()
+
+    parameters = {'strikes': args.strikes, 'dtes': args.dtes, 'missing_ratio': args.missing_ratio,
+                  'repeat': args.repeat, 'seed': args.seed}
+    results = run_benchmarks(**parameters)
+    print_results(results)
+    memory = {}
+    if args.memory:
+        memory = run_memory_benchmarks(args.memory_contracts, args.dtes, args.missing_ratio, args.seed)
+        print()
+        print_memory_results(memory)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump({
+            'time': datetime.now().astimezone().strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': parameters,
+            'results': results,
+            'memory': memory,
+        }, f, indent=2)
+    print(f"Saved results to {path}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != parameters:
+            print(f"Warning: {args.compare} was run with different parameters: {baseline.get('parameters')}")
+        print()
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"Regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,4 +16,4 @@ docker run -d \
   -v /mnt/c/code/spx-options-data:/app \
   -v /data/web_log_upload/spxdata:/data/spxdata \
   spx_collector \
-  python "/app/fetch_xDTE_prices_with_IB_calculations_V2.py" --symbol SPX --dte_days 7 --output_dir /data/spxdata --check_market_hours
\ No newline at end of file
+  python "/app/fetch_xDTE_prices_with_IB_calculations_V2.py" --symbol SPX --dte_days 7 --output_dir /data/spxdata --check_market_hours --fetch_concurrency 8
\ No newline at end of file
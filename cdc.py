@@ -0,0 +1,197 @@
+"""
+Change-data-capture storage for option snapshots.
+
+Instead of every contract every cycle, each (symbol, DTE) stream is written as
+
+    keyframes  every contract, every keyframe_interval snapshots and at the start of a day
+    deltas     only the contracts whose quote, greeks, ATM flag or strategy values changed,
+               plus the ATM rows so every snapshot has at least one row
+
+Rows carry a 'Frame' field, 'K' or 'D'. Delta rows are complete rows, so Time, Price and
+the VIX fields of a snapshot are always available from its rows. Quote metadata (sizes,
+quote dates and exchanges) changes constantly without the quote moving and is not tracked:
+in a rebuilt snapshot it is as of the contract's last written row.
+
+Run this module to rebuild full snapshots from a CDC file:
+
+    python cdc.py data2/SPX_0DTE_20250102.ndjson --at 2025-01-02T10:30:00-0500
+    python cdc.py data2/SPX_0DTE_20250102.ndjson --output SPX_0DTE_20250102_full.ndjson
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from contracts import ContractTable, Rows, column_names, column_values
+
+# Same for every row of a snapshot, or derived from those; never a reason to write a row
+SNAPSHOT_FIELDS = ('Time', 'Symbol', 'Price', 'VIX', 'VIX1D', 'Intrinsic Value', 'Extrinsic Value',
+                   'Frame')
+# Change without the quote itself changing
+QUOTE_METADATA_FIELDS = ('Bid Size', 'Bid Exchange', 'Bid Date', 'Ask Size', 'Ask Exchange', 'Ask Date')
+
+KEYFRAME = 'K'
+DELTA = 'D'
+
+
+class CdcEncoder:
+    """Turns full snapshots into keyframe/delta row sets, keeping state per stream"""
+
+    def __init__(self, keyframe_interval: int = 20):
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1")
+        self.keyframe_interval = keyframe_interval
+        self._streams: Dict[tuple, dict] = {}
+        self.rows_in = 0
+        self.rows_out = 0
+
+    def reset(self):
+        """Drop all state so every stream starts with a keyframe, e.g. for a new day's files"""
+        self._streams.clear()
+
+    def encode(self, rows: Rows, stream) -> Rows:
+        """Rows to store for one snapshot of a stream such as (symbol, dte)"""
+        if not rows:
+            return rows
+        tracked = [key for key in column_names(rows)
+                   if key not in SNAPSHOT_FIELDS and key not in QUOTE_METADATA_FIELDS]
+        options = column_values(rows, 'Option')
+        signatures = dict(zip(options, zip(*[column_values(rows, key) for key in tracked])))
+
+        state = self._streams.get(stream)
+        keyframe = (state is None
+                    or state['since_keyframe'] + 1 >= self.keyframe_interval
+                    or state['tracked'] != tracked
+                    # Contracts can only be removed by a keyframe, and keys must be unique
+                    or len(signatures) != len(rows)
+                    or not state['signatures'].keys() <= signatures.keys())
+
+        if keyframe:
+            output = _tag(rows, range(len(rows)), KEYFRAME)
+            self._streams[stream] = {'since_keyframe': 0, 'tracked': tracked, 'signatures': signatures}
+        else:
+            previous = state['signatures']
+            atm = column_values(rows, 'ATM')
+            changed = [i for i, option in enumerate(options)
+                       if atm[i] == 1 or previous.get(option) != signatures[option]]
+            output = _tag(rows, changed, DELTA)
+            state['since_keyframe'] += 1
+            state['signatures'] = signatures
+
+        self.rows_in += len(rows)
+        self.rows_out += len(output)
+        return output
+
+    def stats(self) -> dict:
+        ratio = self.rows_out / self.rows_in if self.rows_in else 0.0
+        return {'rows_in': self.rows_in, 'rows_out': self.rows_out, 'ratio': round(ratio, 3)}
+
+
+def _tag(rows: Rows, index: Sequence[int], frame: str) -> Rows:
+    """The rows at index, in order, with their Frame field set"""
+    if isinstance(rows, ContractTable):
+        selected = rows if len(index) == len(rows) else rows.take(index)
+        return selected.with_column('Frame', [frame] * len(selected))
+    return [dict(rows[i], Frame=frame) for i in index]
+
+
+def _refresh(row: Dict, snapshot: Dict) -> Dict:
+    """Carry an unchanged contract's row forward into a later snapshot"""
+    row = dict(row)
+    for key in ('Time', 'Price', 'VIX', 'VIX1D'):
+        row[key] = snapshot[key]
+    price = snapshot['Price']
+    strike = row['Strike Price']
+    try:
+        intrinsic_value = max(0, price - strike) if row['Type'].lower() == 'call' else max(0, strike - price)
+        mid_price = row['Mid'] if isinstance(row['Mid'], (int, float)) else 0
+        extrinsic_value = max(0, mid_price - intrinsic_value)
+    except (AttributeError, TypeError, ValueError):
+        intrinsic_value = 0
+        extrinsic_value = 0
+    row['Intrinsic Value'] = round(intrinsic_value, 2)
+    row['Extrinsic Value'] = round(extrinsic_value, 2)
+    return row
+
+
+def _frames(rows: Iterable[Dict]) -> Iterator[List[Dict]]:
+    """Group stored rows into snapshots by their Time field"""
+    frame = []
+    for row in rows:
+        if frame and row['Time'] != frame[0]['Time']:
+            yield frame
+            frame = []
+        frame.append(row)
+    if frame:
+        yield frame
+
+
+def rebuild(rows: Iterable[Dict]) -> Iterator[Tuple[str, List[Dict]]]:
+    """Yield (time, full rows) for every snapshot of a stored stream, CDC or not"""
+    state: Dict[str, Dict] = {}
+    for frame in _frames(rows):
+        if frame[0].get('Frame', KEYFRAME) == KEYFRAME:
+            state = {}
+        else:
+            snapshot = frame[0]
+            state = {option: _refresh(row, snapshot) for option, row in state.items()}
+        for row in frame:
+            row = dict(row)
+            row.pop('Frame', None)
+            state[row['Option']] = row
+        yield frame[0]['Time'], list(state.values())
+
+
+def read_rows(path: str) -> Iterator[Dict]:
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def snapshot_at(path: str, at: str) -> Optional[Tuple[str, List[Dict]]]:
+    """The latest snapshot at or before the timestamp 'at' (ISO 8601 with UTC offset)"""
+    target = _parse_time(at)
+    latest = None
+    for time, rows in rebuild(read_rows(path)):
+        if _parse_time(time) > target:
+            break
+        latest = (time, rows)
+    return latest
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild full option snapshots from a CDC NDJSON file')
+    parser.add_argument('path', help='NDJSON file written with --storage_mode cdc')
+    parser.add_argument('--at', type=str, default=None,
+                        help='Only the snapshot in effect at this time, e.g. 2025-01-02T10:30:00-0500')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write the rebuilt rows to this file (default: stdout)')
+    args = parser.parse_args()
+
+    if args.at:
+        snapshot = snapshot_at(args.path, args.at)
+        if snapshot is None:
+            print(f"No snapshot at or before {args.at}", file=sys.stderr)
+            sys.exit(1)
+        snapshots = [snapshot]
+    else:
+        snapshots = rebuild(read_rows(args.path))
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for _, rows in snapshots:
+            for row in rows:
+                out.write(json.dumps(row) + '\n')
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
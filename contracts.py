@@ -0,0 +1,84 @@
+"""
+Compact, column-oriented storage for the processed contracts of one snapshot.
+
+A snapshot used to be a list of row dicts, one 55-entry dict per contract, built from
+the parsed columns only to be taken apart again column by column by the writers. A
+ContractTable keeps the columns instead: one list per output column, in output order,
+shared by the engine that builds them, local greeks, CDC encoding and the NDJSON,
+CSV and Parquet writers without building a dict per contract.
+
+The table also behaves like the list of rows it replaces (len, truthiness, indexing
+and iteration yield row dicts, built on demand), so code that only needs a few rows
+keeps working. column_names and column_values read either form.
+"""
+from typing import Dict, Iterator, List, Sequence, Union
+
+
+class ContractTable:
+    """Processed contracts of one snapshot, stored as one list per output column"""
+
+    __slots__ = ('columns', 'length')
+
+    def __init__(self, columns: Dict[str, list]):
+        self.columns = columns
+        self.length = len(next(iter(columns.values()))) if columns else 0
+        if any(len(values) != self.length for values in columns.values()):
+            raise ValueError("All columns of a ContractTable must have the same length")
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict]) -> 'ContractTable':
+        """Table of row dicts that all have the keys of the first row"""
+        if not rows:
+            return cls({})
+        return cls({key: [row.get(key) for row in rows] for key in rows[0]})
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[Dict]:
+        keys = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield dict(zip(keys, values))
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("ContractTable index out of range")
+        return {key: values[index] for key, values in self.columns.items()}
+
+    def keys(self) -> List[str]:
+        return list(self.columns)
+
+    def column(self, name: str) -> list:
+        return self.columns[name]
+
+    def take(self, index: Sequence[int]) -> 'ContractTable':
+        """Table of the rows at the given positions, in that order"""
+        return ContractTable({key: [values[i] for i in index] for key, values in self.columns.items()})
+
+    def with_column(self, name: str, values: list) -> 'ContractTable':
+        """Table sharing this one's columns, with name added at the end or replaced in place"""
+        columns = dict(self.columns)
+        columns[name] = values
+        return ContractTable(columns)
+
+    def to_rows(self) -> List[Dict]:
+        return list(self)
+
+
+Rows = Union[ContractTable, List[Dict]]
+
+
+def column_names(rows: Rows) -> List[str]:
+    """Columns of a table, or the keys of the first of a list of row dicts"""
+    if isinstance(rows, ContractTable):
+        return rows.keys()
+    return list(rows[0]) if rows else []
+
+
+def column_values(rows: Rows, name: str) -> list:
+    """One column of a table or a list of row dicts, None where a row lacks it"""
+    if isinstance(rows, ContractTable):
+        return rows.columns.get(name, [None] * len(rows))
+    return [row.get(name) for row in rows]
@@ -0,0 +1,126 @@
+"""
+Cached option expiration discovery.
+
+The listed expirations for a symbol are fetched from the Tradier expirations endpoint at
+most once per day and persisted to disk, so a restarted collector doesn't need to ask
+again. The collector then polls only real expiries within its DTE horizon instead of
+probing date.today() + dte, which returns nothing on weekends, holidays and non-expiry
+days.
+
+DTE is measured either in calendar days or in trading sessions: a trading DTE counts the
+sessions after today up to and including the expiration, so a Monday expiry is 1 DTE on
+the Friday before.
+"""
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from market_calendar import default_calendar
+
+DTE_MODES = ('calendar', 'trading')
+
+
+def trading_sessions(start: date, end: date) -> List[date]:
+    """NYSE sessions from start to end inclusive"""
+    return default_calendar().sessions_between(start, end)
+
+
+def select_expirations(expirations: List[date], today: date, max_dte: int,
+                       dte_mode: str = 'calendar') -> List[Tuple[int, date]]:
+    """(dte, expiration) for every expiration from today within max_dte, in date order"""
+    if dte_mode not in DTE_MODES:
+        raise ValueError(f"Unknown DTE mode '{dte_mode}', expected one of {DTE_MODES}")
+    upcoming = sorted(expiration for expiration in expirations if expiration >= today)
+    if dte_mode == 'calendar':
+        return [((expiration - today).days, expiration) for expiration in upcoming
+                if (expiration - today).days <= max_dte]
+
+    if not upcoming:
+        return []
+    # Enough calendar days to cover max_dte sessions through weekends and holidays
+    sessions = trading_sessions(today + timedelta(days=1), today + timedelta(days=max_dte * 2 + 10))
+    selected = []
+    for expiration in upcoming:
+        dte = sum(1 for session in sessions if session <= expiration)
+        if dte > max_dte:
+            break
+        selected.append((dte, expiration))
+    return selected
+
+
+class ExpirationCache:
+    """Listed expirations for one symbol, refreshed once per day and kept on disk"""
+
+    def __init__(self, client, symbol: str, cache_dir: str = 'cache', logger=None):
+        self.client = client
+        self.symbol = symbol
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.path = os.path.join(cache_dir, f'expirations_{symbol}.json')
+        self._fetched = None
+        self._expirations: List[date] = []
+
+    def expirations(self, today: Optional[date] = None) -> Optional[List[date]]:
+        """Listed expirations, or None if they couldn't be fetched and nothing is cached"""
+        today = today or date.today()
+        if self._fetched != today:
+            self._load()
+        if self._fetched != today:
+            self.refresh(today)
+        return self._expirations if self._fetched is not None else None
+
+    def refresh(self, today: Optional[date] = None):
+        """Fetch the expiration list now; keeps the previous list if the request fails"""
+        today = today or date.today()
+        try:
+            response = self.client.get('options/expirations',
+                                       params={'symbol': self.symbol, 'includeAllRoots': 'true'})
+            response.raise_for_status()
+            self._expirations = self._parse(response.json())
+            self._fetched = today
+            self._save()
+            if self.logger:
+                self.logger.info(f"Loaded {len(self._expirations)} {self.symbol} expirations from the API")
+        except Exception as e:
+            if self.logger:
+                stale = f" (using the list from {self._fetched})" if self._fetched else ""
+                self.logger.warning(f"Error fetching {self.symbol} expirations: {str(e)}{stale}")
+
+    def within(self, max_dte: int, dte_mode: str = 'calendar',
+               today: Optional[date] = None) -> Optional[List[Tuple[int, date]]]:
+        """(dte, expiration) pairs to poll, or None when no expiration list is available"""
+        today = today or date.today()
+        expirations = self.expirations(today)
+        if expirations is None:
+            return None
+        return select_expirations(expirations, today, max_dte, dte_mode)
+
+    @staticmethod
+    def _parse(data) -> List[date]:
+        expirations = (data or {}).get('expirations') or {}
+        dates = expirations.get('date') or []
+        if isinstance(dates, str):  # a single expiration isn't wrapped in a list
+            dates = [dates]
+        return sorted(datetime.strptime(value, '%Y-%m-%d').date() for value in dates)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                cached = json.load(f)
+            self._fetched = datetime.strptime(cached['fetched'], '%Y-%m-%d').date()
+            self._expirations = [datetime.strptime(value, '%Y-%m-%d').date() for value in cached['dates']]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            if self.logger:
+                self.logger.warning(f"Ignoring unreadable expiration cache {self.path}: {str(e)}")
+
+    def _save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Per-process temp file; several collectors may share the cache directory
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'symbol': self.symbol, 'fetched': self._fetched.strftime('%Y-%m-%d'),
+                       'dates': [value.strftime('%Y-%m-%d') for value in self._expirations]}, f)
+        os.replace(temp_path, self.path)
@@ -1,5 +1,6 @@
-import pandas_market_calendars as mcal
 import requests
+from tradier_client import TradierClient, BASE_URL
+from market_calendar import default_calendar
 import logging
 from datetime import datetime, timedelta
 import pytz
@@ -35,8 +36,6 @@ logger.addHandler(console_handler)
 
 # Configuration
 
-BASE_URL = 'https://api.tradier.com/v1/markets'
-
 SYMBOLS = {
     'SPX': 'S&P 500 Index',
     'VIX': 'Volatility Index',
@@ -46,8 +45,11 @@ SYMBOLS = {
 # Add this at the top of the script, after the imports
 def load_api_key() -> str:
     """
-    Load API key from .api_key file in the script's directory
+    Load API key from the TRADIER_API_KEY environment variable or .api_key file in the script's directory
     """
+    if os.environ.get('TRADIER_API_KEY'):
+        return os.environ['TRADIER_API_KEY'].strip()
+    
     try:
         # Get the directory where the script is located
         script_dir = Path(__file__).parent.absolute()
@@ -69,12 +71,20 @@ def load_api_key() -> str:
         logger.error(f"Error reading API key: {e}")
         raise
 
-# Replace the API_KEY constant with this
-try:
-    API_KEY = load_api_key()
-except Exception as e:
-    logger.error("Failed to load API key. Exiting.")
-    exit(1)
+# Shared keep-alive session for all timesales requests, created on first use so the
+# processing functions can be imported without an API key
+_client = None
+
+def get_client() -> TradierClient:
+    global _client
+    if _client is None:
+        try:
+            api_key = load_api_key()
+        except Exception as e:
+            logger.error("Failed to load API key. Exiting.")
+            exit(1)
+        _client = TradierClient(api_key, base_url=BASE_URL)
+    return _client
     
 def is_complete_trading_day(df: pd.DataFrame, date: str) -> bool:
     """
@@ -119,12 +129,7 @@ def fetch_market_data(symbol: str, start_date: str, end_date: str) -> List[Dict]
             'session_filter': 'all'
         }
         
-        response = requests.get(
-            f'{BASE_URL}/timesales',
-            params=params,
-            headers={'Authorization': f'Bearer {API_KEY}', 'Accept': 'application/json'},
-            timeout=30
-        )
+        response = get_client().get('timesales', params=params)
         
         response.raise_for_status()
         data = response.json()
@@ -222,28 +227,21 @@ def is_trading_day(date: datetime) -> bool:
     """
     Check if the given date is a trading day
     """
-    nyse = mcal.get_calendar('NYSE')
-    schedule = nyse.schedule(start_date=date.date(), end_date=date.date())
-    return len(schedule) > 0
+    return default_calendar(logger).is_session(date.date())
 
 def get_last_trading_day() -> datetime:
     """
     Get the most recent trading day
     """
-    nyse = mcal.get_calendar('NYSE')
     et_tz = pytz.timezone('US/Eastern')
     current_date = datetime.now(et_tz)
     
-    # Get the last 10 trading days (more than enough to find the last one)
-    schedule = nyse.schedule(
-        start_date=current_date - timedelta(days=10),
-        end_date=current_date
-    )
+    last_session = default_calendar(logger).last_session(current_date.date())
     
-    if schedule.empty:
+    if last_session is None:
         raise ValueError("Could not find recent trading day")
         
-    return schedule.index[-1].to_pydatetime().replace(tzinfo=et_tz)
+    return datetime.combine(last_session, datetime.min.time()).replace(tzinfo=et_tz)
 
 def get_trading_dates_range(days_window: int) -> tuple[str, str]:
     """
@@ -261,20 +259,14 @@ def get_trading_dates_range(days_window: int) -> tuple[str, str]:
         current_date = get_last_trading_day()
         logger.info(f"Current date is not a trading day. Using last trading day: {current_date.date()}")
     
-    nyse = mcal.get_calendar('NYSE')
-    
     if days_window == 0:
         # Just get the single trading day
         date_str = current_date.strftime('%Y-%m-%d')
         start_time = f"{date_str} 09:30"
         end_time = f"{date_str} 16:15"
     else:
-        # Get schedule for a larger window to ensure we have enough trading days
-        calendar_days = min(days_window * 2, 30)  # Double the days to account for weekends/holidays
-        start_date = current_date - timedelta(days=calendar_days)
-        
-        schedule = nyse.schedule(start_date=start_date, end_date=current_date)
-        trading_days = schedule.index[-days_window:] if len(schedule) >= days_window else schedule.index
+        # The last days_window sessions up to and including the current date
+        trading_days = default_calendar(logger).recent_sessions(current_date.date(), days_window)
         
         if len(trading_days) == 0:
             raise ValueError("No trading days found in the specified range")
@@ -363,9 +355,13 @@ def main():
     # Create a specific directory for this run
     output_dir = args.output_dir
     
+    client = get_client()
+    
     try:
         fetch_all_available_data(output_dir, args.days)
         logger.info("Successfully processed all market data")
+        logger.info(f"API client stats: {client.stats.summary()}")
+        logger.info(f"Rate limit headroom: {client.headroom()}")
     except Exception as e:
         logger.error(f"Error processing market data: {e}")
 
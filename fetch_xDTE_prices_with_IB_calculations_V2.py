@@ -8,9 +8,44 @@ import os
 import pytz
 import csv
 import json
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tradier_client import TradierClient, BASE_URL
+from rate_limiter import RateLimiter
+from vectorized import build_option_rows
+from contracts import ContractTable
+from strike_index import StrikeIndex
+from strategies import DEFAULT_STRATEGIES, compute_strategy_columns, load_strategies, output_columns
+from parquet_sink import ParquetSink
+from ndjson_writer import encode_rows
+from background_writer import BackgroundWriter, POLICIES as WRITE_POLICIES
+from scheduler import AlignedScheduler, parse_grid, POLICIES as SCHEDULE_POLICIES
+from cdc import CdcEncoder
+from expirations import ExpirationCache, DTE_MODES
+from market_calendar import default_calendar
+from metrics import Metrics
+from recorder import FrameRecorder, frame_chains, frame_time, read_frames
+from streaming import ChainState, TradierStream
+from greeks import GREEKS_SOURCES, apply_local_greeks
+from log_utils import LEVELS as LOG_LEVELS, Sampler, install_queue_logging, stop_queue_logging
+
+ENGINES = ('python', 'vectorized')
+OUTPUT_FORMATS = ('ndjson', 'parquet', 'both')
+STORAGE_MODES = ('full', 'cdc')
+EXPIRATION_SOURCES = ('api', 'probe')
+MODES = ('poll', 'stream')
+
+# Row Time has whole-second resolution, so streamed snapshots are at least this far apart
+MIN_SNAPSHOT_GAP = 1.0
+# Longest sleep between on_idle calls while waiting for the market to open
+IDLE_HEARTBEAT = 10.0
 
 def load_api_key():
-    """Load API key from .api_key file in script directory"""
+    """Load API key from the TRADIER_API_KEY environment variable or .api_key file in script directory"""
+    if os.environ.get('TRADIER_API_KEY'):
+        return os.environ['TRADIER_API_KEY'].strip()
     script_dir = os.path.dirname(os.path.abspath(__file__))
     api_key_path = os.path.join(script_dir, '.api_key')
     
@@ -23,35 +58,137 @@ def load_api_key():
         raise Exception(f"Error reading API key: {str(e)}")
 
 class MarketDataCollector:
-    def __init__(self, api_key, symbol='SPX', max_dte=3, output_dir='data', check_market_hours=True):
+    def __init__(self, api_key, symbol='SPX', max_dte=3, output_dir='data', check_market_hours=True,
+                 fetch_concurrency=1, engine='python', strike_tolerance=0.0, strategies=None,
+                 output_format='ndjson', parquet_snapshots_per_file=120,
+                 write_queue_size=64, write_policy='block', schedule_period=25.0, schedule_grid=None,
+                 schedule_policy='skip', storage_mode='full', keyframe_interval=20,
+                 expiration_source='api', dte_mode='calendar', requests_per_minute=120,
+                 metrics_dir='metrics', metrics_port=0, base_url=None, record_dir=None,
+                 mode='poll', snapshot_interval=5.0, move_threshold=0.0, stream_strike_range=100.0,
+                 chain_refresh=300.0, greeks='api', risk_free_rate=0.04, dividend_yield=0.0,
+                 log_level='INFO', log_sample=100, log_dir='logs', log_tag=None, symbols=None, dtes=None,
+                 on_cycle=None, on_idle=None, shared_budget=None):
         self.api_key = api_key
-        self.symbol = symbol
+        # Every underlying collected by this process; symbol is the first, used by default
+        symbols = symbols or (list(dtes) if dtes else None)
+        self.symbols = list(dict.fromkeys(symbols)) if symbols else [symbol]
+        self.symbol = self.symbols[0]
+        # Optional {symbol: DTEs} restricting which expirations this collector owns, e.g. a
+        # supervisor worker's share; None collects every DTE up to max_dte
+        self.dtes = {symbol: set(values) for symbol, values in dtes.items()} if dtes else None
+        # Called after every completed cycle, e.g. to report a heartbeat, and while the
+        # market is closed at least every IDLE_HEARTBEAT seconds of the sleep
+        self.on_cycle = on_cycle
+        self.on_idle = on_idle
         self.max_dte = max_dte
         self.output_dir = output_dir
         self.check_market_hours = check_market_hours
-        self.headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Accept': 'application/json'
-        }
-        self.base_url = 'https://api.tradier.com/v1/markets'
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        self.engine = engine
+        self.strike_tolerance = strike_tolerance
+        self.strategies = DEFAULT_STRATEGIES if strategies is None else strategies
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}', expected one of {OUTPUT_FORMATS}")
+        self.output_format = output_format
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode '{storage_mode}', expected one of {STORAGE_MODES}")
+        # In cdc mode only changed contracts are written between periodic full keyframes
+        self.cdc = CdcEncoder(keyframe_interval) if storage_mode == 'cdc' else None
+        if expiration_source not in EXPIRATION_SOURCES:
+            raise ValueError(f"Unknown expiration source '{expiration_source}', expected one of {EXPIRATION_SOURCES}")
+        if dte_mode not in DTE_MODES:
+            raise ValueError(f"Unknown DTE mode '{dte_mode}', expected one of {DTE_MODES}")
+        self.expiration_source = expiration_source
+        self.dte_mode = dte_mode
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.snapshot_interval = max(MIN_SNAPSHOT_GAP, snapshot_interval)
+        self.move_threshold = move_threshold
+        self.stream_strike_range = stream_strike_range
+        self.chain_refresh = chain_refresh
+        if greeks not in GREEKS_SOURCES:
+            raise ValueError(f"Unknown greeks source '{greeks}', expected one of {GREEKS_SOURCES}")
+        # Local greeks are solved from each snapshot's mids, so chains are fetched without them
+        self.greeks = greeks
+        self.risk_free_rate = risk_free_rate
+        self.dividend_yield = dividend_yield
+        self.base_url = base_url or BASE_URL
+
+        # Pooled keep-alive session shared by every request, sized for concurrent chain fetches
+        # and paced by Tradier's rate-limit headers
+        self.client = TradierClient(api_key, base_url=self.base_url,
+                                    pool_size=max(10, self.fetch_concurrency),
+                                    rate_limiter=RateLimiter(requests_per_minute, shared=shared_budget))
+
+        # Thread pool for issuing the per-DTE chain requests of a cycle at once
+        self._executor = None
+        if self.fetch_concurrency > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.fetch_concurrency,
+                                                thread_name_prefix='chain-fetch')
         
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
-        # Setup logging
+        # Setup logging; per-contract debug records are sampled, one of every log_sample per kind
+        if log_level not in LOG_LEVELS:
+            raise ValueError(f"Unknown log level '{log_level}', expected one of {LOG_LEVELS}")
+        self.log_level = getattr(logging, log_level)
+        self.debug_sample = Sampler(log_sample)
+        # log_tag marks every line, e.g. with a supervisor worker's id
+        self.log_dir = log_dir
+        self.log_tag = log_tag
         self._setup_logging()
         
+        # Per-stage timings, exported each cycle as NDJSON and Prometheus text
+        self.metrics = Metrics(output_dir=metrics_dir, port=metrics_port, logger=self.logger)
+        
+        # Exchange sessions with holidays and early closes, cached on disk
+        self.calendar = default_calendar(logger=self.logger) if self.check_market_hours else None
+        
+        # Listed expirations per symbol, fetched once a day and cached on disk
+        self.expiration_caches = {}
+        if self.expiration_source == 'api':
+            self.expiration_caches = {symbol: ExpirationCache(self.client, symbol, cache_dir='cache', logger=self.logger)
+                                      for symbol in self.symbols}
+        
+        # Cycles start on wall-clock aligned boundaries rather than a fixed sleep after the work;
+        # overruns are logged by _run against the cycle that starts late
+        self.scheduler = AlignedScheduler(period=schedule_period, grid=schedule_grid,
+                                          policy=schedule_policy)
+        
+        # Columnar sink, partitioned by symbol/date/DTE under <output_dir>/parquet
+        self.parquet_sink = None
+        if self.output_format in ('parquet', 'both'):
+            self.parquet_sink = ParquetSink(os.path.join(output_dir, 'parquet'),
+                                            snapshots_per_file=parquet_snapshots_per_file,
+                                            logger=self.logger)
+        
+        # Raw quotes and chains per cycle, kept so past days can be replayed and reprocessed
+        self.recorders = {}
+        if record_dir:
+            self.recorders = {symbol: FrameRecorder(record_dir, symbol, logger=self.logger) for symbol in self.symbols}
+        
+        # Writer thread so file I/O never delays the next fetch; 0 writes inline in the loop
+        self.writer = None
+        if write_queue_size > 0:
+            self.writer = BackgroundWriter(max_pending=write_queue_size, policy=write_policy,
+                                           logger=self.logger)
+        
         # Initialize CSV files
         self._setup_csv_files()
 
     def _setup_logging(self):
         """Setup logging to both file and console"""
         today = date.today().strftime('%Y%m%d')
-        log_dir = 'logs'
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = f'{log_dir}/options_data_{today}.log'
+        os.makedirs(self.log_dir, exist_ok=True)
+        log_file = os.path.join(self.log_dir, f'options_data_{today}.log')
         
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        tag = f'[{self.log_tag}] ' if self.log_tag else ''
+        formatter = logging.Formatter(f'%(asctime)s - %(levelname)s - {tag}%(message)s')
         
         # File handler
         file_handler = TimedRotatingFileHandler(
@@ -67,52 +204,35 @@ class MarketDataCollector:
         console_handler.setFormatter(formatter)
         
         self.logger = logging.getLogger('MarketDataCollector')
-        self.logger.setLevel(logging.INFO)
-        
-        # Remove existing handlers to avoid duplicate logs
-        self.logger.handlers = []
+        self.logger.setLevel(self.log_level)
         
-        # Add both handlers
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # Handlers run on a listener thread behind a queue; the previous day's are closed first
+        self.log_handler = install_queue_logging(self.logger, [file_handler, console_handler])
 
     def _setup_ndjson_files(self):
         current_date = date.today().strftime('%Y%m%d')
         
-        for dte in range(0, self.max_dte + 1):
-            filename = f"{self.symbol}_{dte}DTE_{current_date}.ndjson"
-            filepath = os.path.join(self.output_dir, filename)
-            if not os.path.exists(filepath):
-                open(filepath, 'w').close()
+        for symbol in self.symbols:
+            for dte in range(0, self.max_dte + 1):
+                filename = f"{symbol}_{dte}DTE_{current_date}.ndjson"
+                filepath = os.path.join(self.output_dir, filename)
+                if self.collects(symbol, dte) and not os.path.exists(filepath):
+                    open(filepath, 'w').close()
                 
     def _setup_csv_files(self):
         """Setup CSV files with headers for each DTE"""
         current_date = date.today().strftime('%Y%m%d')
-        headers = [
-            'Time', 'Symbol', 'Price', 'VIX', 'VIX1D',
-            'Option', 'Type', 'Strike Price',
-            'Last Price', 'Bid', 'Ask', 'Mid', 'Width',
-            'Expiration', 'DTE', 'Straddle Value', 'ATM',
-            '20-Wide IB Value', '30-Wide IB Value', '40-Wide IB Value',
-            '10-Wide Call Spread', '10-Wide Put Spread',
-            'Delta', 'Gamma', 'Theta', 'Vega', 'Rho', 'Phi',
-            'Description', 'Exchange',
-            'Change', 'Volume', 'Open', 'High', 'Low', 'Close',
-            'Change Percentage', 'Average Volume', 'Last Volume',
-            'Trade Date', 'Prev Close', 'Week 52 High', 'Week 52 Low',
-            'Bid Size', 'Bid Exchange', 'Bid Date',
-            'Ask Size', 'Ask Exchange', 'Ask Date',
-            'Open Interest', 'Contract Size', 'Expiration Type',
-            'Root Symbol', 'Intrinsic Value', 'Extrinsic Value'
-        ]
-        
-        for dte in range(0, self.max_dte + 1):
-            filename = f"{self.symbol}_{dte}DTE_{current_date}.csv"
-            filepath = os.path.join(self.output_dir, filename)
-            if not os.path.exists(filepath):
-                with open(filepath, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(headers)
+        # Strategy value columns depend on the configured strategy set
+        headers = output_columns(self.strategies)
+        
+        for symbol in self.symbols:
+            for dte in range(0, self.max_dte + 1):
+                filename = f"{symbol}_{dte}DTE_{current_date}.csv"
+                filepath = os.path.join(self.output_dir, filename)
+                if self.collects(symbol, dte) and not os.path.exists(filepath):
+                    with open(filepath, 'w', newline='') as f:
+                        writer = csv.writer(f)
+                        writer.writerow(headers)
 
     def is_market_open(self):
         """Check if the market is currently open"""
@@ -123,48 +243,69 @@ class MarketDataCollector:
         et_tz = pytz.timezone('US/Eastern')
         now = datetime.now(et_tz)
         
-        # Check if it's a weekday
-        if now.weekday() >= 5:  # 5 = Saturday, 6 = Sunday
-            self.logger.info("Market closed - Weekend")
+        # Weekends and exchange holidays
+        if not self.calendar.is_session(now.date()):
+            self.logger.info("Market closed - Weekend or holiday")
             return False
             
-        # Market hours: 9:30 AM - 4:00 PM ET
-        market_open = now.replace(hour=9, minute=30, second=0, microsecond=0)
-        market_close = now.replace(hour=16, minute=0, second=0, microsecond=0)
-        
-        if market_open <= now <= market_close:
+        # Regular session hours, 9:30 AM - 4:00 PM ET or the early close
+        if self.calendar.is_open(now):
             return True
         else:
             self.logger.info("Market closed - Outside trading hours")
             return False
 
+    def seconds_until_open(self):
+        """Seconds until the next session opens, or until midnight if that comes first"""
+        et_tz = pytz.timezone('US/Eastern')
+        now = datetime.now(et_tz)
+        # Wake at midnight too so the date rollover closes the previous day's files
+        midnight = datetime.combine(date.today() + timedelta(days=1), dt_time()).astimezone()
+        return max(1.0, min(self.calendar.seconds_until_open(now), midnight.timestamp() - now.timestamp()))
+
+    def sleep_closed(self, seconds):
+        """Sleep while the market is closed, calling on_idle at least every IDLE_HEARTBEAT seconds"""
+        end = time.time() + seconds
+        while True:
+            if self.on_idle is not None:
+                self.on_idle()
+            remaining = end - time.time()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, IDLE_HEARTBEAT))
+
     def get_market_data(self):
-        """Fetch current market data for symbol, VIX, and VIX1D"""
-        url = f'{self.base_url}/quotes'
-        params = {'symbols': f'{self.symbol},VIX,VIX1D'}
+        """Fetch current market data for every symbol, VIX, and VIX1D in one request"""
+        params = {'symbols': ','.join(dict.fromkeys(self.symbols + ['VIX', 'VIX1D']))}
         
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
+        with self.metrics.timer('fetch_quotes') as timing:
+            response = self.client.get('quotes', params=params)
+            response.raise_for_status()
+            timing['bytes'] = len(response.content)
         
-        quotes = response.json()['quotes']['quote']
+        with self.metrics.timer('parse_quotes'):
+            quotes = response.json()['quotes']['quote']
         return {quote['symbol']: quote for quote in quotes}
 
-    def get_options_chain(self, expiration_date):
+    def get_options_chain(self, expiration_date, dte=None, symbol=None):
         """Fetch options chain for a specific expiration date"""
-        url = f'{self.base_url}/options/chains'
+        symbol = symbol or self.symbol
         params = {
-            'symbol': self.symbol,
+            'symbol': symbol,
             'expiration': expiration_date.strftime('%Y-%m-%d'),
-            'greeks': 'true'
+            'greeks': 'true' if self.greeks == 'api' else 'false'
         }
         
         try:
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            data = response.json()
+            with self.metrics.timer('fetch_chain', dte) as timing:
+                response = self.client.get('options/chains', params=params)
+                response.raise_for_status()
+                timing['bytes'] = len(response.content)
+            with self.metrics.timer('parse_chain', dte):
+                data = response.json()
             
             if 'options' not in data or data['options'] is None:
-                self.logger.error(f"No options data available for {expiration_date}")
+                self.logger.error(f"No {symbol} options data available for {expiration_date}")
                 return None
                 
             return data['options'].get('option', [])
@@ -175,55 +316,93 @@ class MarketDataCollector:
             self.logger.error(f"Error parsing options chain: {e}")
             return None
 
-    def calculate_spread_value(self, option_buffer, current_strike, width, option_type='call'):
+    def collects(self, symbol, dte):
+        """Whether this collector owns the symbol's DTE"""
+        return self.dtes is None or dte in self.dtes.get(symbol, ())
+
+    def get_expirations(self, symbol=None):
+        """(dte, expiration_date) pairs to poll: listed expiries within max_dte, or every calendar day"""
+        symbol = symbol or self.symbol
+        expirations = None
+        if symbol in self.expiration_caches:
+            expirations = self.expiration_caches[symbol].within(self.max_dte, self.dte_mode)
+            if expirations is None:
+                self.logger.warning(f"No {symbol} expiration list available - probing every calendar day")
+        if expirations is None:
+            expirations = [(dte, date.today() + timedelta(days=dte)) for dte in range(0, self.max_dte + 1)]
+        return [(dte, expiration_date) for dte, expiration_date in expirations if self.collects(symbol, dte)]
+
+    def fetch_options_chains(self, expirations, symbol=None):
+        """Fetch options chains for several expirations, concurrently when fetch_concurrency > 1
+
+        Takes (dte, expiration_date) pairs and returns a list of (dte, expiration_date,
+        options_data, error) tuples in the same order. Errors are captured per expiration
+        so one failure doesn't abort the others.
+        """
+        symbol = symbol or self.symbol
+        return self.fetch_all_chains({symbol: expirations})[symbol]
+
+    def fetch_all_chains(self, expirations_by_symbol):
+        """fetch_options_chains for several symbols at once, sharing the fetch pool
+
+        Takes {symbol: [(dte, expiration_date), ...]} and returns {symbol: [(dte,
+        expiration_date, options_data, error), ...]}.
+        """
+        requests_to_make = [(symbol, dte, expiration_date)
+                            for symbol, expirations in expirations_by_symbol.items()
+                            for dte, expiration_date in expirations]
+        
+        def fetch(request):
+            symbol, dte, expiration_date = request
+            try:
+                return self.get_options_chain(expiration_date, dte, symbol), None
+            except Exception as e:
+                return None, e
+        
+        if self._executor is not None and len(requests_to_make) > 1:
+            results = list(self._executor.map(fetch, requests_to_make))
+        else:
+            results = [fetch(request) for request in requests_to_make]
+        
+        chains = {symbol: [] for symbol in expirations_by_symbol}
+        for (symbol, dte, expiration_date), (options_data, error) in zip(requests_to_make, results):
+            chains[symbol].append((dte, expiration_date, options_data, error))
+        return chains
+
+    def calculate_spread_value(self, strike_index, current_strike, width, option_type='call'):
         """Calculate vertical spread value"""
         try:
             if option_type == 'call':
-                higher_strike = current_strike + width
-                if (current_strike in option_buffer and 
-                    higher_strike in option_buffer and 
-                    option_buffer[current_strike]['call'] and 
-                    option_buffer[higher_strike]['call']):
-                    
-                    current_mid = option_buffer[current_strike]['call']['mid']
-                    higher_mid = option_buffer[higher_strike]['call']['mid']
+                current_mid = strike_index.mid('call', current_strike, tolerance=0)
+                higher_mid = strike_index.mid('call', current_strike + width)
+                if current_mid is not None and higher_mid is not None:
                     return round(current_mid - higher_mid, 2)
                     
             elif option_type == 'put':
-                lower_strike = current_strike - width
-                if (current_strike in option_buffer and 
-                    lower_strike in option_buffer and 
-                    option_buffer[current_strike]['put'] and 
-                    option_buffer[lower_strike]['put']):
-                    
-                    current_mid = option_buffer[current_strike]['put']['mid']
-                    lower_mid = option_buffer[lower_strike]['put']['mid']
+                current_mid = strike_index.mid('put', current_strike, tolerance=0)
+                lower_mid = strike_index.mid('put', current_strike - width)
+                if current_mid is not None and lower_mid is not None:
                     return round(current_mid - lower_mid, 2)
         except Exception as e:
             self.logger.warning(f"Error calculating spread value: {str(e)}")
         
         return None
 
-    def calculate_ib_value(self, option_buffer, strike_price, width):
+    def calculate_ib_value(self, strike_index, strike_price, width):
         """Calculate iron butterfly value"""
         try:
-            if (strike_price in option_buffer and 
-                strike_price + width in option_buffer and 
-                strike_price - width in option_buffer):
-                print(f"Strike price: {strike_price}, Width: {width}")
-                
-                center_call = option_buffer[strike_price]['call']['mid']
-                center_put = option_buffer[strike_price]['put']['mid']
-                print(f"Center call: {center_call}, Center put: {center_put}")  
-                wing_call = option_buffer[strike_price + width]['call']['mid']
-                wing_put = option_buffer[strike_price - width]['put']['mid']
-                print(f"Wing call: {wing_call}, Wing put: {wing_put}")
-                
-                if all(x is not None for x in [center_call, center_put, wing_call, wing_put]):
-                    print(f"Calculating IB value: short call {center_call} + short put {center_put} - long call {wing_call} - long put {wing_put}")
-                    print(f"Result: {round(center_call + center_put - wing_call - wing_put, 2)}")
-                    return round(center_call + center_put - wing_call - wing_put, 2)
-                    
+            center_call = strike_index.mid('call', strike_price, tolerance=0)
+            center_put = strike_index.mid('put', strike_price, tolerance=0)
+            wing_call = strike_index.mid('call', strike_price + width)
+            wing_put = strike_index.mid('put', strike_price - width)
+            
+            if all(x is not None for x in [center_call, center_put, wing_call, wing_put]):
+                ib_value = round(center_call + center_put - wing_call - wing_put, 2)
+                if self.logger.isEnabledFor(logging.DEBUG) and self.debug_sample('ib_value'):
+                    self.logger.debug("IB value at strike %s, width %s: short call %s + short put %s "
+                                      "- long call %s - long put %s = %s", strike_price, width,
+                                      center_call, center_put, wing_call, wing_put, ib_value)
+                return ib_value
 
         except Exception as e:
             self.logger.warning(f"Error calculating IB value: {str(e)}")
@@ -247,17 +426,20 @@ class MarketDataCollector:
             return int(float(value))
         except (TypeError, ValueError):
             return default
-    def process_options_data(self, options_data, market_data, expiration_date):
-        """Process options data and calculate metrics"""
-        current_time = datetime.now().astimezone().strftime('%Y-%m-%dT%H:%M:%S%z')
+    def process_options_data(self, options_data, market_data, expiration_date, as_of=None, symbol=None):
+        """Process one symbol's options data and calculate metrics, timestamped as_of (default: now)"""
+        symbol = symbol or self.symbol
+        as_of = as_of or datetime.now().astimezone().replace(microsecond=0)
+        current_time = as_of.strftime('%Y-%m-%dT%H:%M:%S%z')
+        today = as_of.date()
         
         # Validate market data
         try:
-            current_price = float(market_data[self.symbol]['last'])
+            current_price = float(market_data[symbol]['last'])
             vix = float(market_data.get('VIX', {}).get('last', 0))
             vix1d = float(market_data.get('VIX1D', {}).get('last', 0))
         except (KeyError, TypeError, ValueError) as e:
-            self.logger.error(f"Invalid market data: {str(e)}")
+            self.logger.error(f"Invalid {symbol} market data: {str(e)}")
             self.logger.debug(f"Market data received: {market_data}")
             return None
             
@@ -265,7 +447,17 @@ class MarketDataCollector:
             self.logger.warning(f"No options data available for {expiration_date}")
             return None
         
-        # Buffer to store options data
+        if self.engine == 'vectorized':
+            processed_data = build_option_rows(options_data, symbol, current_price, vix, vix1d,
+                                               expiration_date, current_time, today=today,
+                                               strike_tolerance=self.strike_tolerance,
+                                               strategies=self.strategies)
+            if not processed_data:
+                self.logger.warning(f"No valid options data processed for {expiration_date}")
+                return None
+            return self.apply_greeks(processed_data, current_price, expiration_date, as_of)
+        
+        # Mid of every contract by strike and type, None where a strike lacks that type
         option_buffer = {}
         straddle_values = {}
         atm_strike = None
@@ -284,38 +476,41 @@ class MarketDataCollector:
                 ask = float(option.get('ask', 0)) if option.get('ask') is not None else 0
                 mid = round((bid + ask) / 2, 2) if bid > 0 or ask > 0 else 0
                 
-                option_buffer[strike_price][option_type] = {
-                    'option': option,
-                    'mid': mid
-                }
+                option_buffer[strike_price][option_type] = mid
                 
                 if abs(strike_price - current_price) < min_diff:
                     min_diff = abs(strike_price - current_price)
                     atm_strike = strike_price
             except Exception as e:
-                self.logger.debug(f"Skipping option {option.get('symbol', 'unknown')} in first pass: {str(e)}")
+                if self.logger.isEnabledFor(logging.DEBUG) and self.debug_sample('skip_option'):
+                    self.logger.debug(f"Skipping option {option.get('symbol', 'unknown')} in first pass: {str(e)}")
                 continue
         
+        # Sorted per-type strike arrays for the wing leg lookups
+        strike_index = StrikeIndex.from_buffer(option_buffer, self.strike_tolerance)
+        
+        # Value every configured strategy at every strike in one batched pass
+        buffer_strikes = list(option_buffer)
+        strategy_columns = compute_strategy_columns(strike_index, buffer_strikes, self.strategies)
+        strategy_values = {
+            strike: dict(zip(strategy_columns, values))
+            for strike, values in zip(buffer_strikes, zip(*strategy_columns.values()))
+        }
+        missing_strategy_values = {column: 0.00 for column in strategy_columns}
+        
         # Second pass: calculate metrics and prepare rows
         processed_data = []
         for option in options_data:
             try:
                 strike_price = float(option.get('strike', 0))
                 
-                # Calculate various spread values
-                ib_value_20 = self.calculate_ib_value(option_buffer, strike_price, 20)
-                ib_value_30 = self.calculate_ib_value(option_buffer, strike_price, 30)
-                ib_value_40 = self.calculate_ib_value(option_buffer, strike_price, 40)
-                call_spread_10 = self.calculate_spread_value(option_buffer, strike_price, 10, 'call')
-                put_spread_10 = self.calculate_spread_value(option_buffer, strike_price, 10, 'put')
-                
                 # Calculate straddle value
                 straddle_value = None
                 if strike_price in option_buffer:
-                    call_data = option_buffer[strike_price]['call']
-                    put_data = option_buffer[strike_price]['put']
-                    if call_data and put_data:
-                        straddle_value = round(call_data['mid'] + put_data['mid'], 2)
+                    call_mid = option_buffer[strike_price]['call']
+                    put_mid = option_buffer[strike_price]['put']
+                    if call_mid is not None and put_mid is not None:
+                        straddle_value = round(call_mid + put_mid, 2)
                 
                 # Calculate mid and width
                 bid = float(option.get('bid', 0)) if option.get('bid') is not None else 0
@@ -326,7 +521,7 @@ class MarketDataCollector:
                 # Prepare row data with matching field names
                 row_data = {
                     'Time': current_time,
-                    'Symbol': self.symbol,
+                    'Symbol': symbol,
                     'Price': round(current_price, 2),
                     'VIX': round(vix, 2),
                     'VIX1D': round(vix1d, 2),
@@ -339,16 +534,14 @@ class MarketDataCollector:
                     'Mid': mid,
                     'Width': width,
                     'Expiration': expiration_date.strftime('%Y-%m-%d'),
-                    'DTE': (expiration_date - date.today()).days,
+                    'DTE': (expiration_date - today).days,
                     'Straddle Value': straddle_value if straddle_value is not None else 0.00,
-                    'ATM': 1 if strike_price == atm_strike else 0,
-                    '20-Wide IB Value': ib_value_20 if ib_value_20 is not None else 0.00,
-                    '30-Wide IB Value': ib_value_30 if ib_value_30 is not None else 0.00,
-                    '40-Wide IB Value': ib_value_40 if ib_value_40 is not None else 0.00,
-                    '10-Wide Call Spread': call_spread_10 if call_spread_10 is not None else 0.00,
-                    '10-Wide Put Spread': put_spread_10 if put_spread_10 is not None else 0.00
+                    'ATM': 1 if strike_price == atm_strike else 0
                 }
                 
+                # Add the configured strategy values for this strike
+                row_data.update(strategy_values.get(strike_price, missing_strategy_values))
+                
                 # Add greeks with rounding and error handling
                 greeks = option.get('greeks', {})
                 if greeks:
@@ -380,6 +573,13 @@ class MarketDataCollector:
                         'Phi': 0.00
                     })
                 
+                # Tradier's mid implied volatility, unrounded
+                try:
+                    mid_iv = greeks.get('mid_iv') if greeks else None
+                    row_data['IV'] = float(mid_iv) if mid_iv is not None else 0.0
+                except (ValueError, TypeError):
+                    row_data['IV'] = 0.0
+                
                 # Add additional fields with matching names and proper rounding
                 row_data.update({
                     'Description': option.get('description', 'N/A'),
@@ -426,104 +626,469 @@ class MarketDataCollector:
                 processed_data.append(row_data)
                 
             except Exception as e:
-                self.logger.debug(f"Error processing option {option.get('symbol', 'unknown')}: {str(e)}")
+                if self.logger.isEnabledFor(logging.DEBUG) and self.debug_sample('process_option'):
+                    self.logger.debug(f"Error processing option {option.get('symbol', 'unknown')}: {str(e)}")
                 continue
         
         if not processed_data:
             self.logger.warning(f"No valid options data processed for {expiration_date}")
             return None
             
-        return processed_data  
-    def save_data_csv(self, data, dte, current_date):
+        return self.apply_greeks(processed_data, current_price, expiration_date, as_of)
+
+    def apply_greeks(self, processed_data, current_price, expiration_date, as_of):
+        """Replace the API greeks with locally computed IV and greeks when configured"""
+        if self.greeks == 'local':
+            with self.metrics.timer('greeks'):
+                apply_local_greeks(processed_data, current_price, expiration_date, as_of,
+                                   self.risk_free_rate, self.dividend_yield)
+        return processed_data
+    def save_data_csv(self, data, dte, current_date, symbol=None):
         """Save processed data to CSV"""
-        filename = f"{self.symbol}_{dte}DTE_{current_date.strftime('%Y%m%d')}.csv"
+        filename = f"{symbol or self.symbol}_{dte}DTE_{current_date.strftime('%Y%m%d')}.csv"
         filepath = os.path.join(self.output_dir, filename)
         
         with open(filepath, 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=list(data[0].keys()))
-            writer.writerows(data)
+            if isinstance(data, ContractTable):
+                csv.writer(f).writerows(zip(*data.columns.values()))
+            else:
+                writer = csv.DictWriter(f, fieldnames=list(data[0].keys()))
+                writer.writerows(data)
         
         self.logger.info(f"Saved data to {filepath}")
 
-    def save_data(self, data, dte, current_date):
-        filename = f"{self.symbol}_{dte}DTE_{current_date.strftime('%Y%m%d')}.ndjson"
+    def save_data(self, data, dte, current_date, symbol=None):
+        filename = f"{symbol or self.symbol}_{dte}DTE_{current_date.strftime('%Y%m%d')}.ndjson"
         filepath = os.path.join(self.output_dir, filename)
         
+        # Encode the whole snapshot column-wise and append it in a single write
+        payload = encode_rows(data)
         with open(filepath, 'a') as f:
-            for row in data:
-                f.write(json.dumps(row) + '\n')
+            f.write(payload)
         
         self.logger.info(f"Saved data to {filepath}")
+        return len(payload)
+
+    def save_data_parquet(self, data, dte, current_date, symbol=None):
+        """Append processed data to the day's Parquet file as one record batch"""
+        filepath = self.parquet_sink.write(data, symbol or self.symbol, dte, current_date)
+        self.logger.info(f"Saved data to {filepath}")
+
+    def save_outputs(self, data, dte, current_date, symbol=None, cycle=None):
+        """Write processed data to every configured output format; cycle marks a write queued by that cycle"""
+        symbol = symbol or self.symbol
+        with self.metrics.timer('save', dte, cycle=cycle) as timing:
+            if self.cdc is not None:
+                data = self.cdc.encode(data, (symbol, dte, current_date))
+            timing['rows'] = len(data)
+            if self.output_format in ('ndjson', 'both'):
+                timing['bytes'] = self.save_data(data, dte, current_date, symbol)
+            if self.parquet_sink is not None:
+                self.save_data_parquet(data, dte, current_date, symbol)
+
+    def write_outputs(self, data, dte, current_date, symbol=None):
+        """Hand processed data to the writer thread, or write it now if there is none"""
+        if self.writer is not None:
+            # Timed on the writer thread against the cycle that queued it, not the one open then
+            self.writer.submit(self.save_outputs, data, dte, current_date, symbol, self.metrics.current_cycle)
+        else:
+            self.save_outputs(data, dte, current_date, symbol)
+
+    def record_frame(self, as_of, market_data, chains, symbol=None):
+        """Queue a symbol's raw quotes and chains of the cycle for its recorder"""
+        recorder = self.recorders[symbol or self.symbol]
+        chains = [(dte, expiration_date, options_data) for dte, expiration_date, options_data, error in chains
+                  if error is None]
+        if self.writer is not None:
+            self.writer.submit(recorder.record, as_of, market_data, chains)
+        else:
+            recorder.record(as_of, market_data, chains)
+
+    def close(self):
+        """Flush and close open output files and release the API client"""
+        if self.writer is not None:
+            self.writer.close()
+            self.logger.info(f"Writer stats: {self.writer.stats()}")
+        for symbol, recorder in self.recorders.items():
+            recorder.close()
+            self.logger.info(f"Recorded {recorder.frames} {symbol} frames")
+        if self.parquet_sink is not None:
+            self.parquet_sink.close()
+        self.metrics.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.client.close()
+        if self.log_handler.dropped:
+            self.logger.warning(f"Dropped {self.log_handler.dropped} log records while the log queue was full")
+        stop_queue_logging(self.logger)
 
     def run(self):
+        try:
+            if self.mode == 'stream':
+                self._run_streaming()
+            else:
+                self._run()
+        finally:
+            self.close()
+
+    def process_chains(self, chains, market_data, as_of, current_date, symbol=None):
+        """Process each (dte, expiration_date, options_data, error) chain of a cycle and queue its output"""
+        symbol = symbol or self.symbol
+        for dte, expiration_date, options_data, error in chains:
+            try:
+                if error is not None:
+                    raise error
+                
+                if options_data is None:
+                    self.logger.warning(f"Skipping {symbol} DTE {dte} due to missing options data")
+                    continue
+                    
+                with self.metrics.timer('process', dte) as timing:
+                    processed_data = self.process_options_data(options_data, market_data, expiration_date,
+                                                               as_of=as_of, symbol=symbol)
+                    timing['rows'] = len(processed_data) if processed_data else 0
+                if processed_data:  # Only save if we have data
+                    self.write_outputs(processed_data, dte, current_date, symbol)
+            except Exception as e:
+                self.logger.error(f"Error processing {symbol} DTE {dte}: {str(e)}")
+
+    def refresh_stream(self, states, stream):
+        """Reload quotes and chains over REST and subscribe to the contracts near the money"""
+        market_data = self.get_market_data()
+        all_chains = self.fetch_all_chains({symbol: self.get_expirations(symbol) for symbol in states})
+        symbols = list(dict.fromkeys(self.symbols + ['VIX', 'VIX1D']))
+        for symbol, state in states.items():
+            state.set_market_data(market_data)
+            state.load_chains([(dte, expiration_date, options_data)
+                               for dte, expiration_date, options_data, error in all_chains[symbol]
+                               if error is None and options_data])
+            symbols += sorted(state.option_symbols(self.stream_strike_range))
+        if symbols != stream.symbols or not stream.running:
+            stream.start(symbols)
+
+    def _run_streaming(self):
+        """Snapshot streamed quotes every snapshot_interval, or sooner when the underlying moves"""
+        last_date = None
+        # One state per symbol; each holds every quote, so index events update them all
+        states = {symbol: ChainState(symbol) for symbol in self.symbols}
+        moved = threading.Event()
+        
+        def on_event(event):
+            for state in states.values():
+                if state.apply(event) and self.move_threshold and state.moved(self.move_threshold):
+                    moved.set()
+        
+        def stats():
+            return {symbol: state.stats() for symbol, state in states.items()}
+        
+        stream = TradierStream(self.client, on_event, logger=self.logger)
+        next_snapshot = time.time()
+        last_snapshot = 0.0
+        refreshed = None
+        try:
+            while True:
+                try:
+                    moved.wait(max(0.0, next_snapshot - time.time()))
+                    gap = last_snapshot + MIN_SNAPSHOT_GAP - time.time()
+                    if gap > 0:
+                        time.sleep(gap)
+                    moved.clear()
+                    while next_snapshot <= time.time():
+                        next_snapshot += self.snapshot_interval
+                    current_date = date.today()
+                    
+                    if last_date != current_date:
+                        if last_date is not None:
+                            self.logger.info(f"Stream stats for {last_date}: {stats()}, {stream.stats()}")
+                            self._finish_date(last_date)
+                        self._setup_logging()
+                        self._setup_ndjson_files()
+                        last_date = current_date
+                    
+                    if not self.is_market_open():
+                        stream.stop()
+                        refreshed = None
+                        sleep_seconds = self.seconds_until_open()
+                        print(f"Market is closed - sleeping {sleep_seconds:.0f}s")
+                        self.sleep_closed(sleep_seconds)
+                        next_snapshot = time.time()
+                        continue
+                    
+                    # Greeks, open interest and listed strikes only come with the REST chains
+                    if refreshed is None or time.time() - refreshed >= self.chain_refresh:
+                        self.refresh_stream(states, stream)
+                        refreshed = time.time()
+                    
+                    changed = [symbol for symbol, state in states.items() if state.changed()]
+                    if not changed:
+                        continue
+                    self.metrics.begin_cycle()
+                    # Whole seconds, as recorded frames store it, so replays compute the same greeks
+                    as_of = datetime.now().astimezone().replace(microsecond=0)
+                    for symbol in changed:
+                        market_data, chains = states[symbol].snapshot()
+                        chains = [(dte, expiration_date, options_data, None)
+                                  for dte, expiration_date, options_data in chains]
+                        if self.recorders:
+                            self.record_frame(as_of, market_data, chains, symbol)
+                        self.process_chains(chains, market_data, as_of, current_date, symbol)
+                    last_snapshot = time.time()
+                    self.metrics.end_cycle()
+                    if self.on_cycle is not None:
+                        self.on_cycle()
+                    
+                except Exception as e:
+                    self.logger.error(f"Error in streaming loop: {str(e)}")
+                    next_snapshot = time.time() + self.snapshot_interval
+        finally:
+            stream.stop()
+            self.logger.info(f"Stream stats: {stats()}, {stream.stats()}")
+
+    def replay(self, paths):
+        """Run recorded frames through processing and the configured outputs as fast as possible"""
+        last_date = None
+        frames = rows = 0
+        start = time.perf_counter()
+        try:
+            for path in paths:
+                self.logger.info(f"Replaying {path}")
+                for frame in read_frames(path, self.logger):
+                    symbol = frame['Symbol']
+                    if symbol not in self.symbols:
+                        raise ValueError(f"{path} was recorded for {symbol}, not one of {self.symbols}")
+                    as_of = frame_time(frame)
+                    current_date = as_of.date()
+                    if last_date != current_date:
+                        if last_date is not None:
+                            self._finish_date(last_date)
+                        last_date = current_date
+                    
+                    for dte, expiration_date, options_data in frame_chains(frame):
+                        if options_data is None:
+                            continue
+                        processed_data = self.process_options_data(options_data, frame['Quotes'], expiration_date,
+                                                                   as_of=as_of, symbol=symbol)
+                        if processed_data:
+                            rows += len(processed_data)
+                            self.write_outputs(processed_data, dte, current_date, symbol)
+                    frames += 1
+            if self.writer is not None:
+                self.writer.flush()
+            # Logged before close(), which stops the log queue listener
+            seconds = time.perf_counter() - start
+            self.logger.info(f"Replayed {frames} frames ({rows} rows) in {seconds:.1f}s "
+                             f"({frames / seconds if seconds else 0:.1f} frames/s)")
+        finally:
+            self.close()
+
+    def _finish_date(self, last_date):
+        """Log the finished day's stats and close its output files"""
+        self.logger.info(f"API client stats for {last_date}: {self.client.stats.summary()}")
+        self.logger.info(f"Rate limit headroom: {self.client.headroom()}")
+        self.logger.info(f"Stage latency for {last_date}: {self.metrics.summary()}")
+        self.logger.info(f"Scheduler stats for {last_date}: {self.scheduler.stats()}")
+        # Finish the previous day's queued writes before closing its files
+        if self.writer is not None:
+            self.writer.flush()
+            self.logger.info(f"Writer stats for {last_date}: {self.writer.stats()}")
+        if self.cdc is not None:
+            self.logger.info(f"CDC stats for {last_date}: {self.cdc.stats()}")
+            self.cdc.reset()
+        if self.parquet_sink is not None:
+            self.parquet_sink.close_date(last_date)
+
+    def _run(self):
         last_date = None
         
         while True:
             try:
+                # Wait for the next aligned cycle boundary
+                tick = self.scheduler.wait()
+                if tick.missed:
+                    action = 'skipped to the next boundary' if self.scheduler.policy == 'skip' else 'started immediately'
+                    self.logger.warning(f"Cycle {self.metrics.current_cycle} is late: the previous cycle overran "
+                                        f"by {tick.overrun:.2f}s and missed {tick.missed} boundary(s), {action}")
+                self.metrics.begin_cycle(overrun=tick.overrun, missed=tick.missed)
                 current_date = date.today()
                 
                 # Check if date has changed and reset logger and CSV files
                 if last_date != current_date:
+                    if last_date is not None:
+                        self._finish_date(last_date)
                     self._setup_logging()
                     self._setup_ndjson_files()
                     last_date = current_date
                 
                 # Check if market is open
                 if not self.is_market_open():
-                    time.sleep(60)
-                    print("Market is closed - sleeping")
+                    sleep_seconds = self.seconds_until_open()
+                    print(f"Market is closed - sleeping {sleep_seconds:.0f}s")
+                    self.sleep_closed(sleep_seconds)
+                    # Idle time isn't a cycle overrun; realign on the next boundary
+                    self.scheduler.reset()
                     continue
                 
-                # Fetch market data once per loop
+                # Fetch market data for every symbol once per loop
                 market_data = self.get_market_data()
-                self.logger.info(f"Fetched market data: {self.symbol}={market_data[self.symbol]['last']}, "
+                prices = ', '.join(f"{symbol}={market_data.get(symbol, {}).get('last', 'N/A')}"
+                                   for symbol in self.symbols)
+                self.logger.info(f"Fetched market data: {prices}, "
                             f"VIX={market_data['VIX']['last']}, "
                             f"VIX1D={market_data.get('VIX1D', {}).get('last', 'N/A')}")
                 
-                # Process each DTE starting from 0
-                for dte in range(0, self.max_dte + 1):  # Changed to start from 0
-                    try:
-                        expiration_date = date.today() + timedelta(days=dte)
-                        options_data = self.get_options_chain(expiration_date)
-                        
-                        if options_data is None:
-                            self.logger.warning(f"Skipping DTE {dte} due to missing options data")
-                            continue
-                            
-                        processed_data = self.process_options_data(options_data, market_data, expiration_date)
-                        if processed_data:  # Only save if we have data
-                            self.save_data(processed_data, dte, current_date)
-                    except Exception as e:
-                        self.logger.error(f"Error processing DTE {dte}: {str(e)}")
+                # Fetch every symbol's and expiry's chain for this cycle (concurrently if enabled),
+                # then process in order
+                all_chains = self.fetch_all_chains({symbol: self.get_expirations(symbol) for symbol in self.symbols})
+                # One timestamp for every row of the cycle, also stored with the recorded frames;
+                # whole seconds as they are stored there, so replays compute the same greeks
+                as_of = datetime.now().astimezone().replace(microsecond=0)
+                for symbol, chains in all_chains.items():
+                    if self.recorders:
+                        self.record_frame(as_of, market_data, chains, symbol)
+                    self.process_chains(chains, market_data, as_of, current_date, symbol)
                 
-                # Wait for next update
-                time.sleep(25)  # Adjust frequency as needed
+                self.metrics.end_cycle()
+                if self.on_cycle is not None:
+                    self.on_cycle()
                 
             except Exception as e:
+                # The next cycle still waits for its boundary, which paces the retries
                 self.logger.error(f"Error in main loop: {str(e)}")
-                time.sleep(25)  # Wait before retrying
 
-if __name__ == "__main__":
+def build_parser():
+    """Command line options of the collector, also used by supervisor.py"""
     import argparse
     
     parser = argparse.ArgumentParser()
     parser.add_argument('--symbol', type=str, default='SPX')
+    parser.add_argument('--symbols', type=lambda value: [s.strip().upper() for s in value.split(',') if s.strip()],
+                       default=None,
+                       help='Comma-separated underlyings to collect in this process, e.g. SPX,XSP,NDX,RUT (default: --symbol)')
     parser.add_argument('--dte_days', type=int, default=7)
     parser.add_argument('--output_dir', type=str, default='data2')
     parser.add_argument('--check_market_hours', action='store_true', default=False,
                        help='Collect data only when market is open (default: True - will only collect during market hours)')
-    
-    args = parser.parse_args()
-    
-    # Load API key from file
-    api_key = load_api_key()
-    
-    collector = MarketDataCollector(
-        api_key=api_key,
+    parser.add_argument('--fetch_concurrency', type=int, default=1,
+                       help='Maximum number of option chain requests in flight per cycle (default: 1 - sequential)')
+    parser.add_argument('--engine', choices=ENGINES, default='python',
+                       help='Options processing engine: per-contract python loop or columnar numpy (default: python)')
+    parser.add_argument('--strike_tolerance', type=float, default=0.0,
+                       help='Match wing legs to the nearest listed strike within this distance (default: 0 - exact strike)')
+    parser.add_argument('--strategies', type=str, default=None,
+                       help='JSON file listing the strategies to value (default: 20/30/40-wide IB and 10-wide spreads)')
+    parser.add_argument('--output_format', choices=OUTPUT_FORMATS, default='ndjson',
+                       help='Write NDJSON files, partitioned Parquet under <output_dir>/parquet, or both (default: ndjson)')
+    parser.add_argument('--parquet_snapshots_per_file', type=int, default=120,
+                       help='Snapshots per Parquet file before starting a new one (default: 120)')
+    parser.add_argument('--write_queue_size', type=int, default=64,
+                       help='Snapshots that may wait for the background writer thread; 0 writes inline (default: 64)')
+    parser.add_argument('--write_policy', choices=WRITE_POLICIES, default='block',
+                       help='What to do when the write queue is full (default: block - wait for the writer)')
+    parser.add_argument('--schedule_period', type=float, default=25.0,
+                       help='Seconds between cycles; cycles start on multiples of this since the epoch (default: 25)')
+    parser.add_argument('--schedule_grid', type=parse_grid, default=None,
+                       help='Start cycles at these seconds of every minute instead, e.g. 0,25,50 (default: none - use the period)')
+    parser.add_argument('--schedule_policy', choices=SCHEDULE_POLICIES, default='skip',
+                       help='When a cycle overruns the next boundary: skip to the following boundary or catch_up by starting at once (default: skip)')
+    parser.add_argument('--storage_mode', choices=STORAGE_MODES, default='full',
+                       help='Write every contract each cycle, or only changed contracts between keyframes (default: full)')
+    parser.add_argument('--keyframe_interval', type=int, default=20,
+                       help='In cdc mode, write a full keyframe every this many snapshots (default: 20)')
+    parser.add_argument('--expirations', choices=EXPIRATION_SOURCES, default='api',
+                       help='Poll listed expirations from the API (cached daily) or probe every calendar day (default: api)')
+    parser.add_argument('--dte_mode', choices=DTE_MODES, default='calendar',
+                       help='Measure --dte_days and file DTE numbers in calendar days or trading sessions (default: calendar)')
+    parser.add_argument('--requests_per_minute', type=float, default=120,
+                       help='API request rate until Tradier\'s rate-limit headers are seen (default: 120)')
+    parser.add_argument('--metrics_dir', type=str, default='metrics',
+                       help='Directory for the per-cycle metrics NDJSON and collector.prom files (default: metrics)')
+    parser.add_argument('--metrics_port', type=int, default=0,
+                       help='Serve Prometheus metrics at http://<host>:<port>/metrics (default: 0 - disabled)')
+    parser.add_argument('--base_url', type=str, default=None,
+                       help=f'Market data API root, e.g. a local mock_tradier_server.py (default: {BASE_URL})')
+    parser.add_argument('--record_dir', type=str, default=None,
+                       help='Also store each cycle\'s raw quotes and chains as gzip frames in this directory (default: off)')
+    parser.add_argument('--replay', type=str, nargs='+', default=None,
+                       help='Reprocess recorded .frames.gz files into --output_dir instead of collecting')
+    parser.add_argument('--mode', choices=MODES, default='poll',
+                       help='Poll whole chains every cycle, or keep chains current from the streaming API (default: poll)')
+    parser.add_argument('--snapshot_interval', type=float, default=5.0,
+                       help='Stream mode: seconds between snapshots, at least 1 (default: 5)')
+    parser.add_argument('--move_threshold', type=float, default=0.0,
+                       help='Stream mode: also snapshot as soon as the underlying moves this many points (default: 0 - off)')
+    parser.add_argument('--stream_strike_range', type=float, default=100.0,
+                       help='Stream mode: subscribe to contracts within this many points of the underlying (default: 100)')
+    parser.add_argument('--chain_refresh', type=float, default=300.0,
+                       help='Stream mode: seconds between REST chain reloads for greeks and new strikes (default: 300)')
+    parser.add_argument('--greeks', choices=GREEKS_SOURCES, default='api',
+                       help='Use the greeks returned with each chain, or fetch chains without them and compute IV and greeks locally (default: api)')
+    parser.add_argument('--risk_free_rate', type=float, default=0.04,
+                       help='Local greeks: annual risk-free rate, continuously compounded (default: 0.04)')
+    parser.add_argument('--dividend_yield', type=float, default=0.0,
+                       help='Local greeks: annual dividend yield of the underlying (default: 0)')
+    parser.add_argument('--log_level', choices=LOG_LEVELS, default='INFO',
+                       help='Logging level; DEBUG adds per-contract diagnostics (default: INFO)')
+    parser.add_argument('--log_sample', type=int, default=100,
+                       help='Log one of every N per-contract debug records of each kind (default: 100)')
+    parser.add_argument('--log_dir', type=str, default='logs',
+                       help='Directory for the daily log files (default: logs)')
+    return parser
+
+
+def collector_options(args):
+    """MarketDataCollector keyword arguments other than api_key from parsed options"""
+    return dict(
         symbol=args.symbol,
+        symbols=args.symbols,
         max_dte=args.dte_days,
         output_dir=args.output_dir,
-        check_market_hours=args.check_market_hours
+        check_market_hours=args.check_market_hours,
+        fetch_concurrency=args.fetch_concurrency,
+        engine=args.engine,
+        strike_tolerance=args.strike_tolerance,
+        strategies=load_strategies(args.strategies),
+        output_format=args.output_format,
+        parquet_snapshots_per_file=args.parquet_snapshots_per_file,
+        write_queue_size=args.write_queue_size,
+        write_policy=args.write_policy,
+        schedule_period=args.schedule_period,
+        schedule_grid=args.schedule_grid,
+        schedule_policy=args.schedule_policy,
+        storage_mode=args.storage_mode,
+        keyframe_interval=args.keyframe_interval,
+        expiration_source=args.expirations,
+        dte_mode=args.dte_mode,
+        requests_per_minute=args.requests_per_minute,
+        metrics_dir=args.metrics_dir,
+        metrics_port=args.metrics_port,
+        base_url=args.base_url,
+        record_dir=args.record_dir if not args.replay else None,
+        mode=args.mode,
+        snapshot_interval=args.snapshot_interval,
+        move_threshold=args.move_threshold,
+        stream_strike_range=args.stream_strike_range,
+        chain_refresh=args.chain_refresh,
+        greeks=args.greeks,
+        risk_free_rate=args.risk_free_rate,
+        dividend_yield=args.dividend_yield,
+        log_level=args.log_level,
+        log_sample=args.log_sample,
+        log_dir=args.log_dir
     )
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    
+    # Load API key from file; replaying recordings makes no API requests
+    api_key = load_api_key() if not args.replay else ''
+    
+    collector = MarketDataCollector(api_key=api_key, **collector_options(args))
+    
+    # docker stop sends SIGTERM; exit through run()'s cleanup so queued writes are flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
-    collector.run()
\ No newline at end of file
+    if args.replay:
+        collector.replay(args.replay)
+    else:
+        collector.run()
\ No newline at end of file
@@ -7,6 +7,7 @@ import time
 import os
 import pytz
 import csv
+from log_utils import LEVELS as LOG_LEVELS, Sampler, install_queue_logging, stop_queue_logging
 
 def load_api_key():
     """Load API key from .api_key file in script directory"""
@@ -22,7 +23,8 @@ def load_api_key():
         raise Exception(f"Error reading API key: {str(e)}")
 
 class MarketDataCollector:
-    def __init__(self, api_key, symbol='SPX', max_dte=3, output_dir='data', check_market_hours=True):
+    def __init__(self, api_key, symbol='SPX', max_dte=3, output_dir='data', check_market_hours=True,
+                 log_level='INFO', log_sample=100):
         self.api_key = api_key
         self.symbol = symbol
         self.max_dte = max_dte
@@ -37,7 +39,11 @@ class MarketDataCollector:
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
-        # Setup logging
+        # Setup logging; per-contract debug records are sampled, one of every log_sample per kind
+        if log_level not in LOG_LEVELS:
+            raise ValueError(f"Unknown log level '{log_level}', expected one of {LOG_LEVELS}")
+        self.log_level = getattr(logging, log_level)
+        self.debug_sample = Sampler(log_sample)
         self._setup_logging()
         
         # Initialize CSV files
@@ -66,14 +72,10 @@ class MarketDataCollector:
         console_handler.setFormatter(formatter)
         
         self.logger = logging.getLogger('MarketDataCollector')
-        self.logger.setLevel(logging.INFO)
+        self.logger.setLevel(self.log_level)
         
-        # Remove existing handlers to avoid duplicate logs
-        self.logger.handlers = []
-        
-        # Add both handlers
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # Handlers run on a listener thread behind a queue; the previous day's are closed first
+        install_queue_logging(self.logger, [file_handler, console_handler])
 
     def _setup_csv_files(self):
         """Setup CSV files with headers for each DTE"""
@@ -200,19 +202,18 @@ class MarketDataCollector:
             if (strike_price in option_buffer and 
                 strike_price + width in option_buffer and 
                 strike_price - width in option_buffer):
-                print(f"Strike price: {strike_price}, Width: {width}")
-                
                 center_call = option_buffer[strike_price]['call']['mid']
                 center_put = option_buffer[strike_price]['put']['mid']
-                print(f"Center call: {center_call}, Center put: {center_put}")  
                 wing_call = option_buffer[strike_price + width]['call']['mid']
                 wing_put = option_buffer[strike_price - width]['put']['mid']
-                print(f"Wing call: {wing_call}, Wing put: {wing_put}")
                 
                 if all(x is not None for x in [center_call, center_put, wing_call, wing_put]):
-                    print(f"Calculating IB value: short call {center_call} + short put {center_put} - long call {wing_call} - long put {wing_put}")
-                    print(f"Result: {round(center_call + center_put - wing_call - wing_put, 2)}")
-                    return round(center_call + center_put - wing_call - wing_put, 2)
+                    ib_value = round(center_call + center_put - wing_call - wing_put, 2)
+                    if self.logger.isEnabledFor(logging.DEBUG) and self.debug_sample('ib_value'):
+                        self.logger.debug("IB value at strike %s, width %s: short call %s + short put %s "
+                                          "- long call %s - long put %s = %s", strike_price, width,
+                                          center_call, center_put, wing_call, wing_put, ib_value)
+                    return ib_value
                     
 
         except Exception as e:
@@ -283,7 +284,8 @@ class MarketDataCollector:
                     min_diff = abs(strike_price - current_price)
                     atm_strike = strike_price
             except Exception as e:
-                self.logger.debug(f"Skipping option {option.get('symbol', 'unknown')} in first pass: {str(e)}")
+                if self.logger.isEnabledFor(logging.DEBUG) and self.debug_sample('skip_option'):
+                    self.logger.debug(f"Skipping option {option.get('symbol', 'unknown')} in first pass: {str(e)}")
                 continue
         
         # Second pass: calculate metrics and prepare rows
@@ -416,7 +418,8 @@ class MarketDataCollector:
                 processed_data.append(row_data)
                 
             except Exception as e:
-                self.logger.debug(f"Error processing option {option.get('symbol', 'unknown')}: {str(e)}")
+                if self.logger.isEnabledFor(logging.DEBUG) and self.debug_sample('process_option'):
+                    self.logger.debug(f"Error processing option {option.get('symbol', 'unknown')}: {str(e)}")
                 continue
         
         if not processed_data:
@@ -492,6 +495,10 @@ if __name__ == "__main__":
     parser.add_argument('--output_dir', type=str, default='data2')
     parser.add_argument('--check_market_hours', action='store_true', default=False,
                        help='Collect data only when market is open (default: True - will only collect during market hours)')
+    parser.add_argument('--log_level', choices=LOG_LEVELS, default='INFO',
+                       help='Logging level; DEBUG adds per-contract diagnostics (default: INFO)')
+    parser.add_argument('--log_sample', type=int, default=100,
+                       help='Log one of every N per-contract debug records of each kind (default: 100)')
     
     args = parser.parse_args()
     
@@ -503,7 +510,13 @@ if __name__ == "__main__":
         symbol=args.symbol,
         max_dte=args.dte_days,
         output_dir=args.output_dir,
-        check_market_hours=args.check_market_hours
+        check_market_hours=args.check_market_hours,
+        log_level=args.log_level,
+        log_sample=args.log_sample
     )
     
-    collector.run()
\ No newline at end of file
+    try:
+        collector.run()
+    finally:
+        # Flush records still queued for the log handlers
+        stop_queue_logging(collector.logger)
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Local Black-Scholes implied volatility and greeks for a whole option chain.
+
+Tradier's greeks arrive with the chain (greeks=true), are missing for some contracts
+and are only refreshed periodically. With --greeks local the collector requests chains
+without greeks and, for every snapshot, solves the implied volatility of each quoted
+contract from its mid and computes delta, gamma, theta, vega, rho and phi from it, as
+NumPy operations over the whole chain and at full precision.
+
+Implied volatility is found with Newton's method on vega, safeguarded by bisection:
+every contract keeps a bracket [MIN_VOL, MAX_VOL] that shrinks each iteration, and a
+Newton step that leaves it (or a vanishing vega far from the money) falls back to the
+bracket midpoint. Units follow Tradier: theta per calendar day, vega per volatility
+point, rho and phi per 1% change in the rate and dividend yield.
+"""
+import math
+from datetime import date, datetime, time
+from typing import Dict, List
+
+import numpy as np
+import pytz
+
+from contracts import ContractTable, Rows, column_values
+
+try:
+    from scipy.special import ndtr
+except ImportError:  # optional; math.erfc gives the same values, only slower
+    ndtr = None
+
+GREEKS_SOURCES = ('api', 'local')
+GREEK_COLUMNS = ('Delta', 'Gamma', 'Theta', 'Vega', 'Rho', 'Phi', 'IV')
+
+ET = pytz.timezone('US/Eastern')
+SETTLEMENT_TIME = time(16, 0)
+MIN_VOL, MAX_VOL = 1e-4, 5.0
+# Floor on time to expiration, so 0DTE contracts near the close stay solvable
+MIN_YEARS = 60.0 / (365 * 24 * 3600)
+SQRT_2PI = math.sqrt(2 * math.pi)
+
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    if ndtr is not None:
+        return ndtr(x)
+    return 0.5 * _erfc(-np.asarray(x, dtype=float) / math.sqrt(2))
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * np.square(x)) / SQRT_2PI
+
+
+def years_to_expiration(expiration_date: date, as_of: datetime) -> float:
+    """Years from as_of to the 4:00 PM ET close on expiration_date, at least MIN_YEARS"""
+    expiry = ET.localize(datetime.combine(expiration_date, SETTLEMENT_TIME))
+    if as_of.tzinfo is None:
+        as_of = as_of.astimezone()
+    return max(MIN_YEARS, (expiry - as_of).total_seconds() / (365 * 24 * 3600))
+
+
+def _d1_d2(spot, strikes, years, rate, dividend, vol):
+    vol_sqrt_t = vol * math.sqrt(years)
+    d1 = (np.log(spot / strikes) + (rate - dividend + 0.5 * np.square(vol)) * years) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def black_scholes_price(spot: float, strikes: np.ndarray, years: float, rate: float, dividend: float,
+                        vol: np.ndarray, is_call: np.ndarray) -> np.ndarray:
+    """European option values for arrays of strikes, volatilities and call/put flags"""
+    d1, d2 = _d1_d2(spot, strikes, years, rate, dividend, vol)
+    spot_df = spot * math.exp(-dividend * years)
+    strike_df = strikes * math.exp(-rate * years)
+    call = spot_df * norm_cdf(d1) - strike_df * norm_cdf(d2)
+    # Put-call parity
+    return np.where(is_call, call, call - spot_df + strike_df)
+
+
+def implied_volatility(prices: np.ndarray, spot: float, strikes: np.ndarray, years: float, rate: float,
+                       dividend: float, is_call: np.ndarray, tolerance: float = 1e-10,
+                       max_iterations: int = 100) -> np.ndarray:
+    """Volatility reproducing each price, NaN where none in [MIN_VOL, MAX_VOL] does"""
+    prices = np.asarray(prices, dtype=float)
+    strikes = np.asarray(strikes, dtype=float)
+    is_call = np.asarray(is_call, dtype=bool)
+    vols = np.full(len(prices), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        solvable = np.isfinite(prices) & (prices > 0) & np.isfinite(strikes) & (strikes > 0)
+        index = np.flatnonzero(solvable)
+        if len(index) == 0:
+            return vols
+        price, strike, call = prices[index], strikes[index], is_call[index]
+        low = np.full(len(index), MIN_VOL)
+        high = np.full(len(index), MAX_VOL)
+
+        # Only prices between the values at the ends of the bracket have a solution
+        in_range = (black_scholes_price(spot, strike, years, rate, dividend, low, call) < price) & \
+                   (black_scholes_price(spot, strike, years, rate, dividend, high, call) > price)
+        index, price, strike, call = index[in_range], price[in_range], strike[in_range], call[in_range]
+        low, high = low[in_range], high[in_range]
+
+        # Brenner-Subrahmanyam starting point, kept inside the bracket
+        vol = np.clip(price / spot * math.sqrt(2 * math.pi / years), 0.05, 2.0)
+        sqrt_t = math.sqrt(years)
+        spot_df = spot * math.exp(-dividend * years)
+        active = np.ones(len(index), dtype=bool)
+        for _ in range(max_iterations):
+            i = np.flatnonzero(active)
+            if len(i) == 0:
+                break
+            v = vol[i]
+            diff = black_scholes_price(spot, strike[i], years, rate, dividend, v, call[i]) - price[i]
+            d1, _ = _d1_d2(spot, strike[i], years, rate, dividend, v)
+            vega = spot_df * norm_pdf(d1) * sqrt_t
+
+            low[i] = np.where(diff < 0, v, low[i])
+            high[i] = np.where(diff > 0, v, high[i])
+            step = v - diff / vega
+            bisect = ~np.isfinite(step) | (step <= low[i]) | (step >= high[i])
+            done = (np.abs(diff) < tolerance) | (high[i] - low[i] < tolerance)
+            vol[i] = np.where(done, v, np.where(bisect, 0.5 * (low[i] + high[i]), step))
+            active[i] = ~done
+        vols[index] = vol
+    return vols
+
+
+def black_scholes_greeks(spot: float, strikes: np.ndarray, years: float, rate: float, dividend: float,
+                         vol: np.ndarray, is_call: np.ndarray) -> Dict[str, np.ndarray]:
+    """Delta, gamma, theta, vega, rho and phi arrays in Tradier's units"""
+    strikes = np.asarray(strikes, dtype=float)
+    is_call = np.asarray(is_call, dtype=bool)
+    d1, d2 = _d1_d2(spot, strikes, years, rate, dividend, vol)
+    sqrt_t = math.sqrt(years)
+    spot_df = spot * math.exp(-dividend * years)
+    strike_df = strikes * math.exp(-rate * years)
+    sign = np.where(is_call, 1.0, -1.0)
+    nd1, nd2 = norm_cdf(sign * d1), norm_cdf(sign * d2)
+    pdf = norm_pdf(d1)
+
+    theta = -spot_df * pdf * vol / (2 * sqrt_t) - sign * rate * strike_df * nd2 + sign * dividend * spot_df * nd1
+    return {
+        'Delta': sign * math.exp(-dividend * years) * nd1,
+        'Gamma': math.exp(-dividend * years) * pdf / (spot * vol * sqrt_t),
+        'Theta': theta / 365,
+        'Vega': spot_df * pdf * sqrt_t / 100,
+        'Rho': sign * strike_df * years * nd2 / 100,
+        'Phi': -sign * spot_df * years * nd1 / 100,
+    }
+
+
+def chain_greeks(prices: np.ndarray, spot: float, strikes: np.ndarray, is_call: np.ndarray,
+                 expiration_date: date, as_of: datetime, rate: float = 0.0,
+                 dividend: float = 0.0) -> Dict[str, List[float]]:
+    """GREEK_COLUMNS for one expiration's contracts, 0.0 where no volatility fits the price"""
+    years = years_to_expiration(expiration_date, as_of)
+    vols = implied_volatility(prices, spot, strikes, years, rate, dividend, is_call)
+    solved = np.isfinite(vols)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = black_scholes_greeks(spot, strikes, years, rate, dividend, np.where(solved, vols, 1.0), is_call)
+    values['IV'] = vols
+    return {column: np.where(solved, values[column], 0.0).tolist() for column in GREEK_COLUMNS}
+
+
+def apply_local_greeks(rows: Rows, spot: float, expiration_date: date, as_of: datetime,
+                       rate: float = 0.0, dividend: float = 0.0) -> Rows:
+    """Overwrite the greek and IV columns of processed rows with values solved from their Mid"""
+    if not rows:
+        return rows
+    prices = np.array(column_values(rows, 'Mid'), dtype=float)
+    strikes = np.array(column_values(rows, 'Strike Price'), dtype=float)
+    is_call = np.array([str(option_type).lower() == 'call' for option_type in column_values(rows, 'Type')],
+                       dtype=bool)
+    values = chain_greeks(prices, spot, strikes, is_call, expiration_date, as_of, rate, dividend)
+    if isinstance(rows, ContractTable):
+        rows.columns.update((column, values[column]) for column in GREEK_COLUMNS)
+        return rows
+    for i, row in enumerate(rows):
+        for column in GREEK_COLUMNS:
+            row[column] = values[column][i]
+    return rows
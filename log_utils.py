@@ -0,0 +1,91 @@
+"""
+Logging that stays off the collector's hot path.
+
+install_queue_logging gives a logger a single QueueHandler and moves its real handlers
+(file, console) onto a QueueListener thread, so a slow disk or a blocked console never
+stalls a cycle. The queue is bounded: when the listener falls behind, records are
+dropped and counted instead of blocking the caller. Installing again, e.g. for the
+next day's log file, stops the previous listener and closes its handlers first.
+
+Per-contract diagnostics also go through a Sampler, which lets through one of every N
+records per key, and are guarded by logger.isEnabledFor so nothing is formatted unless
+the level is enabled:
+
+    if logger.isEnabledFor(logging.DEBUG) and sample('ib_value'):
+        logger.debug("...", ...)
+"""
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+        self.listener: Optional[QueueListener] = None
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room so the listener always sees the sentinel, even with a full queue
+        self.queue.put(self._sentinel)
+
+
+class Sampler:
+    """Allows the first of every `every` calls for each key"""
+
+    def __init__(self, every: int = 100):
+        self.every = max(1, every)
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, key: str) -> bool:
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.every == 0
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+def _close_handlers(logger: logging.Logger):
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        listener = getattr(handler, 'listener', None)
+        if listener is not None:
+            listener.stop()
+            for target in listener.handlers:
+                target.close()
+        handler.close()
+
+
+def install_queue_logging(logger: logging.Logger, handlers: List[logging.Handler],
+                          queue_size: int = 10000) -> DroppingQueueHandler:
+    """Replace logger's handlers with a queue feeding handlers on a listener thread"""
+    _close_handlers(logger)
+    record_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(record_queue)
+    queue_handler.listener = _Listener(record_queue, *handlers, respect_handler_level=True)
+    queue_handler.listener.start()
+    logger.addHandler(queue_handler)
+    return queue_handler
+
+
+def stop_queue_logging(logger: logging.Logger):
+    """Flush queued records and close every handler of logger"""
+    _close_handlers(logger)
@@ -0,0 +1,191 @@
+"""
+Precomputed exchange session calendar.
+
+Session dates with their open and close times (including holidays and early closes) are
+built from pandas_market_calendars once for a window of about a year either side of
+today and cached on disk. Lookups outside the window extend it in memory, without
+touching the cache. Lookups then use per-date maps, so "is it open now", "when is
+the next open" and "what was the previous session" are O(1) instead of a new
+mcal schedule() call each time.
+"""
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+import pytz
+
+ET = pytz.timezone('US/Eastern')
+
+# Days of history and of future sessions to build around today
+DAYS_BACK = 400
+DAYS_AHEAD = 370
+# Rebuild once fewer future days than this are covered
+MIN_DAYS_AHEAD = 30
+
+
+class MarketCalendar:
+    """Session open/close times for one exchange over a fixed window of dates"""
+
+    def __init__(self, exchange: str = 'NYSE', cache_dir: Optional[str] = 'cache', logger=None,
+                 today: Optional[date] = None):
+        self.exchange = exchange
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.path = os.path.join(cache_dir, f'calendar_{exchange}.json') if cache_dir else None
+        self._load_or_build(today or datetime.now(ET).date())
+
+    # Building and caching
+
+    def _load_or_build(self, today: date):
+        cached = self._load()
+        if cached and cached[0] <= today - timedelta(days=7) and cached[1] >= today + timedelta(days=MIN_DAYS_AHEAD):
+            self._index(*cached)
+            return
+        start, end = today - timedelta(days=DAYS_BACK), today + timedelta(days=DAYS_AHEAD)
+        sessions = self._build(start, end)
+        self._index(start, end, sessions)
+        self._save()
+
+    def _build(self, start: date, end: date) -> List[Tuple[date, float, float]]:
+        import pandas_market_calendars as mcal
+
+        schedule = mcal.get_calendar(self.exchange).schedule(start_date=start, end_date=end)
+        if self.logger:
+            self.logger.info(f"Built {self.exchange} calendar: {len(schedule)} sessions from {start} to {end}")
+        return [(day.date(), row.market_open.timestamp(), row.market_close.timestamp())
+                for day, row in zip(schedule.index, schedule.itertuples())]
+
+    def _load(self):
+        if not self.path:
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                cached = json.load(f)
+            parse = lambda value: datetime.strptime(value, '%Y-%m-%d').date()
+            sessions = [(parse(day), float(market_open), float(market_close))
+                        for day, market_open, market_close in cached['sessions']]
+            return parse(cached['start']), parse(cached['end']), sessions
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            if self.logger:
+                self.logger.warning(f"Ignoring unreadable calendar cache {self.path}: {str(e)}")
+            return None
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'exchange': self.exchange, 'start': self.start.isoformat(), 'end': self.end.isoformat(),
+                       'sessions': [[day.isoformat(), market_open, market_close]
+                                    for day, market_open, market_close in zip(self.sessions, self.opens, self.closes)]},
+                      f)
+        os.replace(temp_path, self.path)
+
+    def _index(self, start: date, end: date, sessions: List[Tuple[date, float, float]]):
+        self.start, self.end = start, end
+        self.sessions = [day for day, _, _ in sessions]
+        self.opens = [market_open for _, market_open, _ in sessions]
+        self.closes = [market_close for _, _, market_close in sessions]
+        self._position = {day: i for i, day in enumerate(self.sessions)}
+
+        # For every calendar day in the window: index of the first session on or after it
+        # and of the last session on or before it
+        self._next, self._previous = {}, {}
+        day, following, preceding = start, 0, -1
+        while day <= end:
+            while following < len(self.sessions) and self.sessions[following] < day:
+                following += 1
+            while preceding + 1 < len(self.sessions) and self.sessions[preceding + 1] <= day:
+                preceding += 1
+            self._next[day] = following
+            self._previous[day] = preceding
+            day += timedelta(days=1)
+
+    def _ensure(self, day: date):
+        self._cover(day, day)
+
+    def _cover(self, first: date, last: date):
+        """Extend the window to include first..last; only the window around today is cached"""
+        if self.start <= first and last <= self.end:
+            return
+        start, end = min(first, self.start), max(last, self.end)
+        self._index(start, end, self._build(start, end))
+
+    # Lookups
+
+    def is_session(self, day: date) -> bool:
+        """Whether the exchange trades on this date"""
+        self._ensure(day)
+        return day in self._position
+
+    def session_times(self, day: date) -> Optional[Tuple[datetime, datetime]]:
+        """(open, close) of a session as Eastern time datetimes, or None if it isn't one"""
+        self._ensure(day)
+        i = self._position.get(day)
+        if i is None:
+            return None
+        return (datetime.fromtimestamp(self.opens[i], ET), datetime.fromtimestamp(self.closes[i], ET))
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        """Whether now falls within a session's regular hours, open and close inclusive"""
+        now = now or datetime.now(ET)
+        day = now.astimezone(ET).date()
+        self._ensure(day)
+        i = self._position.get(day)
+        return i is not None and self.opens[i] <= now.timestamp() <= self.closes[i]
+
+    def next_open(self, now: Optional[datetime] = None) -> datetime:
+        """Open of the first session that hasn't opened yet"""
+        now = now or datetime.now(ET)
+        day = now.astimezone(ET).date()
+        self._ensure(day)
+        i = self._next[day]
+        if i < len(self.sessions) and self.opens[i] <= now.timestamp():
+            i += 1
+        if i >= len(self.sessions):
+            self._cover(day, self.end + timedelta(days=DAYS_AHEAD))
+            return self.next_open(now)
+        return datetime.fromtimestamp(self.opens[i], ET)
+
+    def seconds_until_open(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now(ET)
+        return max(0.0, self.next_open(now).timestamp() - now.timestamp())
+
+    def last_session(self, day: date) -> Optional[date]:
+        """The latest session on or before day"""
+        self._ensure(day)
+        i = self._previous[day]
+        return self.sessions[i] if i >= 0 else None
+
+    def previous_session(self, day: date) -> Optional[date]:
+        """The latest session strictly before day"""
+        return self.last_session(day - timedelta(days=1))
+
+    def sessions_between(self, start: date, end: date) -> List[date]:
+        """Sessions from start to end inclusive"""
+        if start > end:
+            return []
+        self._cover(start, end)
+        return self.sessions[self._next[start]:self._previous[end] + 1]
+
+    def recent_sessions(self, day: date, count: int) -> List[date]:
+        """The last count sessions on or before day, oldest first"""
+        # About 252 sessions a year, so 1.5 calendar days per session leaves room for holidays
+        self._cover(day - timedelta(days=int(count * 1.5) + 10), day)
+        end = self._previous[day] + 1
+        return self.sessions[max(0, end - count):end]
+
+
+_default = None
+
+
+def default_calendar(logger=None) -> MarketCalendar:
+    """Shared NYSE calendar, built or loaded on first use"""
+    global _default
+    if _default is None:
+        _default = MarketCalendar('NYSE', logger=logger)
+    return _default
@@ -0,0 +1,244 @@
+"""
+Per-stage latency and volume metrics for the collector.
+
+Stages (fetch_quotes, fetch_chain, parse_chain, process, save, ...) are timed with
+Metrics.timer(), optionally labelled by DTE and annotated with payload bytes and row
+counts. A cycle that started late, after the previous one overran its schedule
+boundary, carries the overrun and the number of boundaries it missed. At the end of
+each cycle the observations are:
+
+    - appended as one line to metrics/metrics_YYYYMMDD.ndjson
+    - summarised into metrics/collector.prom in Prometheus text format (for the node
+      exporter textfile collector), with rolling p50/p95/p99 per stage
+
+Stages that finish after their cycle has moved on, such as saves on the writer thread,
+are timed with the number of the cycle they belong to. They are appended on their own,
+one line each with that cycle number, to metrics/writes_YYYYMMDD.ndjson, and count
+towards the rolling percentiles and totals, but not towards whichever cycle is open.
+
+and, if a port is given, the same Prometheus text is served at http://<host>:<port>/metrics.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(values: List[float], quantile: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(quantile * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Metrics:
+    """Thread-safe stage timings with rolling percentiles and file/HTTP export"""
+
+    def __init__(self, output_dir: str = 'metrics', window: int = 1000, prefix: str = 'options_collector',
+                 port: int = 0, logger=None):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._window = window
+        self._recent: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self._window))
+        self._totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {'count': 0, 'seconds': 0.0,
+                                                                         'bytes': 0, 'rows': 0})
+        self._cycle: List[Dict] = []
+        self._cycle_start = None
+        self._cycle_late = (0.0, 0)
+        self._cycle_times = deque(maxlen=window)
+        self.cycles = 0
+        self.overruns = 0
+        self.missed = 0
+        self._server = None
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        if port:
+            self._serve(port)
+
+    @property
+    def current_cycle(self) -> int:
+        """Number of the cycle being collected, as end_cycle will record it"""
+        return self.cycles + 1
+
+    @contextmanager
+    def timer(self, stage: str, dte: Optional[int] = None, cycle: Optional[int] = None):
+        """Time a block; set 'bytes' and/or 'rows' on the yielded dict to record volumes"""
+        observation = {}
+        start = time.perf_counter()
+        try:
+            yield observation
+        finally:
+            self.observe(stage, time.perf_counter() - start, dte=dte,
+                         size=observation.get('bytes'), rows=observation.get('rows'), cycle=cycle)
+
+    def observe(self, stage: str, seconds: float, dte: Optional[int] = None,
+                size: Optional[int] = None, rows: Optional[int] = None, cycle: Optional[int] = None):
+        """Record one stage; with cycle, as a late observation of that cycle in the writes stream"""
+        record = {'Stage': stage, 'Seconds': round(seconds, 6)}
+        if dte is not None:
+            record['DTE'] = dte
+        if size is not None:
+            record['Bytes'] = size
+        if rows is not None:
+            record['Rows'] = rows
+        with self._lock:
+            self._recent[stage].append(seconds)
+            totals = self._totals[stage]
+            totals['count'] += 1
+            totals['seconds'] += seconds
+            totals['bytes'] += size or 0
+            totals['rows'] += rows or 0
+            if cycle is None:
+                self._cycle.append(record)
+        if cycle is not None and self.output_dir:
+            record = dict({'Time': datetime.now().astimezone().strftime('%Y-%m-%dT%H:%M:%S%z'),
+                           'Cycle': cycle}, **record)
+            try:
+                self._append_ndjson(record, 'writes')
+            except OSError as e:
+                if self.logger:
+                    self.logger.warning(f"Error writing metrics: {str(e)}")
+
+    def begin_cycle(self, overrun: float = 0.0, missed: int = 0):
+        """Open a cycle; overrun and missed are how late it started and the schedule boundaries it missed"""
+        self._cycle_start = time.perf_counter()
+        self._cycle_late = (overrun, missed)
+
+    def end_cycle(self) -> Dict:
+        """Close the current cycle, export it, and return its record"""
+        seconds = time.perf_counter() - self._cycle_start if self._cycle_start is not None else 0.0
+        overrun, missed = self._cycle_late
+        with self._lock:
+            self.cycles += 1
+            self._cycle_times.append(seconds)
+            if missed:
+                self.overruns += 1
+                self.missed += missed
+            observations, self._cycle = self._cycle, []
+        record = {
+            'Time': datetime.now().astimezone().strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'Cycle': self.cycles,
+            'Cycle Seconds': round(seconds, 6),
+            'Overrun Seconds': round(overrun, 6),
+            'Missed Boundaries': missed,
+            'Fetched Bytes': sum(observation.get('Bytes', 0) for observation in observations
+                                 if observation['Stage'].startswith('fetch')),
+            'Rows': sum(observation.get('Rows', 0) for observation in observations
+                        if observation['Stage'] == 'process'),
+            'Stages': observations,
+        }
+        self._cycle_start = None
+        self._cycle_late = (0.0, 0)
+        if self.output_dir:
+            try:
+                self._append_ndjson(record)
+                self._write_prometheus()
+            except OSError as e:
+                if self.logger:
+                    self.logger.warning(f"Error writing metrics: {str(e)}")
+        return record
+
+    def percentiles(self, stage: str) -> Dict[str, float]:
+        with self._lock:
+            values = list(self._cycle_times if stage == 'cycle' else self._recent.get(stage, ()))
+        return {f'p{int(quantile * 100)}': round(percentile(values, quantile), 6) for quantile in QUANTILES}
+
+    def summary(self) -> str:
+        with self._lock:
+            stages = sorted(self._recent)
+        parts = []
+        for stage in ['cycle'] + stages:
+            p = self.percentiles(stage)
+            parts.append(f"{stage}: p50 {p['p50'] * 1000:.1f}ms p95 {p['p95'] * 1000:.1f}ms p99 {p['p99'] * 1000:.1f}ms")
+        return '; '.join(parts)
+
+    def render_prometheus(self) -> str:
+        """Current metrics in the Prometheus text exposition format"""
+        name = f'{self.prefix}_stage_seconds'
+        lines = [f'# HELP {name} Duration of collector stages over the last {self._window} observations',
+                 f'# TYPE {name} summary']
+        with self._lock:
+            recent = {stage: list(values) for stage, values in self._recent.items()}
+            totals = {stage: dict(values) for stage, values in self._totals.items()}
+            cycle_times = list(self._cycle_times)
+            cycles = self.cycles
+            overruns, missed = self.overruns, self.missed
+        for stage in sorted(recent):
+            for quantile in QUANTILES:
+                lines.append(f'{name}{{stage="{stage}",quantile="{quantile}"}} {percentile(recent[stage], quantile):.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {totals[stage]["seconds"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {totals[stage]["count"]}')
+
+        for metric, key, description in (('bytes_total', 'bytes', 'Payload bytes handled by each stage'),
+                                         ('rows_total', 'rows', 'Rows handled by each stage')):
+            lines.append(f'# HELP {self.prefix}_{metric} {description}')
+            lines.append(f'# TYPE {self.prefix}_{metric} counter')
+            for stage in sorted(totals):
+                lines.append(f'{self.prefix}_{metric}{{stage="{stage}"}} {int(totals[stage][key])}')
+
+        name = f'{self.prefix}_cycle_seconds'
+        lines.append(f'# HELP {name} Duration of whole collection cycles')
+        lines.append(f'# TYPE {name} summary')
+        for quantile in QUANTILES:
+            lines.append(f'{name}{{quantile="{quantile}"}} {percentile(cycle_times, quantile):.6f}')
+        lines.append(f'{name}_count {cycles}')
+
+        for metric, value, description in (('cycle_overruns_total', overruns, 'Cycles that started late after an overrun'),
+                                           ('missed_boundaries_total', missed, 'Schedule boundaries missed by overruns')):
+            lines.append(f'# HELP {self.prefix}_{metric} {description}')
+            lines.append(f'# TYPE {self.prefix}_{metric} counter')
+            lines.append(f'{self.prefix}_{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _append_ndjson(self, record: Dict, stream: str = 'metrics'):
+        filename = f"{stream}_{datetime.now().strftime('%Y%m%d')}.ndjson"
+        with open(os.path.join(self.output_dir, filename), 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def _write_prometheus(self):
+        # Written to a temporary file and renamed so scrapers never read a partial file
+        path = os.path.join(self.output_dir, 'collector.prom')
+        with open(path + '.tmp', 'w') as f:
+            f.write(self.render_prometheus())
+        os.replace(path + '.tmp', path)
+
+    def _serve(self, port: int):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('', port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        if self.logger:
+            self.logger.info(f"Serving metrics on port {port}")
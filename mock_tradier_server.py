@@ -0,0 +1,399 @@
+"""
+Local stand-in for the Tradier market data API.
+
+Serves /v1/markets/quotes, /options/chains, /options/expirations and /timesales from
+synthetic data (see synthetic.py) or from recorded response bodies, with configurable
+latency, jitter, error rate and per-key rate limiting reported through the same
+X-Ratelimit-* headers Tradier sends. Prices follow a random walk so successive
+snapshots differ.
+
+The streaming API is emulated too: POST /v1/markets/events/session returns a session
+whose stream URL, /v1/markets/events on this server, sends newline-delimited trade
+events for indexes and stocks and quote (and occasional trade) events for option
+symbols, at --stream_rate events per second.
+
+    python mock_tradier_server.py --port 8080 --latency_ms 80 --jitter_ms 40 --error_rate 0.01
+
+Point the collectors at it with TRADIER_BASE_URL (both scripts) or --base_url (the
+options collector), and give them any key through TRADIER_API_KEY:
+
+    TRADIER_BASE_URL=http://127.0.0.1:8080/v1/markets TRADIER_API_KEY=test \\
+        python fetch_xDTE_prices_with_IB_calculations_V2.py --schedule_period 2.5
+
+Recorded bodies are read from --data_dir when present, as quotes.json,
+options_expirations_<SYMBOL>.json, options_chains_<SYMBOL>_<YYYY-MM-DD>.json and
+timesales_<SYMBOL>.json; anything missing is generated.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from synthetic import option_mid, parse_option_symbol, synthetic_chain, synthetic_timesales
+
+PREFIX = '/v1/markets'
+
+# Starting prices for the random walk; other symbols start at 100
+START_PRICES = {'SPX': 5800.0, 'SPY': 580.0, 'XSP': 580.0, 'NDX': 20000.0, 'RUT': 2200.0,
+                'VIX': 15.0, 'VIX1D': 12.0}
+
+ERROR_STATUSES = (500, 502, 503)
+
+# Option roots whose underlying has a different symbol
+UNDERLYINGS = {'SPXW': 'SPX', 'NDXP': 'NDX', 'RUTW': 'RUT', 'VIXW': 'VIX'}
+
+
+class MockTradierServer:
+    """Threaded HTTP server answering Tradier market data requests"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0, rate_limit: int = 120,
+                 rate_window: float = 60.0, strikes: int = 200, missing_ratio: float = 0.05,
+                 expiration_days: int = 60, data_dir: Optional[str] = None, seed: int = 0,
+                 stream_rate: float = 50.0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.strikes = strikes
+        self.missing_ratio = missing_ratio
+        self.expiration_days = expiration_days
+        self.data_dir = data_dir
+        self.stream_rate = stream_rate
+        self._sessions = set()
+        self._stopping = threading.Event()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._prices: Dict[str, float] = {}
+        # API key -> (window expiry, requests used in the window)
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._counts: Dict[str, int] = {}
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}{PREFIX}'
+
+    def start(self) -> 'MockTradierServer':
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='mock-tradier', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self._stopping.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        """Responses sent, by endpoint and status"""
+        with self._lock:
+            return dict(self._counts)
+
+    # Request handling
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self._handle(None)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self._handle(self.rfile.read(length).decode() if length else '')
+
+            def _handle(self, form):
+                url = urlparse(self.path)
+                if url.path.rstrip('/') == f'{PREFIX}/events':
+                    params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                    params.update({name: values[-1] for name, values in parse_qs(form or '').items()})
+                    server.stream(self, params)
+                    return
+                status, headers, body = server.respond(self.path, self.headers.get('Authorization', ''),
+                                                       form)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path: str, api_key: str, form: Optional[str] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """(status, headers, body) for a request path such as /v1/markets/quotes?symbols=SPX"""
+        url = urlparse(path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        params.update({name: values[-1] for name, values in parse_qs(form or '').items()})
+        endpoint = url.path[len(PREFIX):].strip('/') if url.path.startswith(PREFIX) else None
+
+        delay = max(0.0, self.latency + self._uniform(-self.jitter, self.jitter))
+        if delay:
+            time.sleep(delay)
+
+        allowed, used, expiry = self._take(api_key)
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Ratelimit-Allowed': str(allowed),
+            'X-Ratelimit-Used': str(min(used, allowed)),
+            'X-Ratelimit-Available': str(max(allowed - used, 0)),
+            'X-Ratelimit-Expiry': str(int(expiry * 1000)),
+        }
+        if used > allowed:
+            headers['Retry-After'] = str(max(1, int(expiry - time.time() + 0.999)))
+            return self._reply(endpoint, 429, headers, b'Quota Violation')
+        if self._uniform(0.0, 1.0) < self.error_rate:
+            return self._reply(endpoint, self._random.choice(ERROR_STATUSES), headers, b'Service Unavailable')
+
+        routes = {
+            'quotes': self._quotes,
+            'options/chains': self._chains,
+            'options/expirations': self._expirations,
+            'timesales': self._timesales,
+            'events/session': self._session,
+        }
+        if endpoint not in routes:
+            return self._reply(endpoint, 404, headers, b'Not Found')
+        try:
+            body = routes[endpoint](params)
+        except (KeyError, ValueError) as e:
+            return self._reply(endpoint, 400, headers, f'Invalid request: {e}'.encode())
+        return self._reply(endpoint, 200, headers, body)
+
+    def _reply(self, endpoint: Optional[str], status: int, headers: Dict[str, str],
+               body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        self._count(endpoint, status)
+        if status != 200:
+            headers = dict(headers, **{'Content-Type': 'text/plain'})
+        return status, headers, body
+
+    def _take(self, api_key: str) -> Tuple[int, int, float]:
+        """Count a request against the key's window; returns (allowed, used, window expiry)"""
+        now = time.time()
+        with self._lock:
+            expiry, used = self._windows.get(api_key, (0.0, 0))
+            if now >= expiry:
+                expiry, used = now + self.rate_window, 0
+            used += 1
+            self._windows[api_key] = (expiry, used)
+        return self.rate_limit, used, expiry
+
+    def stream(self, handler: BaseHTTPRequestHandler, params: Dict[str, str]):
+        """Write events for the requested symbols until the client disconnects or the server stops"""
+        with self._lock:
+            known = params.get('sessionid') in self._sessions
+        symbols = [symbol for symbol in params.get('symbols', '').split(',') if symbol]
+        if not known or not symbols:
+            body = b'Invalid session' if not known else b'No symbols'
+            handler.send_response(400)
+            handler.send_header('Content-Type', 'text/plain')
+            handler.send_header('Content-Length', str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+            return
+        filters = set(params.get('filter', 'quote,trade,summary').split(','))
+
+        # No Content-Length: the body runs until the connection closes
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+        handler.close_connection = True
+        self._count('events', 200)
+        interval = 1.0 / self.stream_rate if self.stream_rate > 0 else 1.0
+        try:
+            while not self._stopping.is_set():
+                event = self._event(self._random_choice(symbols))
+                if event['type'] in filters:
+                    handler.wfile.write(json.dumps(event).encode() + b'\n')
+                    handler.wfile.flush()
+                self._stopping.wait(interval)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _event(self, symbol: str) -> Dict:
+        now = str(int(time.time() * 1000))
+        option = parse_option_symbol(symbol)
+        if option is None or self._uniform(0.0, 1.0) < 0.1:
+            if option is None:
+                price = self._price(symbol)
+            else:
+                root, _, option_type, strike = option
+                price = round(option_mid(option_type, strike, self._current(UNDERLYINGS.get(root, root))), 2)
+            return {'type': 'trade', 'symbol': symbol, 'exch': 'C', 'price': f'{price}', 'size': '1',
+                    'cvol': f'{self._random_int(0, 10000)}', 'date': now, 'last': f'{price}'}
+        root, _, option_type, strike = option
+        mid = option_mid(option_type, strike, self._current(UNDERLYINGS.get(root, root)), self._uniform(0.9, 1.1))
+        return {'type': 'quote', 'symbol': symbol,
+                'bid': round(mid * 0.98, 2), 'bidsz': self._random_int(1, 200), 'bidexch': 'C', 'biddate': now,
+                'ask': round(mid * 1.02, 2), 'asksz': self._random_int(1, 200), 'askexch': 'C', 'askdate': now}
+
+    def _current(self, symbol: str) -> float:
+        with self._lock:
+            price = self._prices.get(symbol)
+        return price if price is not None else self._price(symbol)
+
+    def _random_choice(self, values: List[str]) -> str:
+        with self._lock:
+            return self._random.choice(values)
+
+    def _random_int(self, low: int, high: int) -> int:
+        with self._lock:
+            return self._random.randint(low, high)
+
+    def _count(self, endpoint: Optional[str], status: int):
+        with self._lock:
+            key = f'{endpoint} {status}'
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def _uniform(self, low: float, high: float) -> float:
+        with self._lock:
+            return self._random.uniform(low, high)
+
+    def _price(self, symbol: str) -> float:
+        """Next step of the symbol's random walk"""
+        with self._lock:
+            price = self._prices.get(symbol, START_PRICES.get(symbol, 100.0))
+            price = max(0.01, price * (1 + self._random.gauss(0, 0.0002)))
+            self._prices[symbol] = price
+            return round(price, 2)
+
+    def _recorded(self, name: str) -> Optional[bytes]:
+        if not self.data_dir:
+            return None
+        path = os.path.join(self.data_dir, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    # Endpoints
+
+    def _quotes(self, params: Dict[str, str]) -> bytes:
+        recorded = self._recorded('quotes.json')
+        if recorded is not None:
+            return recorded
+        quotes = []
+        for symbol in filter(None, params['symbols'].split(',')):
+            last = self._price(symbol)
+            quotes.append({'symbol': symbol, 'description': symbol, 'exch': 'C', 'type': 'index',
+                           'last': last, 'change': 0.0, 'volume': 0, 'open': last, 'high': last,
+                           'low': last, 'close': None, 'bid': None, 'ask': None,
+                           'trade_date': int(time.time() * 1000)})
+        # Tradier returns a single quote as an object rather than a list
+        return json.dumps({'quotes': {'quote': quotes[0] if len(quotes) == 1 else quotes}}).encode()
+
+    def _chains(self, params: Dict[str, str]) -> bytes:
+        symbol, expiration = params['symbol'], params['expiration']
+        recorded = self._recorded(f'options_chains_{symbol}_{expiration}.json')
+        if recorded is not None:
+            return recorded
+        expiration_date = datetime.strptime(expiration, '%Y-%m-%d').date()
+        price = self._prices.get(symbol) or self._price(symbol)
+        with self._lock:
+            seed = self._random.randrange(2 ** 32)
+        chain = synthetic_chain(self.strikes, price=price, missing_ratio=self.missing_ratio,
+                                expiration=expiration_date, seed=seed)
+        if params.get('greeks', 'false') != 'true':
+            for contract in chain:
+                contract['greeks'] = None
+        return json.dumps({'options': {'option': chain}}).encode()
+
+    def _expirations(self, params: Dict[str, str]) -> bytes:
+        symbol = params['symbol']
+        recorded = self._recorded(f'options_expirations_{symbol}.json')
+        if recorded is not None:
+            return recorded
+        today = date.today()
+        dates = [today + timedelta(days=days) for days in range(self.expiration_days + 1)]
+        return json.dumps({'expirations': {'date': [day.strftime('%Y-%m-%d') for day in dates
+                                                     if day.weekday() < 5]}}).encode()
+
+    def _session(self, params: Dict[str, str]) -> bytes:
+        session_id = str(uuid.uuid4())
+        with self._lock:
+            self._sessions.add(session_id)
+        return json.dumps({'stream': {'url': f'{self.base_url}/events', 'sessionid': session_id}}).encode()
+
+    def _timesales(self, params: Dict[str, str]) -> bytes:
+        symbol = params['symbol']
+        recorded = self._recorded(f'timesales_{symbol}.json')
+        if recorded is not None:
+            return recorded
+        start = datetime.strptime(params['start'][:10], '%Y-%m-%d').date()
+        end = datetime.strptime(params['end'][:10], '%Y-%m-%d').date()
+        bars: List[Dict] = []
+        day = start
+        while day <= end:
+            if day.weekday() < 5:
+                bars.extend(synthetic_timesales(day.strftime('%Y-%m-%d'), seed=day.toordinal()))
+            day += timedelta(days=1)
+        return json.dumps({'series': {'data': bars} if bars else None}).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve synthetic or recorded Tradier market data locally')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency_ms', type=float, default=0.0,
+                        help='Added latency per response in milliseconds (default: 0)')
+    parser.add_argument('--jitter_ms', type=float, default=0.0,
+                        help='Uniform +/- variation of the latency in milliseconds (default: 0)')
+    parser.add_argument('--error_rate', type=float, default=0.0,
+                        help='Fraction of requests answered with a 5xx error (default: 0)')
+    parser.add_argument('--rate_limit', type=int, default=120,
+                        help='Requests allowed per API key per window before 429s (default: 120)')
+    parser.add_argument('--rate_window', type=float, default=60.0,
+                        help='Rate-limit window in seconds (default: 60)')
+    parser.add_argument('--strikes', type=int, default=200,
+                        help='Strikes per synthetic chain, each with a call and a put (default: 200)')
+    parser.add_argument('--missing_ratio', type=float, default=0.05,
+                        help='Fraction of synthetic contracts without quotes or greeks (default: 0.05)')
+    parser.add_argument('--data_dir', type=str, default=None,
+                        help='Directory of recorded response bodies to serve instead of synthetic data')
+    parser.add_argument('--stream_rate', type=float, default=50.0,
+                        help='Events per second on each streaming connection (default: 50)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for prices, latency and errors (default: 0)')
+    args = parser.parse_args()
+
+    server = MockTradierServer(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               error_rate=args.error_rate, rate_limit=args.rate_limit,
+                               rate_window=args.rate_window, strikes=args.strikes,
+                               missing_ratio=args.missing_ratio, data_dir=args.data_dir, seed=args.seed,
+                               stream_rate=args.stream_rate)
+    print(f"Serving mock Tradier API at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Responses: {server.stats()}")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
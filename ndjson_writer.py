@@ -0,0 +1,87 @@
+"""
+Snapshot-at-a-time NDJSON encoding.
+
+Produces exactly the bytes of writing json.dumps(row) + '\\n' for every row, but works a
+column at a time: each column is encoded in one call, columns that hold the same value
+in every row (Time, Symbol, Price, Expiration, ...) are encoded once into a per-snapshot
+row template, and the snapshot is returned as a single string for one write. A
+ContractTable is encoded straight from its column lists.
+
+orjson is used for numeric columns when it is installed and its output is identical to
+json's for that column (no exponents, values below 1e-4, NaN or infinities); otherwise
+json is used.
+"""
+import json
+import re
+from json.encoder import encode_basestring_ascii
+from typing import List, Sequence
+
+from contracts import ContractTable, Rows
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_NUMBER_TYPES = {int, float}
+# Scalars whose JSON text never contains ', ', so a whole column can be encoded and split
+_SCALAR_TYPES = {int, float, bool, type(None)}
+# orjson writes values in [1e-5, 1e-4) as plain decimals (0.000023) where json writes 2.3e-05
+_SMALL_DECIMAL = re.compile(r'(?<![0-9.])-?0\.0000')
+
+
+def _encode_value(value) -> str:
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+
+def encode_column(values) -> List[str]:
+    """JSON text of each value in a column, as json.dumps would write it"""
+    types = set(map(type, values))
+    if types <= _SCALAR_TYPES:
+        if orjson is not None and types <= _NUMBER_TYPES:
+            try:
+                text = orjson.dumps(values).decode()
+            except TypeError:  # ints beyond 64 bits
+                text = None
+            # orjson writes 1e-5 for json's 1e-05, 0.00001 for 1e-05 and null for NaN/inf; use json for those
+            if (text is not None and 'e' not in text and 'n' not in text
+                    and not _SMALL_DECIMAL.search(text)):
+                return text[1:-1].split(',')
+        return json.dumps(values)[1:-1].split(', ')
+    if types == {str}:
+        encoded = {value: encode_basestring_ascii(value) for value in set(values)}
+        return list(map(encoded.__getitem__, values))
+    return [_encode_value(value) for value in values]
+
+
+def encode_rows(rows: Rows) -> str:
+    """Encode rows as NDJSON text, byte-for-byte equal to json.dumps(row) + '\\n' per row"""
+    if not rows:
+        return ''
+    if isinstance(rows, ContractTable):
+        return encode_columns(rows.keys(), list(rows.columns.values()), len(rows))
+    keys = tuple(rows[0])
+    if not all(tuple(row) == keys for row in rows):
+        return ''.join(json.dumps(row) + '\n' for row in rows)
+    return encode_columns(keys, [list(column) for column in zip(*map(dict.values, rows))], len(rows))
+
+
+def encode_columns(keys: Sequence[str], columns: Sequence[List], length: int) -> str:
+    """NDJSON text of length rows given as one list of values per key"""
+    parts = []
+    varying = []
+    for key, column in zip(keys, columns):
+        encoded = encode_column(column)
+        prefix = json.dumps(key).replace('%', '%%') + ': '
+        if encoded.count(encoded[0]) == len(encoded):
+            parts.append(prefix + encoded[0].replace('%', '%%'))
+        else:
+            parts.append(prefix + '%s')
+            varying.append(encoded)
+    template = '{' + ', '.join(parts) + '}\n'
+
+    if not varying:
+        return (template % ()) * length
+    return ''.join([template % values for values in zip(*varying)])
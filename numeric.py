@@ -0,0 +1,51 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def round2(values: np.ndarray) -> np.ndarray:
+    """
+    Round an array to 2 decimals with exactly the results of Python's round(x, 2).
+
+    np.round scales by 100 before rounding, so where the scaled value sits within float
+    error of a .5 tie it can disagree with round(). Those elements fall back to round().
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, 2)
+    with np.errstate(invalid='ignore'):
+        scaled = values * 100.0
+        ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        index = np.flatnonzero(ties)
+        rounded[index] = [round(float(value), 2) for value in values[index]]
+    return rounded
+
+
+def parse_floats(column: Sequence, default: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse a column of raw API values the way float(x) if x is not None else default does.
+
+    Returns (values, missing, valid): missing marks None entries (set to default) and
+    valid is False where float() would have raised.
+    """
+    raw = np.array(column, dtype=object)
+    missing = np.equal(raw, None)
+    filled = np.where(missing, default, raw)
+    try:
+        return filled.astype(float), missing, np.ones(len(raw), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+
+    values = np.zeros(len(raw), dtype=float)
+    valid = np.ones(len(raw), dtype=bool)
+    for i, value in enumerate(filled):
+        try:
+            values[i] = float(value)
+        except (TypeError, ValueError):
+            valid[i] = False
+    return values, missing, valid
+
+
+def with_int_zero(values: np.ndarray, keep: np.ndarray) -> List:
+    """Python values where keep is set, int 0 elsewhere"""
+    return [value if flag else 0 for value, flag in zip(values.tolist(), keep.tolist())]
@@ -0,0 +1,174 @@
+"""
+Columnar Parquet output for the options collector.
+
+Each processed snapshot becomes one Arrow record batch (one Parquet row group), written
+into hive-style partitions:
+
+    {root}/symbol=SPX/date=20261017/dte=0/part-0001-093000.parquet
+
+Files are written under a hidden name and renamed into place when closed, so readers
+never see a half-written file. A file is closed on date rollover, on shutdown and after
+snapshots_per_file snapshots to bound what an unclean exit can lose.
+"""
+import os
+from datetime import date
+from typing import Dict, List, Optional
+
+from contracts import Rows, column_names, column_values
+
+# Columns with non-float types; everything else (prices, greeks, strategy values) is float64
+INT_COLUMNS = ['DTE', 'Volume', 'Average Volume', 'Last Volume', 'Bid Size', 'Ask Size',
+               'Open Interest', 'Contract Size']
+STRING_COLUMNS = ['Symbol', 'Option', 'Type', 'Description', 'Exchange', 'Bid Exchange',
+                  'Ask Exchange', 'Expiration Type', 'Root Symbol', 'Frame']
+# Tradier epoch-millisecond fields, 'N/A' when missing
+EPOCH_MS_COLUMNS = ['Trade Date', 'Bid Date', 'Ask Date']
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("pyarrow is required for parquet output. Install it with: pip install pyarrow")
+
+
+def arrow_type(column: str):
+    """Arrow type used for an output column"""
+    import pyarrow as pa
+
+    if column == 'Time':
+        return pa.timestamp('s', tz='UTC')
+    if column == 'Expiration':
+        return pa.date32()
+    if column == 'ATM':
+        return pa.int8()
+    if column in INT_COLUMNS:
+        return pa.int64()
+    if column in STRING_COLUMNS:
+        return pa.string()
+    if column in EPOCH_MS_COLUMNS:
+        return pa.timestamp('ms', tz='UTC')
+    return pa.float64()
+
+
+def schema_for(columns: List[str]):
+    """Arrow schema for a list of output columns, in order"""
+    import pyarrow as pa
+
+    return pa.schema([pa.field(column, arrow_type(column)) for column in columns])
+
+
+def rows_to_batch(rows: Rows, schema):
+    """Convert processed rows (a ContractTable or row dicts) into a typed Arrow record batch"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arrays = []
+    for field in schema:
+        values = column_values(rows, field.name)
+        if field.name == 'Time':
+            parsed = pc.strptime(pa.array(values, pa.string()), format='%Y-%m-%dT%H:%M:%S%z', unit='s')
+            arrays.append(parsed.cast(field.type))
+        elif field.name == 'Expiration':
+            arrays.append(pa.array(values, pa.string()).cast(field.type))
+        elif field.name in EPOCH_MS_COLUMNS:
+            epoch_ms = [value if isinstance(value, (int, float)) and value else None for value in values]
+            arrays.append(pa.array(epoch_ms, pa.int64()).cast(field.type))
+        elif pa.types.is_string(field.type):
+            arrays.append(pa.array([None if value is None else str(value) for value in values], field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _PartitionWriter:
+    """An open Parquet file for one symbol/date/DTE partition"""
+
+    def __init__(self, directory: str, schema, first_time: str, compression: str):
+        import pyarrow.parquet as pq
+
+        os.makedirs(directory, exist_ok=True)
+        # Sequence first so files list in write order; the time is that of the first snapshot
+        sequence = sum(1 for name in os.listdir(directory) if name.endswith('.parquet')) + 1
+        name = f"part-{sequence:04d}-{first_time[11:19].replace(':', '')}.parquet"
+        self.final_path = os.path.join(directory, name)
+        self.temp_path = os.path.join(directory, f'.{name}.inprogress')
+        self.schema = schema
+        self.snapshots = 0
+        self.writer = pq.ParquetWriter(self.temp_path, schema, compression=compression)
+
+    def write(self, batch):
+        self.writer.write_batch(batch)
+        self.snapshots += 1
+
+    def close(self):
+        self.writer.close()
+        os.replace(self.temp_path, self.final_path)
+
+
+class ParquetSink:
+    """Appends one record batch per snapshot to Parquet files partitioned by symbol/date/DTE"""
+
+    def __init__(self, root_dir: str, snapshots_per_file: int = 120, compression: str = 'zstd',
+                 logger=None):
+        _require_pyarrow()
+        self.root_dir = root_dir
+        self.snapshots_per_file = snapshots_per_file
+        self.compression = compression
+        self.logger = logger
+        self._writers: Dict[tuple, _PartitionWriter] = {}
+
+    def partition_dir(self, symbol: str, dte: int, current_date: date) -> str:
+        return os.path.join(self.root_dir, f'symbol={symbol}',
+                            f"date={current_date.strftime('%Y%m%d')}", f'dte={dte}')
+
+    def write(self, rows: Rows, symbol: str, dte: int, current_date: date) -> Optional[str]:
+        """Write one snapshot; returns the path the data will be available at once closed"""
+        if not rows:
+            return None
+        key = (symbol, dte, current_date)
+        schema = schema_for(column_names(rows))
+
+        writer = self._writers.get(key)
+        if writer is not None and (not writer.schema.equals(schema)
+                                   or writer.snapshots >= self.snapshots_per_file):
+            self._close(key)
+            writer = None
+        if writer is None:
+            writer = _PartitionWriter(self.partition_dir(symbol, dte, current_date), schema,
+                                      column_values(rows, 'Time')[0], self.compression)
+            self._writers[key] = writer
+
+        writer.write(rows_to_batch(rows, schema))
+        return writer.final_path
+
+    def _close(self, key):
+        writer = self._writers.pop(key)
+        writer.close()
+        if self.logger:
+            self.logger.info(f"Closed parquet file {writer.final_path} ({writer.snapshots} snapshots)")
+
+    def close_date(self, current_date: date):
+        """Close every open file of a date, e.g. on the midnight rollover"""
+        for key in [key for key in self._writers if key[2] == current_date]:
+            self._close(key)
+
+    def close(self):
+        for key in list(self._writers):
+            self._close(key)
+
+
+def read_day(root_dir: str, symbol: str, day: str, dte: Optional[int] = None):
+    """
+    Load one day of snapshots as a pandas DataFrame.
+
+    day is 'YYYYMMDD'; pass dte to read a single expiry. Files still being written are skipped.
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    path = os.path.join(root_dir, f'symbol={symbol}', f'date={day}')
+    if dte is not None:
+        path = os.path.join(path, f'dte={dte}')
+    dataset = ds.dataset(path, format='parquet')
+    return dataset.to_table().to_pandas()
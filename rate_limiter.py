@@ -0,0 +1,174 @@
+"""
+Token-bucket request pacing driven by Tradier's rate-limit headers.
+
+Every response carries X-Ratelimit-Allowed, -Used, -Available and -Expiry (epoch ms at
+which the current window resets). The quota is per API key, so the headers also reflect
+requests made by other collectors using the same key. After each response the refill
+rate is set to spread the remaining quota (less a small reserve) evenly over the rest of
+the window, which keeps every collector on the key just under the limit. Before the first
+response, and when no headers are returned, requests_per_minute is used.
+
+Collectors running as worker processes of one supervisor also draw from a SharedBudget,
+a token bucket in shared memory that caps their combined request rate.
+"""
+import multiprocessing
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional
+
+
+def _header(headers: Mapping, name: str) -> Optional[float]:
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Thread-safe token bucket whose rate adapts to the remaining server-side quota"""
+
+    def __init__(self, requests_per_minute: float = 120, burst: int = 10, reserve: int = 2,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep,
+                 shared: Optional['SharedBudget'] = None):
+        self.default_rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.reserve = reserve
+        self.clock = clock
+        self.sleep = sleep
+        # Budget shared with other processes, drawn from after this bucket
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._rate = self.default_rate
+        self._tokens = float(burst)
+        self._updated = clock()
+        # Last known server-side window
+        self._allowed = None
+        self._available = None
+        self._expiry = None
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._refill(now)
+                if self._expiry is not None and now >= self._expiry:
+                    # The window has reset; the next response will report the new one
+                    self._available = self._allowed
+                    self._expiry = None
+                    self._rate = self.default_rate
+                if self._available is not None and self._available <= self.reserve and self._expiry is not None:
+                    delay = self._expiry - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    if self._available is not None:
+                        self._available -= 1
+                    self.requests += 1
+                    self.waited += waited
+                    break
+                else:
+                    delay = (1 - self._tokens) / self._rate
+                    if self._expiry is not None:
+                        delay = min(delay, self._expiry - now)
+            delay = max(delay, 0.001)
+            self.sleep(delay)
+            waited += delay
+        if self.shared is not None:
+            shared_wait = self.shared.acquire()
+            with self._lock:
+                self.waited += shared_wait
+            waited += shared_wait
+        return waited
+
+    def update(self, headers: Mapping):
+        """Adjust pacing from a response's X-Ratelimit-* headers"""
+        allowed = _header(headers, 'X-Ratelimit-Allowed')
+        available = _header(headers, 'X-Ratelimit-Available')
+        expiry = _header(headers, 'X-Ratelimit-Expiry')
+        if available is None or expiry is None:
+            return
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self._allowed = allowed if allowed is not None else self._allowed
+            self._available = available
+            self._expiry = expiry / 1000.0
+            remaining = max(self._expiry - now, 1.0)
+            self._rate = max((available - self.reserve) / remaining, 0.01)
+
+    def record_throttled(self, retry_after: Optional[float] = None):
+        """A request was rejected for exceeding the quota; stop until the window resets"""
+        with self._lock:
+            now = self.clock()
+            self.throttled += 1
+            self._tokens = 0.0
+            self._available = 0
+            if retry_after is not None:
+                self._expiry = now + retry_after
+            elif self._expiry is None or self._expiry <= now:
+                self._expiry = now + 60.0
+
+    def headroom(self) -> Dict:
+        """Current pacing state: server quota left in the window and the local bucket"""
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            return {
+                'allowed': self._allowed,
+                'available': self._available,
+                'resets_in': round(max(self._expiry - now, 0.0), 1) if self._expiry is not None else None,
+                'rate_per_minute': round(self._rate * 60, 1),
+                'tokens': round(self._tokens, 2),
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'waited_seconds': round(self.waited, 2),
+            }
+
+    def _refill(self, now: float):
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class SharedBudget:
+    """Fixed-rate token bucket in shared memory, for pacing several processes together
+
+    Create it in the parent and pass it to each multiprocessing.Process as an argument.
+    """
+
+    def __init__(self, requests_per_minute: float = 120, burst: int = 10, context=None):
+        context = context or multiprocessing.get_context()
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self._lock = context.Lock()
+        self._tokens = context.RawValue('d', float(burst))
+        self._updated = context.RawValue('d', time.time())
+        self._requests = context.RawValue('q', 0)
+        self._waited = context.RawValue('d', 0.0)
+
+    def acquire(self) -> float:
+        """Block until the shared budget allows a request; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens.value = min(float(self.burst),
+                                         self._tokens.value + (now - self._updated.value) * self.rate)
+                self._updated.value = now
+                if self._tokens.value >= 1:
+                    self._tokens.value -= 1
+                    self._requests.value += 1
+                    self._waited.value += waited
+                    return waited
+                delay = max((1 - self._tokens.value) / self.rate, 0.001)
+            time.sleep(delay)
+            waited += delay
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'rate_per_minute': round(self.rate * 60, 1), 'requests': self._requests.value,
+                    'waited_seconds': round(self._waited.value, 2)}
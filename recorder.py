@@ -0,0 +1,104 @@
+"""
+Raw response recording for later replay.
+
+In record mode the collector appends one frame per cycle to
+recordings/<SYMBOL>_<YYYYMMDD>.frames.gz, holding the cycle time, the quotes and every
+expiration's option chain as returned by the API, before any processing:
+
+    {"Time": "2025-01-02T10:30:00-0500", "Symbol": "SPX", "Quotes": {"SPX": {...}, ...},
+     "Chains": [{"DTE": 0, "Expiration": "2025-01-02", "Options": [...]}, ...]}
+
+Frames are newline-delimited JSON in a single gzip stream that is flushed after each
+frame, so a file cut short by a crash is still readable up to its last complete frame.
+Replaying a recording (MarketDataCollector.replay, or --replay on the command line)
+runs the frames back through processing and the configured outputs, so fixes to the
+derived columns can be applied to past days.
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional; frames are the same JSON either way
+    orjson = None
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S%z'
+
+
+def _dumps(frame: Dict) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(frame)
+        except TypeError:  # e.g. integers beyond 64 bits
+            pass
+    return json.dumps(frame).encode()
+
+
+class FrameRecorder:
+    """Appends per-cycle raw response frames to one gzip file per symbol and day"""
+
+    def __init__(self, root_dir: str = 'recordings', symbol: str = 'SPX', compresslevel: int = 6,
+                 logger=None):
+        self.root_dir = root_dir
+        self.symbol = symbol
+        self.compresslevel = compresslevel
+        self.logger = logger
+        self.frames = 0
+        self._file = None
+        self._date = None
+        os.makedirs(root_dir, exist_ok=True)
+
+    def path_for(self, day: date) -> str:
+        return os.path.join(self.root_dir, f"{self.symbol}_{day.strftime('%Y%m%d')}.frames.gz")
+
+    def record(self, as_of: datetime, market_data: Dict,
+               chains: List[Tuple[int, date, Optional[List[Dict]]]]):
+        """Append a frame of the quotes and (dte, expiration, options) chains fetched at as_of"""
+        day = as_of.date()
+        if day != self._date:
+            self.close()
+            # Appending to an existing day's file adds a gzip member, which readers continue through
+            self._file = gzip.open(self.path_for(day), 'ab', compresslevel=self.compresslevel)
+            self._date = day
+        frame = {
+            'Time': as_of.strftime(TIME_FORMAT),
+            'Symbol': self.symbol,
+            'Quotes': market_data,
+            'Chains': [{'DTE': dte, 'Expiration': expiration_date.strftime('%Y-%m-%d'), 'Options': options_data}
+                       for dte, expiration_date, options_data in chains],
+        }
+        self._file.write(_dumps(frame) + b'\n')
+        self._file.flush()
+        self.frames += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._date = None
+
+
+def read_frames(path: str, logger=None) -> Iterator[Dict]:
+    """Frames of a recording in order, stopping quietly at a truncated end"""
+    with gzip.open(path, 'rb') as f:
+        try:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, ValueError) as e:
+            if logger:
+                logger.warning(f"Recording {path} ends with an incomplete frame: {str(e)}")
+
+
+def frame_time(frame: Dict) -> datetime:
+    return datetime.strptime(frame['Time'], TIME_FORMAT)
+
+
+def frame_chains(frame: Dict) -> Iterator[Tuple[int, date, Optional[List[Dict]]]]:
+    """(dte, expiration_date, options_data) for each chain of a frame"""
+    for chain in frame['Chains']:
+        yield chain['DTE'], datetime.strptime(chain['Expiration'], '%Y-%m-%d').date(), chain['Options']
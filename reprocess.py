@@ -0,0 +1,261 @@
+"""
+Recompute the strategy value columns of stored collector output.
+
+Scans <input_dir> for {symbol}_{dte}DTE_{YYYYMMDD}.ndjson/.csv files in a date range and,
+snapshot by snapshot, rebuilds the strike index from the stored Bid/Ask of every
+contract and values the configured strategy set, replacing the strategy columns the
+file was written with. Everything else in each row is kept as stored, and CSV files keep
+their own header apart from the strategy columns. CDC files are rebuilt into full
+snapshots, revalued and encoded again.
+
+Files are spread across a process pool, largest first, and each result is written to a
+temporary file and renamed into place, either in --output_dir or over the original with
+--in_place. --in_place skips files dated today or later by the host's local date, which
+is how the collector names its files, as a running collector may still be appending to
+them, unless --include_today is given:
+
+    python reprocess.py data2 --start 20250101 --end 20250131 --strategies strategies.json --output_dir backfill
+    python reprocess.py data2 --symbol SPX --in_place --workers 16
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from cdc import CdcEncoder, rebuild
+from ndjson_writer import encode_rows
+from numeric import round2
+from strategies import ROW_HEAD, ROW_TAIL, Strategy, compute_strategy_columns, load_strategies
+from strike_index import StrikeIndex
+
+FILE_PATTERN = re.compile(r'^(?P<symbol>[A-Z0-9]+)_(?P<dte>\d+)DTE_(?P<date>\d{8})\.(?P<format>ndjson|csv)$')
+FORMATS = ('ndjson', 'csv')
+
+
+def find_files(input_dir: str, start: Optional[str] = None, end: Optional[str] = None,
+               symbol: Optional[str] = None, formats: Iterable[str] = FORMATS) -> List[str]:
+    """Output files in input_dir dated start..end (YYYYMMDD, inclusive), optionally for one symbol"""
+    paths = []
+    for name in sorted(os.listdir(input_dir)):
+        match = FILE_PATTERN.match(name)
+        if not match or match['format'] not in formats:
+            continue
+        if symbol and match['symbol'] != symbol:
+            continue
+        if (start and match['date'] < start) or (end and match['date'] > end):
+            continue
+        paths.append(os.path.join(input_dir, name))
+    return paths
+
+
+def file_date_today() -> str:
+    """Today as the collector dates its output files: the host's local date, YYYYMMDD"""
+    return date.today().strftime('%Y%m%d')
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def revalue(rows: List[Dict], strategies: List[Strategy], strike_tolerance: float = 0.0) -> List[Dict]:
+    """A snapshot's rows with the strategy columns recomputed from their Bid/Ask"""
+    if not rows:
+        return rows
+    strikes = np.array([_number(row['Strike Price']) for row in rows])
+    bids = np.array([_number(row['Bid']) for row in rows])
+    asks = np.array([_number(row['Ask']) for row in rows])
+    quoted = (bids > 0) | (asks > 0)
+    # Mids as the collector computes them: rounded, or int 0 for an unquoted contract
+    mids = np.where(quoted, round2((bids + asks) / 2), 0.0)
+    types = np.array([str(row['Type']).lower() for row in rows])
+    strike_index = StrikeIndex.from_arrays(strikes, mids, quoted,
+                                           {'call': types == 'call', 'put': types == 'put'},
+                                           strike_tolerance)
+    values = compute_strategy_columns(strike_index, strikes, strategies)
+
+    # Any stored column outside the row head and tail is a strategy value and is replaced
+    head, tail = set(ROW_HEAD), set(ROW_TAIL) | {'Frame'}
+    revalued = []
+    for i, row in enumerate(rows):
+        new_row = {key: value for key, value in row.items() if key in head}
+        for column, column_values in values.items():
+            new_row[column] = column_values[i]
+        new_row.update((key, value) for key, value in row.items() if key in tail)
+        revalued.append(new_row)
+    return revalued
+
+
+def revalued_columns(columns: List[str], strategies: List[Strategy]) -> List[str]:
+    """A stored header with its strategy value columns replaced by those of strategies"""
+    head, tail = set(ROW_HEAD), set(ROW_TAIL) | {'Frame'}
+    return ([column for column in columns if column in head] + [strategy.column for strategy in strategies]
+            + [column for column in columns if column in tail])
+
+
+def _snapshots(rows: Iterable[Dict]) -> Iterator[List[Dict]]:
+    """Group rows into snapshots by their Time field, or a repeated contract within the same second"""
+    snapshot, options = [], set()
+    for row in rows:
+        if snapshot and (row['Time'] != snapshot[0]['Time'] or row['Option'] in options):
+            yield snapshot
+            snapshot, options = [], set()
+        snapshot.append(row)
+        options.add(row['Option'])
+    if snapshot:
+        yield snapshot
+
+
+def _read_ndjson(path: str) -> Iterator[Dict]:
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def reprocess_file(path: str, output_path: str, strategies: List[Strategy], strike_tolerance: float = 0.0,
+                   keyframe_interval: int = 20) -> Dict:
+    """Revalue one output file into output_path, atomically; returns counts and timing"""
+    start = time.perf_counter()
+    snapshots = rows_written = 0
+    temp_path = f'{output_path}.{os.getpid()}.tmp'
+    try:
+        if path.endswith('.csv'):
+            with open(path, 'r', newline='') as source, open(temp_path, 'w', newline='') as out:
+                # The file keeps its own columns; only the strategy columns are swapped
+                reader = csv.DictReader(source)
+                writer = csv.DictWriter(out, fieldnames=revalued_columns(reader.fieldnames or [], strategies))
+                if reader.fieldnames:
+                    writer.writeheader()
+                for snapshot in _snapshots(reader):
+                    rows = revalue(snapshot, strategies, strike_tolerance)
+                    writer.writerows(rows)
+                    snapshots += 1
+                    rows_written += len(rows)
+        else:
+            rows = _read_ndjson(path)
+            first = next(rows, None)
+            with open(temp_path, 'w') as out:
+                if first is not None:
+                    def all_rows():
+                        yield first
+                        yield from rows
+
+                    if 'Frame' in first:
+                        # Revalue full snapshots and store only what changed, as the collector does
+                        encoder = CdcEncoder(keyframe_interval)
+                        full = (snapshot for _, snapshot in rebuild(all_rows()))
+                        encode = lambda snapshot: encoder.encode(snapshot, path)
+                    else:
+                        full = _snapshots(all_rows())
+                        encode = lambda snapshot: snapshot
+                    for snapshot in full:
+                        output = encode(revalue(snapshot, strategies, strike_tolerance))
+                        out.write(encode_rows(output))
+                        snapshots += 1
+                        rows_written += len(output)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return {'path': path, 'output': output_path, 'snapshots': snapshots, 'rows': rows_written,
+            'seconds': round(time.perf_counter() - start, 3)}
+
+
+def _normalize_date(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    for fmt in ('%Y%m%d', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y%m%d')
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"Invalid date '{value}', expected YYYYMMDD or YYYY-MM-DD")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute strategy value columns of stored NDJSON/CSV output')
+    parser.add_argument('input_dir', help='Directory of {symbol}_{dte}DTE_{date} output files')
+    parser.add_argument('--start', type=_normalize_date, default=None,
+                        help='First date to reprocess, YYYYMMDD or YYYY-MM-DD (default: earliest)')
+    parser.add_argument('--end', type=_normalize_date, default=None,
+                        help='Last date to reprocess, inclusive (default: latest)')
+    parser.add_argument('--symbol', type=str, default=None,
+                        help='Only files for this symbol (default: all)')
+    parser.add_argument('--format', choices=FORMATS + ('both',), default='both',
+                        help='File types to reprocess (default: both)')
+    parser.add_argument('--strategies', type=str, default=None,
+                        help='JSON file listing the strategies to value (default: 20/30/40-wide IB and 10-wide spreads)')
+    parser.add_argument('--strike_tolerance', type=float, default=0.0,
+                        help='Match wing legs to the nearest listed strike within this distance (default: 0 - exact strike)')
+    parser.add_argument('--keyframe_interval', type=int, default=20,
+                        help='Snapshots per keyframe when re-encoding CDC files (default: 20)')
+    parser.add_argument('--output_dir', type=str, default=None,
+                        help='Write reprocessed files here under their original names')
+    parser.add_argument('--in_place', action='store_true',
+                        help='Replace the original files instead')
+    parser.add_argument('--include_today', action='store_true',
+                        help="With --in_place, also rewrite today's files, which a running collector may still append to")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processes to spread files across (default: all cores)')
+    args = parser.parse_args()
+
+    if bool(args.output_dir) == args.in_place:
+        parser.error('give exactly one of --output_dir or --in_place')
+    strategies = load_strategies(args.strategies)
+    formats = FORMATS if args.format == 'both' else (args.format,)
+    paths = find_files(args.input_dir, args.start, args.end, args.symbol, formats)
+    if args.in_place and not args.include_today:
+        # Replacing a file the collector is appending to would lose its later rows
+        today = file_date_today()
+        active = [path for path in paths if FILE_PATTERN.match(os.path.basename(path))['date'] >= today]
+        if active:
+            print(f"Skipping {len(active)} files dated today or later; use --include_today to rewrite them")
+            paths = [path for path in paths if path not in active]
+    if not paths:
+        print("No matching files")
+        return
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    output_dir = args.output_dir or args.input_dir
+
+    # Largest files first so one big file doesn't finish last on an otherwise idle pool
+    paths.sort(key=os.path.getsize, reverse=True)
+    start = time.perf_counter()
+    snapshots = rows = failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(reprocess_file, path, os.path.join(output_dir, os.path.basename(path)),
+                                   strategies, args.strike_tolerance, args.keyframe_interval): path
+                   for path in paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(paths)}] Error reprocessing {futures[future]}: {str(e)}", file=sys.stderr)
+                continue
+            snapshots += result['snapshots']
+            rows += result['rows']
+            print(f"[{done}/{len(paths)}] {result['output']}: {result['snapshots']} snapshots, "
+                  f"{result['rows']} rows in {result['seconds']}s")
+
+    seconds = time.perf_counter() - start
+    print(f"Reprocessed {len(paths) - failed} files ({snapshots} snapshots, {rows} rows) in {seconds:.1f}s"
+          f"{f', {failed} failed' if failed else ''}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Wall-clock aligned scheduling for the collection loop.
+
+Cycles start on fixed boundaries instead of a fixed sleep after the work, so the cadence
+doesn't drift with fetch and processing time and snapshots land on the same clock times
+every day. Boundaries are either multiples of a period since the Unix epoch (any period
+dividing 3600 gives the same times every hour) or a grid of seconds within each minute,
+e.g. 0,25,50.
+
+When a cycle runs past the next boundary the overrun is recorded and the policy decides
+what happens next:
+
+    skip      wait for the first boundary after the overrun (stay on the grid)
+    catch_up  start the next cycle immediately, then return to the grid
+"""
+import math
+import time
+from collections import namedtuple
+from typing import Callable, List, Optional
+
+POLICIES = ('skip', 'catch_up')
+
+Tick = namedtuple('Tick', ['scheduled', 'started', 'overrun', 'missed'])
+
+
+def parse_grid(text: str) -> List[float]:
+    """Parse a comma separated list of seconds within a minute, e.g. '0,25,50'"""
+    grid = sorted({float(part) for part in text.split(',') if part.strip()})
+    if not grid or grid[0] < 0 or grid[-1] >= 60:
+        raise ValueError(f"Schedule grid must list seconds between 0 and 59, got '{text}'")
+    return grid
+
+
+class AlignedScheduler:
+    """Sleeps until the next aligned boundary and tracks cycle overruns"""
+
+    def __init__(self, period: float = 25.0, grid: Optional[List[float]] = None, offset: float = 0.0,
+                 policy: str = 'skip', logger=None, clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown schedule policy '{policy}', expected one of {POLICIES}")
+        if grid is None and period <= 0:
+            raise ValueError("Schedule period must be positive")
+        self.period = period
+        self.grid = grid
+        self.offset = offset
+        self.policy = policy
+        self.logger = logger
+        self.clock = clock
+        self.sleep = sleep
+        self._scheduled = None
+        self.cycles = 0
+        self.overruns = 0
+        self.missed = 0
+        self.max_overrun = 0.0
+
+    def next_boundary(self, after: float) -> float:
+        """First boundary strictly after the given epoch time"""
+        if self.grid is None:
+            count = math.floor((after - self.offset) / self.period) + 1
+            return count * self.period + self.offset
+        minute = math.floor(after / 60) * 60
+        for second in self.grid:
+            if minute + second > after:
+                return minute + second
+        return minute + 60 + self.grid[0]
+
+    def reset(self):
+        """Forget the last cycle, e.g. after idling while the market is closed"""
+        self._scheduled = None
+
+    def wait(self) -> Tick:
+        """Block until the next cycle is due and return its timing"""
+        now = self.clock()
+        overrun = 0.0
+        missed = 0
+        if self._scheduled is None:
+            target = scheduled = self.next_boundary(now)
+        else:
+            target = scheduled = self.next_boundary(self._scheduled)
+            if now >= target:
+                # The last cycle ran past the boundary the next one was due at
+                overrun = now - target
+                missed, latest = self._missed_boundaries(target, now)
+                self._record_overrun(overrun, missed)
+                if self.policy == 'skip':
+                    target = scheduled = self.next_boundary(now)
+                else:
+                    # Run now, standing in for the latest missed boundary so the grid is kept
+                    target, scheduled = now, latest
+
+        if target > now:
+            self.sleep(target - now)
+        self._scheduled = scheduled
+        self.cycles += 1
+        return Tick(scheduled, self.clock(), overrun, missed)
+
+    def stats(self) -> dict:
+        return {
+            'cycles': self.cycles,
+            'overruns': self.overruns,
+            'missed': self.missed,
+            'max_overrun': round(self.max_overrun, 3),
+        }
+
+    def _missed_boundaries(self, first: float, until: float):
+        """Number of boundaries in [first, until] and the latest of them; first is a boundary"""
+        count = 0
+        latest = boundary = first
+        while boundary <= until:
+            count += 1
+            latest = boundary
+            boundary = self.next_boundary(boundary)
+        return count, latest
+
+    def _record_overrun(self, overrun: float, missed: int):
+        self.overruns += 1
+        self.missed += missed
+        self.max_overrun = max(self.max_overrun, overrun)
+        if self.logger:
+            action = 'skipping to the next boundary' if self.policy == 'skip' else 'starting immediately'
+            self.logger.warning(f"Cycle overran by {overrun:.2f}s, missed {missed} boundary(s), {action}")
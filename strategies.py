@@ -0,0 +1,177 @@
+"""
+Declarative option strategy set for the collector.
+
+Each strategy is a structure type plus a width and/or offset, valued per strike with
+the row's strike as the centre. A strategy list is loaded from JSON such as
+
+    [
+        {"structure": "iron_butterfly", "widths": [20, 30, 40]},
+        {"structure": "call_spread", "widths": [10]},
+        {"structure": "put_spread", "widths": [10]},
+        {"structure": "iron_condor", "offsets": [20, 30], "widths": [10]},
+        {"structure": "strangle", "offsets": [25, 50]}
+    ]
+
+and all strategies are computed together in one batched pass over a StrikeIndex.
+Run this module to print the logstash CSV columns for a strategy file.
+"""
+import argparse
+import json
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from numeric import round2, with_int_zero
+
+STRUCTURES = ('iron_butterfly', 'iron_condor', 'call_spread', 'put_spread', 'strangle')
+
+# Row key order around the strategy value columns
+ROW_HEAD = ['Time', 'Symbol', 'Price', 'VIX', 'VIX1D', 'Option', 'Type', 'Strike Price',
+            'Last Price', 'Bid', 'Ask', 'Mid', 'Width', 'Expiration', 'DTE',
+            'Straddle Value', 'ATM']
+ROW_TAIL = ['Delta', 'Gamma', 'Theta', 'Vega', 'Rho', 'Phi', 'IV', 'Description', 'Exchange',
+            'Change', 'Volume', 'Open', 'High', 'Low', 'Close', 'Change Percentage',
+            'Average Volume', 'Last Volume', 'Trade Date', 'Prev Close', 'Week 52 High',
+            'Week 52 Low', 'Bid Size', 'Bid Exchange', 'Bid Date', 'Ask Size', 'Ask Exchange',
+            'Ask Date', 'Open Interest', 'Contract Size', 'Expiration Type', 'Root Symbol',
+            'Intrinsic Value', 'Extrinsic Value']
+
+# The strategy set the collector has always written
+DEFAULT_CONFIG = [
+    {'structure': 'iron_butterfly', 'widths': [20, 30, 40]},
+    {'structure': 'call_spread', 'widths': [10]},
+    {'structure': 'put_spread', 'widths': [10]},
+]
+
+
+def _number(value):
+    """Render a width/offset for a column name: 20 rather than 20.0"""
+    return int(value) if float(value).is_integer() else value
+
+
+class Strategy(namedtuple('Strategy', ['structure', 'width', 'offset'])):
+    """One priced structure; width and offset are in strike points"""
+
+    @property
+    def column(self) -> str:
+        width, offset = _number(self.width), _number(self.offset)
+        prefix = f'{offset}-Off ' if offset else ''
+        if self.structure == 'iron_butterfly':
+            return f'{width}-Wide IB Value'
+        if self.structure == 'iron_condor':
+            return f'{prefix}{width}-Wide IC Value'
+        if self.structure == 'call_spread':
+            return f'{prefix}{width}-Wide Call Spread'
+        if self.structure == 'put_spread':
+            return f'{prefix}{width}-Wide Put Spread'
+        return f'{offset}-Off Strangle Value'
+
+    @property
+    def legs(self) -> List[tuple]:
+        """(option_type, strike offset from the centre, +1 short / -1 long), in pricing order"""
+        width, offset = self.width, self.offset
+        if self.structure == 'iron_butterfly':
+            return [('call', 0, 1), ('put', 0, 1), ('call', width, -1), ('put', -width, -1)]
+        if self.structure == 'iron_condor':
+            return [('call', offset, 1), ('put', -offset, 1),
+                    ('call', offset + width, -1), ('put', -offset - width, -1)]
+        if self.structure == 'call_spread':
+            return [('call', offset, 1), ('call', offset + width, -1)]
+        if self.structure == 'put_spread':
+            return [('put', -offset, 1), ('put', -offset - width, -1)]
+        return [('call', offset, 1), ('put', -offset, 1)]
+
+
+def parse_strategies(config: List[Dict]) -> List[Strategy]:
+    """Expand a declarative config into Strategy entries, one per width/offset combination"""
+    strategies = []
+    for entry in config:
+        structure = entry.get('structure')
+        if structure not in STRUCTURES:
+            raise ValueError(f"Unknown strategy structure '{structure}', expected one of {STRUCTURES}")
+        widths = entry.get('widths', [0] if structure == 'strangle' else None)
+        offsets = entry.get('offsets', [0])
+        if not widths:
+            raise ValueError(f"Strategy '{structure}' needs at least one width")
+        if structure == 'iron_butterfly' and any(offsets):
+            raise ValueError("iron_butterfly takes widths only; use iron_condor for offset short strikes")
+        if structure in ('iron_condor', 'strangle') and not all(offsets):
+            raise ValueError(f"Strategy '{structure}' needs non-zero offsets")
+        for offset in offsets:
+            for width in widths:
+                strategies.append(Strategy(structure, width, offset))
+
+    columns = [strategy.column for strategy in strategies]
+    duplicates = sorted({column for column in columns if columns.count(column) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate strategy columns: {duplicates}")
+    return strategies
+
+
+def load_strategies(path: Optional[str] = None) -> List[Strategy]:
+    """Load a strategy list from a JSON file, or the default set when no path is given"""
+    if not path:
+        return parse_strategies(DEFAULT_CONFIG)
+    with open(path, 'r') as f:
+        return parse_strategies(json.load(f))
+
+
+DEFAULT_STRATEGIES = parse_strategies(DEFAULT_CONFIG)
+
+
+def output_columns(strategies: List[Strategy]) -> List[str]:
+    """Full ordered list of output columns for a strategy set"""
+    return ROW_HEAD + [strategy.column for strategy in strategies] + ROW_TAIL
+
+
+def compute_strategy_columns(strike_index, strikes: np.ndarray,
+                             strategies: List[Strategy]) -> Dict[str, List]:
+    """
+    Value every strategy at every strike in one batched pass.
+
+    Each distinct (option type, strike offset) leg is looked up once and shared by all
+    strategies using it. Legs at the centre strike must match exactly; other legs use
+    the index tolerance. Incomplete structures are 0.00, and a complete structure whose
+    legs are all unquoted is int 0, as the per-strike calculation produced.
+    """
+    strikes = np.asarray(strikes, dtype=float)
+    legs = {}
+    columns = {}
+    for strategy in strategies:
+        value = complete = any_quoted = None
+        for option_type, offset, sign in strategy.legs:
+            key = (option_type, offset)
+            if key not in legs:
+                legs[key] = strike_index.lookup(option_type, strikes + offset,
+                                                0 if offset == 0 else None)
+            mids, found, quoted = legs[key]
+            if value is None:
+                value, complete, any_quoted = mids, found, quoted
+            else:
+                value = value + mids if sign > 0 else value - mids
+                complete = complete & found
+                any_quoted = any_quoted | quoted
+        columns[strategy.column] = with_int_zero(np.where(complete, round2(value), 0.0),
+                                                 ~complete | any_quoted)
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the output columns for a strategy file')
+    parser.add_argument('--strategies', type=str, default=None,
+                        help='Strategy JSON file (default: the built-in IB/spread set)')
+    parser.add_argument('--logstash', action='store_true',
+                        help='Print the columns array for the csv filter in logstash.conf')
+    args = parser.parse_args()
+
+    strategies = load_strategies(args.strategies)
+    if args.logstash:
+        print('columns => ' + json.dumps(output_columns(strategies), indent=4))
+    else:
+        for strategy in strategies:
+            print(f"{strategy.column}: {strategy.structure} width={strategy.width} offset={strategy.offset}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Event-driven market data from the Tradier streaming API.
+
+A streaming session is created with POST markets/events/session, and quote, trade and
+summary events for the underlying, VIX, VIX1D and the option contracts near the money
+are read from the session's HTTP stream, one JSON object per line. ChainState applies
+them to an in-memory copy of each expiration's chain, which is fetched over REST when
+streaming starts and refreshed periodically for greeks, open interest and new strikes.
+Snapshots are then taken from memory at any moment instead of refetching whole chains.
+"""
+import json
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+STREAM_FILTERS = ('quote', 'trade', 'summary')
+
+# Chain fields set from each event type
+QUOTE_FIELDS = (('bid', 'bid', float), ('ask', 'ask', float), ('bidsz', 'bidsize', int),
+                ('asksz', 'asksize', int), ('bidexch', 'bidexch', str), ('askexch', 'askexch', str),
+                ('biddate', 'bid_date', int), ('askdate', 'ask_date', int))
+TRADE_FIELDS = (('price', 'last', float), ('size', 'last_volume', int), ('cvol', 'volume', int),
+                ('date', 'trade_date', int))
+SUMMARY_FIELDS = (('open', 'open', float), ('high', 'high', float), ('low', 'low', float),
+                  ('prevClose', 'prevclose', float))
+EVENT_FIELDS = {'quote': QUOTE_FIELDS, 'trade': TRADE_FIELDS, 'summary': SUMMARY_FIELDS}
+
+
+class ChainState:
+    """Latest quotes for the underlying, VIX indexes and every contract of the polled chains"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self._lock = threading.Lock()
+        self._market_data: Dict[str, Dict] = {}
+        self._chains: List[Tuple[int, date, List[Dict]]] = []
+        self._contracts: Dict[str, Dict] = {}
+        self._version = 0
+        self._snapshot_version = None
+        self._snapshot_price = None
+        self.events = 0
+        self.updates = 0
+
+    def set_market_data(self, market_data: Dict[str, Dict]):
+        """Replace the underlying and index quotes, e.g. from a REST quotes request"""
+        with self._lock:
+            self._market_data = {symbol: dict(quote) for symbol, quote in market_data.items()}
+            self._version += 1
+
+    def load_chains(self, chains: Sequence[Tuple[int, date, List[Dict]]]):
+        """Replace every chain with freshly fetched (dte, expiration, options) contracts"""
+        with self._lock:
+            self._chains = [(dte, expiration_date, [dict(option) for option in options])
+                            for dte, expiration_date, options in chains]
+            self._contracts = {option['symbol']: option for _, _, options in self._chains for option in options
+                               if option.get('symbol')}
+            self._version += 1
+
+    @property
+    def price(self) -> Optional[float]:
+        try:
+            return float(self._market_data[self.symbol]['last'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def option_symbols(self, strike_range: Optional[float] = None) -> List[str]:
+        """Contracts with a strike within strike_range of the underlying (all if None)"""
+        with self._lock:
+            price = self.price
+            symbols = []
+            for symbol, option in self._contracts.items():
+                if strike_range is not None and price is not None:
+                    try:
+                        if abs(float(option['strike']) - price) > strike_range:
+                            continue
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                symbols.append(symbol)
+        return symbols
+
+    def apply(self, event: Dict) -> bool:
+        """Update the state from one stream event; returns whether anything changed"""
+        fields = EVENT_FIELDS.get(event.get('type'))
+        symbol = event.get('symbol')
+        with self._lock:
+            self.events += 1
+            if fields is None:
+                return False
+            target = self._contracts.get(symbol)
+            if target is None:
+                target = self._market_data.get(symbol)
+            if target is None:
+                return False
+
+            changed = False
+            for source, field, convert in fields:
+                value = event.get(source)
+                if value is None or value == '':
+                    continue
+                try:
+                    value = convert(float(value)) if convert is int else convert(value)
+                except (TypeError, ValueError):
+                    continue
+                if target.get(field) != value:
+                    target[field] = value
+                    changed = True
+            if changed:
+                self.updates += 1
+                self._version += 1
+            return changed
+
+    def changed(self) -> bool:
+        """Whether anything was updated since the last snapshot"""
+        with self._lock:
+            return self._version != self._snapshot_version
+
+    def moved(self, threshold: float) -> bool:
+        """Whether the underlying has moved at least threshold points since the last snapshot"""
+        with self._lock:
+            price = self.price
+            return price is not None and self._snapshot_price is not None and \
+                abs(price - self._snapshot_price) >= threshold
+
+    def snapshot(self) -> Tuple[Dict[str, Dict], List[Tuple[int, date, List[Dict]]]]:
+        """Copies of the market data and every (dte, expiration, options) chain as of now"""
+        with self._lock:
+            market_data = {symbol: dict(quote) for symbol, quote in self._market_data.items()}
+            chains = [(dte, expiration_date, [dict(option) for option in options])
+                      for dte, expiration_date, options in self._chains]
+            self._snapshot_version = self._version
+            self._snapshot_price = self.price
+        return market_data, chains
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'events': self.events, 'updates': self.updates, 'contracts': len(self._contracts)}
+
+
+class TradierStream:
+    """Reads a Tradier HTTP event stream on a background thread, reconnecting after errors"""
+
+    def __init__(self, client, on_event: Callable[[Dict], None], filters: Sequence[str] = STREAM_FILTERS,
+                 logger=None, read_timeout: float = 60.0, max_backoff: float = 30.0):
+        self.client = client
+        self.on_event = on_event
+        self.filters = tuple(filters)
+        self.logger = logger
+        self.read_timeout = read_timeout
+        self.max_backoff = max_backoff
+        self.symbols: List[str] = []
+        self.connects = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._response = None
+
+    def start(self, symbols: Sequence[str]):
+        """(Re)subscribe to symbols; an open stream is closed and a new one started"""
+        self.stop()
+        self.symbols = list(symbols)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name='tradier-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            response.close()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self._response = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _create_session(self) -> Tuple[str, str]:
+        response = self.client.post('events/session')
+        response.raise_for_status()
+        stream = response.json()['stream']
+        return stream['url'], stream['sessionid']
+
+    def _run(self, stop: threading.Event):
+        backoff = 1.0
+        while not stop.is_set():
+            try:
+                url, session_id = self._create_session()
+                response = self.client.session.post(url, data={
+                    'sessionid': session_id,
+                    'symbols': ','.join(self.symbols),
+                    'filter': ','.join(self.filters),
+                    'linebreak': 'true',
+                }, stream=True, timeout=(3.05, self.read_timeout))
+                response.raise_for_status()
+                self._response = response
+                self.connects += 1
+                if self.logger:
+                    self.logger.info(f"Streaming {len(self.symbols)} symbols")
+                backoff = 1.0
+                for line in response.iter_lines():
+                    if stop.is_set():
+                        break
+                    if not line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.on_event(event)
+                if not stop.is_set():
+                    raise ConnectionError("stream closed by the server")
+            except Exception as e:
+                if stop.is_set():
+                    break
+                self.errors += 1
+                if self.logger:
+                    self.logger.warning(f"Stream error, reconnecting in {backoff:.0f}s: {str(e)}")
+                stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                if self._response is not None:
+                    self._response.close()
+                    self._response = None
+
+    def stats(self) -> Dict:
+        return {'symbols': len(self.symbols), 'connects': self.connects, 'errors': self.errors}
@@ -0,0 +1,123 @@
+"""
+Sorted strike index used for option leg lookups.
+
+Calls and puts each get a sorted strike array with the contract mids packed into a
+parallel array. Wing legs (strike +/- width) are found by offset arithmetic when the
+strikes sit on a uniform grid and by binary search otherwise, optionally snapping to
+the nearest listed strike within a tolerance instead of requiring an exact match.
+"""
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+OPTION_TYPES = ('call', 'put')
+
+
+class _Side:
+    """Strikes, mids and quoted flags for one option type, sorted by strike"""
+
+    def __init__(self, strikes: np.ndarray, mids: list, quoted: np.ndarray):
+        self.strikes = strikes
+        self.mids = np.array(mids, dtype=float)
+        self.quoted = quoted
+        # Python copies for scalar lookups, keeping the int 0 mid of unquoted contracts
+        self.strike_list = strikes.tolist()
+        self.mid_list = list(mids)
+
+        self.step = None
+        if len(strikes) > 2:
+            steps = np.diff(strikes)
+            if steps[0] > 0 and np.all(steps == steps[0]):
+                self.step = float(steps[0])
+
+    def positions(self, targets: np.ndarray) -> np.ndarray:
+        """Index of the nearest listed strike for each target"""
+        if self.step is not None:
+            # Round half down so ties go to the lower strike, as in the binary search
+            offsets = np.ceil((targets - self.strikes[0]) / self.step - 0.5)
+            return np.clip(np.nan_to_num(offsets), 0, len(self.strikes) - 1).astype(np.intp)
+
+        right = np.clip(np.searchsorted(self.strikes, targets), 0, len(self.strikes) - 1)
+        left = np.clip(right - 1, 0, len(self.strikes) - 1)
+        use_left = np.abs(targets - self.strikes[left]) <= np.abs(self.strikes[right] - targets)
+        return np.where(use_left, left, right)
+
+
+class StrikeIndex:
+    """
+    Per-type sorted strike arrays with parallel mid arrays.
+
+    tolerance is the largest distance a requested wing strike may be from a listed strike
+    and still match it; 0 (the default) requires the exact strike, like the old dict
+    lookups did. Centre legs are always looked up exactly.
+    """
+
+    def __init__(self, sides: Dict[str, _Side], tolerance: float = 0.0):
+        self.sides = sides
+        self.tolerance = tolerance
+
+    @classmethod
+    def from_buffer(cls, option_buffer: Dict, tolerance: float = 0.0) -> 'StrikeIndex':
+        """Build from the {strike: {'call': mid, 'put': mid}} buffer of the Python engine"""
+        sides = {}
+        for option_type in OPTION_TYPES:
+            legs = sorted((strike, entry[option_type])
+                          for strike, entry in option_buffer.items() if entry.get(option_type) is not None)
+            strikes = np.array([strike for strike, _ in legs], dtype=float)
+            mids = [mid for _, mid in legs]
+            quoted = np.array([not isinstance(mid, int) for mid in mids], dtype=bool)
+            sides[option_type] = _Side(strikes, mids, quoted)
+        return cls(sides, tolerance)
+
+    @classmethod
+    def from_arrays(cls, strikes: np.ndarray, mids: np.ndarray, quoted: np.ndarray,
+                    option_types: Dict[str, np.ndarray], tolerance: float = 0.0) -> 'StrikeIndex':
+        """
+        Build from contract-aligned arrays; option_types maps 'call'/'put' to a mask of
+        the contracts to include. Duplicate strikes keep the last contract, as the buffer did.
+        """
+        sides = {}
+        for option_type in OPTION_TYPES:
+            index = np.flatnonzero(option_types[option_type])[::-1]
+            side_strikes, first = np.unique(strikes[index], return_index=True)
+            picked = index[first]
+            side_quoted = quoted[picked]
+            side_mids = [mid if flag else 0
+                         for mid, flag in zip(mids[picked].tolist(), side_quoted.tolist())]
+            sides[option_type] = _Side(side_strikes, side_mids, side_quoted)
+        return cls(sides, tolerance)
+
+    def mid(self, option_type: str, strike: float, tolerance: Optional[float] = None):
+        """Mid of the contract at (or within tolerance of) strike, or None if there is none"""
+        side = self.sides[option_type]
+        if not side.strike_list:
+            return None
+        tolerance = self.tolerance if tolerance is None else tolerance
+
+        position = bisect_left(side.strike_list, strike)
+        best = None
+        for candidate in (position - 1, position):
+            if 0 <= candidate < len(side.strike_list):
+                distance = abs(side.strike_list[candidate] - strike)
+                if distance <= tolerance and (best is None or distance < best[0]):
+                    best = (distance, candidate)
+        return side.mid_list[best[1]] if best is not None else None
+
+    def lookup(self, option_type: str, targets: np.ndarray,
+               tolerance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Batch lookup of many strikes at once.
+
+        Returns (mids, found, quoted) aligned with targets; mids are 0.0 where not found.
+        """
+        side = self.sides[option_type]
+        targets = np.asarray(targets, dtype=float)
+        if len(side.strikes) == 0:
+            missing = np.zeros(len(targets), dtype=bool)
+            return np.zeros(len(targets)), missing, missing
+        tolerance = self.tolerance if tolerance is None else tolerance
+
+        position = side.positions(targets)
+        found = np.abs(side.strikes[position] - targets) <= tolerance
+        return np.where(found, side.mids[position], 0.0), found, found & side.quoted[position]
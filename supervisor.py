@@ -0,0 +1,402 @@
+"""
+Run the collector as a set of worker processes.
+
+Collection is split into units, one per (symbol, DTE), and the units are dealt out to
+--workers processes, each running a MarketDataCollector restricted to its own units.
+Every output file therefore has exactly one writer, and chain processing runs on as
+many cores as there are workers. The supervisor:
+
+- restarts workers that exit, with exponential backoff, and with --stall_timeout also
+  workers that stop sending heartbeats: one per completed cycle, and one at least every
+  few seconds while a worker sleeps through a closed market
+- gives every worker one shared request budget of --requests_per_minute, so adding
+  workers doesn't multiply the API rate
+- writes the aggregate state of all workers to --health_file every few seconds
+
+To spread collection over several hosts, point --lease_dir at a volume they share. A
+supervisor then only runs units it holds a lease on: one small JSON file per unit,
+created exclusively, renewed every --lease_ttl / 3 seconds and taken over by another
+host once it has expired. --max_units caps how many units one host claims.
+
+    python supervisor.py --symbols SPX,XSP,NDX,RUT --dte_days 7 --workers 8 --output_dir /data/spxdata
+    python supervisor.py --symbols SPX,NDX --lease_dir /data/leases --max_units 8 --output_dir /data/spxdata
+
+Every other collector option (fetch_xDTE_prices_with_IB_calculations_V2.py --help) is
+passed to each worker. Workers write metrics to <metrics_dir>/worker-<n>, recordings
+to <record_dir>/worker-<n> and logs to <log_dir>/worker-<n>, with worker-<n> on every line.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fetch_xDTE_prices_with_IB_calculations_V2 import (MarketDataCollector, build_parser, collector_options,
+                                                       load_api_key)
+from rate_limiter import SharedBudget
+
+Unit = Tuple[str, int]
+
+MAX_BACKOFF = 60.0
+HEALTH_INTERVAL = 5.0
+# Least time a worker gets to send its first heartbeat, e.g. while building its market calendar
+STARTUP_GRACE = 120.0
+# Longest wait after taking over an expired lease before checking that the takeover held
+TAKEOVER_SETTLE = 1.0
+
+
+def unit_name(unit: Unit) -> str:
+    symbol, dte = unit
+    return f"{symbol}_{dte}DTE"
+
+
+def shard(units: Iterable[Unit], workers: int) -> List[List[Unit]]:
+    """Deal units round-robin by DTE, so each worker gets a mix of large and small chains"""
+    ordered = sorted(units, key=lambda unit: (unit[1], unit[0]))
+    count = max(1, min(workers, len(ordered)))
+    return [sorted(ordered[i::count]) for i in range(count)] if ordered else []
+
+
+class LeaseManager:
+    """Per-unit lease files on a shared directory, for splitting units between hosts"""
+
+    def __init__(self, lease_dir: str, ttl: float = 60.0, owner: Optional[str] = None):
+        self.lease_dir = lease_dir
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        os.makedirs(lease_dir, exist_ok=True)
+
+    def path_for(self, unit: Unit) -> str:
+        return os.path.join(self.lease_dir, f"{unit_name(unit)}.lease")
+
+    def read(self, unit: Unit) -> Optional[Dict]:
+        try:
+            with open(self.path_for(unit), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, unit: Unit):
+        path = self.path_for(unit)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'owner': self.owner, 'expires': time.time() + self.ttl}, f)
+        os.replace(temp_path, path)
+
+    def claim(self, unit: Unit) -> bool:
+        """Take the unit's lease if it is free, expired or already ours"""
+        try:
+            fd = os.open(self.path_for(unit), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            lease = self.read(unit)
+            # An unreadable lease is being replaced right now; try again next round
+            if lease is None or (lease.get('owner') != self.owner and lease.get('expires', 0) > time.time()):
+                return False
+            if lease.get('owner') == self.owner:
+                self._write(unit)
+                return True
+            self._write(unit)
+            # Two hosts may take over an expired lease at once and the last rename wins; give a
+            # competing rename time to land, and back off if the lease now names another owner
+            time.sleep(min(TAKEOVER_SETTLE, self.ttl / 10))
+            lease = self.read(unit)
+            return lease is not None and lease.get('owner') == self.owner
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'owner': self.owner, 'expires': time.time() + self.ttl}, f)
+        return True
+
+    def renew(self, units: Iterable[Unit]) -> Set[Unit]:
+        """Extend our leases; returns the units still held"""
+        held = set()
+        for unit in units:
+            lease = self.read(unit)
+            if lease is not None and lease.get('owner') == self.owner:
+                self._write(unit)
+                held.add(unit)
+        return held
+
+    def release(self, units: Iterable[Unit]):
+        for unit in units:
+            lease = self.read(unit)
+            if lease is not None and lease.get('owner') == self.owner:
+                try:
+                    os.remove(self.path_for(unit))
+                except OSError:
+                    pass
+
+
+def worker_main(worker_id: int, units: List[Unit], api_key: str, options: Dict, budget: SharedBudget,
+                heartbeat, last_cycle, cycles):
+    """Entry point of a worker process: one collector limited to its units"""
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    dtes = {}
+    for symbol, dte in units:
+        dtes.setdefault(symbol, []).append(dte)
+
+    def on_cycle():
+        heartbeat.value = last_cycle.value = time.time()
+        cycles.value += 1
+
+    def on_idle():
+        # Sleeping until the open is healthy; keep the stall check from restarting the worker
+        heartbeat.value = time.time()
+
+    collector = MarketDataCollector(api_key=api_key, dtes=dtes, on_cycle=on_cycle, on_idle=on_idle,
+                                    shared_budget=budget, **options)
+    try:
+        collector.run()
+    except KeyboardInterrupt:
+        # Ctrl-C reaches the whole process group; the supervisor decides what happens next
+        pass
+
+
+class _Slot:
+    """One worker process and its restart bookkeeping"""
+
+    def __init__(self, worker_id: int, units: List[Unit], context):
+        self.worker_id = worker_id
+        self.units = units
+        self.process = None
+        self.started = None
+        self.restarts = 0
+        self.next_start = 0.0
+        self.heartbeat = context.RawValue('d', 0.0)
+        self.last_cycle = context.RawValue('d', 0.0)
+        self.cycles = context.RawValue('q', 0)
+
+
+class Supervisor:
+    """Starts, watches and restarts the worker processes for a set of units"""
+
+    def __init__(self, units: List[Unit], api_key: str, options: Dict, workers: int = 1,
+                 requests_per_minute: float = 120, health_file: Optional[str] = 'supervisor_health.json',
+                 leases: Optional[LeaseManager] = None, max_units: Optional[int] = None,
+                 stall_timeout: float = 0.0, poll_interval: float = 1.0, logger=None):
+        self.units = sorted(set(units))
+        self.api_key = api_key
+        self.options = options
+        self.workers = max(1, workers)
+        self.health_file = health_file
+        self.leases = leases
+        self.max_units = max_units
+        self.stall_timeout = stall_timeout
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger('Supervisor')
+        self.context = multiprocessing.get_context('spawn')
+        self.budget = SharedBudget(requests_per_minute, context=self.context)
+        self.held: Set[Unit] = set() if leases is not None else set(self.units)
+        self.slots: List[_Slot] = []
+        self._stopping = False
+
+    def _worker_options(self, worker_id: int) -> Dict:
+        options = dict(self.options)
+        options.pop('symbol', None)
+        options.pop('symbols', None)
+        if options.get('metrics_dir'):
+            options['metrics_dir'] = os.path.join(options['metrics_dir'], f'worker-{worker_id}')
+        # Only the supervisor could serve one port; workers export metrics files only
+        options['metrics_port'] = 0
+        if options.get('record_dir'):
+            options['record_dir'] = os.path.join(options['record_dir'], f'worker-{worker_id}')
+        # Each worker rotates its own log file at midnight, and tags its lines
+        options['log_dir'] = os.path.join(options.get('log_dir') or 'logs', f'worker-{worker_id}')
+        options['log_tag'] = f'worker-{worker_id}'
+        return options
+
+    def _start(self, slot: _Slot):
+        slot.process = self.context.Process(
+            target=worker_main, name=f'collector-worker-{slot.worker_id}',
+            args=(slot.worker_id, slot.units, self.api_key, self._worker_options(slot.worker_id),
+                  self.budget, slot.heartbeat, slot.last_cycle, slot.cycles))
+        slot.process.start()
+        slot.started = time.time()
+        slot.heartbeat.value = slot.started
+        self.logger.info(f"Started worker {slot.worker_id} (pid {slot.process.pid}) for "
+                         f"{', '.join(unit_name(unit) for unit in slot.units)}")
+
+    def _stop(self, slot: _Slot, timeout: float = 30.0):
+        process = slot.process
+        if process is None:
+            return
+        if process.is_alive():
+            # SIGTERM lets the collector flush queued writes before exiting
+            process.terminate()
+            process.join(timeout)
+            if process.is_alive():
+                self.logger.warning(f"Worker {slot.worker_id} did not exit after {timeout:.0f}s - killing it")
+                process.kill()
+                process.join()
+        slot.process = None
+
+    def assign(self, units: Iterable[Unit]):
+        """Shard units across the workers, restarting only the workers whose share changed"""
+        shards = shard(units, self.workers)
+        for worker_id, worker_units in enumerate(shards):
+            if worker_id < len(self.slots):
+                slot = self.slots[worker_id]
+                if slot.units == worker_units:
+                    continue
+                self._stop(slot)
+                # A new share starts right away rather than as a restart
+                slot.units = worker_units
+                slot.started = None
+                slot.restarts = 0
+                slot.next_start = 0.0
+            else:
+                self.slots.append(_Slot(worker_id, worker_units, self.context))
+        for slot in self.slots[len(shards):]:
+            self._stop(slot)
+        del self.slots[len(shards):]
+
+    def refresh_leases(self):
+        """Renew held leases and claim free units up to max_units"""
+        held = self.leases.renew(self.held)
+        lost = self.held - held
+        if lost:
+            self.logger.warning(f"Lost leases on {', '.join(unit_name(unit) for unit in sorted(lost))}")
+        for unit in self.units:
+            if self.max_units is not None and len(held) >= self.max_units:
+                break
+            if unit not in held and self.leases.claim(unit):
+                self.logger.info(f"Claimed lease on {unit_name(unit)}")
+                held.add(unit)
+        self.held = held
+
+    def check_workers(self):
+        """Restart workers that exited or stalled, backing off after repeated failures"""
+        now = time.time()
+        for slot in self.slots:
+            process = slot.process
+            if process is not None and process.is_alive():
+                timeout = self.stall_timeout
+                if timeout and slot.heartbeat.value == slot.started:
+                    timeout = max(timeout, STARTUP_GRACE)
+                stalled = timeout and now - slot.heartbeat.value > timeout
+                if not stalled:
+                    # A worker that ran for a while has recovered; reset its backoff
+                    if slot.restarts and now - slot.started > MAX_BACKOFF:
+                        slot.restarts = 0
+                    continue
+                self.logger.warning(f"Worker {slot.worker_id} sent no heartbeat for "
+                                    f"{now - slot.heartbeat.value:.0f}s - restarting it")
+                self._stop(slot)
+            elif process is not None:
+                self.logger.warning(f"Worker {slot.worker_id} exited with code {process.exitcode}")
+                slot.process = None
+            if slot.process is None and slot.next_start == 0.0 and slot.started is not None:
+                delay = min(2.0 ** slot.restarts, MAX_BACKOFF)
+                slot.restarts += 1
+                slot.next_start = now + delay
+                self.logger.info(f"Restarting worker {slot.worker_id} in {delay:.0f}s")
+            if slot.process is None and now >= slot.next_start:
+                slot.next_start = 0.0
+                self._start(slot)
+
+    def health(self) -> Dict:
+        now = time.time()
+        workers = []
+        for slot in self.slots:
+            alive = slot.process is not None and slot.process.is_alive()
+            workers.append({
+                'Worker': slot.worker_id,
+                'Pid': slot.process.pid if slot.process is not None else None,
+                'Alive': alive,
+                'Units': [unit_name(unit) for unit in slot.units],
+                'Restarts': slot.restarts,
+                'Cycles': slot.cycles.value,
+                'Last Cycle Age': round(now - slot.last_cycle.value, 1) if slot.last_cycle.value else None,
+                'Heartbeat Age': round(now - slot.heartbeat.value, 1) if slot.heartbeat.value else None,
+            })
+        return {
+            'Time': datetime.now().astimezone().strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'Host': socket.gethostname(),
+            'Units': len(self.units),
+            'Held Units': len(self.held),
+            'Workers Alive': sum(worker['Alive'] for worker in workers),
+            'Cycles': sum(worker['Cycles'] for worker in workers),
+            'Budget': self.budget.stats(),
+            'Workers': workers,
+        }
+
+    def write_health(self):
+        if not self.health_file:
+            return
+        temp_path = f'{self.health_file}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.health(), f, indent=2)
+        os.replace(temp_path, self.health_file)
+
+    def run(self):
+        """Supervise until interrupted, then stop the workers and release the leases"""
+        last_leases = last_health = 0.0
+        try:
+            while not self._stopping:
+                now = time.time()
+                if self.leases is not None and now - last_leases >= self.leases.ttl / 3:
+                    self.refresh_leases()
+                    last_leases = now
+                self.assign(self.held)
+                self.check_workers()
+                if now - last_health >= HEALTH_INTERVAL:
+                    self.write_health()
+                    last_health = now
+                time.sleep(self.poll_interval)
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stopping = True
+        for slot in self.slots:
+            if slot.process is not None and slot.process.is_alive():
+                slot.process.terminate()
+        for slot in self.slots:
+            self._stop(slot)
+        if self.leases is not None:
+            self.leases.release(self.held)
+        self.write_health()
+        self.logger.info(f"Stopped {len(self.slots)} workers; shared budget: {self.budget.stats()}")
+
+
+def main():
+    parser = build_parser()
+    parser.description = 'Shard (symbol, DTE) collection across worker processes'
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help='Worker processes to shard units across (default: all cores)')
+    parser.add_argument('--lease_dir', type=str, default=None,
+                       help='Shared directory of per-unit lease files, for running supervisors on several hosts (default: off)')
+    parser.add_argument('--lease_ttl', type=float, default=60.0,
+                       help='Seconds a lease stays valid without renewal (default: 60)')
+    parser.add_argument('--max_units', type=int, default=None,
+                       help='Most (symbol, DTE) units this host claims with --lease_dir (default: no limit)')
+    parser.add_argument('--health_file', type=str, default='supervisor_health.json',
+                       help='Aggregate worker health, rewritten every few seconds (default: supervisor_health.json)')
+    parser.add_argument('--stall_timeout', type=float, default=0.0,
+                       help='Restart a worker that sends no heartbeat (a completed cycle, or every few seconds '
+                            'while the market is closed) for this many seconds (default: 0 - off)')
+    args = parser.parse_args()
+    if args.replay:
+        parser.error('--replay runs in a single process; use fetch_xDTE_prices_with_IB_calculations_V2.py')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    symbols = args.symbols or [args.symbol]
+    units = [(symbol, dte) for symbol in symbols for dte in range(0, args.dte_days + 1)]
+    leases = LeaseManager(args.lease_dir, ttl=args.lease_ttl) if args.lease_dir else None
+    supervisor = Supervisor(units, load_api_key(), collector_options(args), workers=args.workers,
+                            requests_per_minute=args.requests_per_minute, health_file=args.health_file,
+                            leases=leases, max_units=args.max_units, stall_timeout=args.stall_timeout)
+
+    # docker stop sends SIGTERM; stop the workers and release leases on the way out
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Synthetic Tradier market data.
+
+Generates option chains, quotes and 1-minute timesales shaped like the Tradier API
+responses, with a configurable strike count and share of contracts missing quotes or
+greeks. Used by benchmark.py and the mock Tradier server so neither needs an API key.
+"""
+import random
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+OPTION_SYMBOL = re.compile(r'^(?P<root>[A-Z]+)(?P<expiration>\d{6})(?P<type>[CP])(?P<strike>\d{8})$')
+
+
+def option_mid(option_type: str, strike: float, price: float, noise: float = 1.0) -> float:
+    """Rough option value: intrinsic value plus time value that decays away from the money"""
+    intrinsic = max(0.0, price - strike) if option_type == 'call' else max(0.0, strike - price)
+    return intrinsic + max(0.05, 30.0 * 2.718 ** (-abs(strike - price) / 60.0)) * noise
+
+
+def option_symbol(root: str, expiration: date, option_type: str, strike: float) -> str:
+    """OCC option symbol, e.g. SPXW250102C05800000"""
+    return f"{root}{expiration.strftime('%y%m%d')}{option_type[0].upper()}{int(round(strike * 1000)):08d}"
+
+
+def parse_option_symbol(symbol: str) -> Optional[Tuple[str, date, str, float]]:
+    """(root, expiration, option_type, strike) of an OCC option symbol, or None for other symbols"""
+    match = OPTION_SYMBOL.match(symbol)
+    if not match:
+        return None
+    return (match['root'], datetime.strptime(match['expiration'], '%y%m%d').date(),
+            'call' if match['type'] == 'C' else 'put', int(match['strike']) / 1000.0)
+
+
+def synthetic_chain(strikes: int = 200, price: float = 5800.0, step: float = 5.0,
+                    missing_ratio: float = 0.05, expiration: Optional[date] = None,
+                    seed: int = 0) -> List[Dict]:
+    """Tradier options/chains contracts for one expiration, calls and puts at every strike"""
+    rnd = random.Random(seed)
+    expiration = expiration or date.today()
+    first = round(price / step) * step - (strikes // 2) * step
+    contracts = []
+    for i in range(strikes):
+        strike = first + i * step
+        for option_type in ('call', 'put'):
+            mid = option_mid(option_type, strike, price, rnd.uniform(0.9, 1.1))
+            bid = round(mid * 0.98, 2)
+            ask = round(mid * 1.02, 2)
+            if rnd.random() < missing_ratio:
+                bid, ask = None, None
+            root = 'SPXW'
+            symbol = option_symbol(root, expiration, option_type, strike)
+            contracts.append({
+                'symbol': symbol,
+                'description': f"{root} {expiration.strftime('%b %d %Y')} ${strike:g} {option_type.title()}",
+                'exchange': 'C',
+                'type': 'option',
+                'last': round(mid, 2) if rnd.random() > missing_ratio else None,
+                'change': round(rnd.uniform(-5, 5), 2),
+                'volume': rnd.randint(0, 5000),
+                'open': round(mid * 1.1, 2),
+                'high': round(mid * 1.3, 2),
+                'low': round(mid * 0.7, 2),
+                'close': None,
+                'bid': bid,
+                'ask': ask,
+                'underlying': 'SPX',
+                'strike': strike,
+                'change_percentage': round(rnd.uniform(-50, 50), 2),
+                'average_volume': 0,
+                'last_volume': rnd.randint(1, 20),
+                'trade_date': 1735828200000 + rnd.randint(0, 60000),
+                'prevclose': round(mid * 1.05, 2),
+                'week_52_high': 0.0,
+                'week_52_low': 0.0,
+                'bidsize': rnd.randint(1, 200),
+                'bidexch': 'C',
+                'bid_date': 1735828200000 + rnd.randint(0, 60000),
+                'asksize': rnd.randint(1, 200),
+                'askexch': 'C',
+                'ask_date': 1735828200000 + rnd.randint(0, 60000),
+                'open_interest': rnd.randint(0, 20000),
+                'contract_size': 100,
+                'expiration_date': expiration.strftime('%Y-%m-%d'),
+                'expiration_type': 'weeklys',
+                'option_type': option_type,
+                'root_symbol': root,
+                'greeks': None if rnd.random() < missing_ratio else {
+                    'delta': rnd.uniform(-1, 1), 'gamma': rnd.uniform(0, 0.05),
+                    'theta': -rnd.uniform(0, 5), 'vega': rnd.uniform(0, 2),
+                    'rho': rnd.uniform(-0.5, 0.5), 'phi': rnd.uniform(-0.5, 0.5),
+                    'bid_iv': 0.15, 'mid_iv': 0.16, 'ask_iv': 0.17, 'smv_vol': 0.16,
+                    'updated_at': '2025-01-02 14:29:59',
+                },
+            })
+    return contracts
+
+
+def synthetic_quotes(symbol: str = 'SPX', price: float = 5800.0) -> Dict[str, Dict]:
+    """Market data as returned by MarketDataCollector.get_market_data"""
+    return {symbol: {'symbol': symbol, 'last': price},
+            'VIX': {'symbol': 'VIX', 'last': 15.23},
+            'VIX1D': {'symbol': 'VIX1D', 'last': 11.87}}
+
+
+def synthetic_timesales(day: str = '2025-01-02', seed: int = 0) -> List[Dict]:
+    """Tradier timesales 1-minute bars for a whole day, pre-market through after-hours"""
+    rnd = random.Random(seed)
+    start = datetime.strptime(day, '%Y-%m-%d').replace(hour=8)
+    bars, price = [], 5800.0
+    for minute in range(12 * 60):
+        open_price = price
+        price += rnd.gauss(0, 1.5)
+        bars.append({
+            'time': (start + timedelta(minutes=minute)).strftime('%Y-%m-%dT%H:%M:%S'),
+            'timestamp': 1735822800 + minute * 60,
+            'price': round(price, 2),
+            'open': round(open_price, 2),
+            'high': round(max(open_price, price) + abs(rnd.gauss(0, 0.5)), 2),
+            'low': round(min(open_price, price) - abs(rnd.gauss(0, 0.5)), 2),
+            'close': round(price, 2),
+            'volume': 0,
+            'vwap': round(price, 2),
+        })
+    return bars
@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from rate_limiter import RateLimiter
+
+# TRADIER_BASE_URL points both collectors elsewhere, e.g. at mock_tradier_server.py
+BASE_URL = os.environ.get('TRADIER_BASE_URL', 'https://api.tradier.com/v1/markets')
+
+# (connect, read) timeouts in seconds for each endpoint below BASE_URL
+DEFAULT_TIMEOUTS = {
+    'quotes': (3.05, 10),
+    'options/chains': (3.05, 20),
+    'options/expirations': (3.05, 10),
+    'timesales': (3.05, 30),
+    'events/session': (3.05, 10),
+}
+DEFAULT_TIMEOUT = (3.05, 15)
+
+
+class EndpointStats:
+    """Cumulative request counters and latencies for a single endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self.connect_time = 0.0
+        self.wait_time = 0.0
+        self.read_time = 0.0
+        self.bytes = 0
+
+    def as_dict(self) -> Dict:
+        requests_made = max(self.requests, 1)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'connections': self.connections,
+            'avg_connect_ms': round(self.connect_time / max(self.connections, 1) * 1000, 2),
+            'avg_wait_ms': round(self.wait_time / requests_made * 1000, 2),
+            'avg_read_ms': round(self.read_time / requests_made * 1000, 2),
+            'bytes': self.bytes,
+        }
+
+
+class ClientStats:
+    """
+    Thread-safe per-endpoint latency counters.
+
+    connect_time covers TCP + TLS setup of new pooled connections, wait_time is the time
+    from sending a request until the response headers arrive (including any connect),
+    and read_time is the time spent downloading the body.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._endpoints: Dict[str, EndpointStats] = {}
+
+    def _get(self, endpoint: str) -> EndpointStats:
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = EndpointStats()
+        return self._endpoints[endpoint]
+
+    def begin(self, endpoint: str):
+        """Mark the endpoint the calling thread is about to request"""
+        self._local.endpoint = endpoint
+
+    def record_connect(self, seconds: float):
+        endpoint = getattr(self._local, 'endpoint', 'unknown')
+        with self._lock:
+            stats = self._get(endpoint)
+            stats.connections += 1
+            stats.connect_time += seconds
+
+    def record_request(self, endpoint: str, wait: float, read: float, size: int, error: bool = False):
+        with self._lock:
+            stats = self._get(endpoint)
+            stats.requests += 1
+            stats.wait_time += wait
+            stats.read_time += read
+            stats.bytes += size
+            if error:
+                stats.errors += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in self._endpoints.items()}
+
+    def summary(self) -> str:
+        parts = []
+        for endpoint, stats in sorted(self.snapshot().items()):
+            parts.append(f"{endpoint}: {stats['requests']} req, {stats['errors']} err, "
+                         f"{stats['connections']} conn (avg {stats['avg_connect_ms']}ms), "
+                         f"avg wait {stats['avg_wait_ms']}ms, avg read {stats['avg_read_ms']}ms")
+        return '; '.join(parts) if parts else 'no requests'
+
+
+class _TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections report their connect time to ClientStats"""
+
+    def __init__(self, stats: ClientStats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self._stats
+
+        class TimedHTTPConnection(HTTPConnection):
+            def connect(self):
+                start = time.perf_counter()
+                super().connect()
+                stats.record_connect(time.perf_counter() - start)
+
+        class TimedHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                start = time.perf_counter()
+                super().connect()
+                stats.record_connect(time.perf_counter() - start)
+
+        class TimedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = TimedHTTPConnection
+
+        class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = TimedHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+class TradierClient:
+    """
+    Tradier market data client backed by a pooled keep-alive requests.Session.
+
+    A single instance is meant to be shared by every request a collector makes, so
+    TCP and TLS setup is paid once per pooled connection rather than once per request,
+    and every request is paced by the same rate limiter.
+    """
+
+    def __init__(self, api_key: str, base_url: str = BASE_URL, pool_size: int = 10,
+                 timeouts: Optional[Dict[str, Tuple[float, float]]] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.stats = ClientStats()
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        adapter = _TimedAdapter(self.stats, pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, endpoint: str, params: Optional[Dict] = None,
+            timeout: Optional[Tuple[float, float]] = None) -> requests.Response:
+        """
+        Issue a GET request against an endpoint relative to base_url (e.g. 'quotes').
+
+        The body is read before returning so the connection goes straight back to the
+        pool. HTTP error statuses are counted but not raised; call raise_for_status().
+        """
+        return self._request('GET', endpoint, params, None, timeout)
+
+    def post(self, endpoint: str, data: Optional[Dict] = None,
+             timeout: Optional[Tuple[float, float]] = None) -> requests.Response:
+        """Issue a POST request against an endpoint relative to base_url, e.g. 'events/session'"""
+        return self._request('POST', endpoint, None, data, timeout)
+
+    def _request(self, method: str, endpoint: str, params: Optional[Dict], data: Optional[Dict],
+                 timeout: Optional[Tuple[float, float]]) -> requests.Response:
+        url = f'{self.base_url}/{endpoint}'
+        if timeout is None:
+            timeout = self.timeouts.get(endpoint, DEFAULT_TIMEOUT)
+
+        self.rate_limiter.acquire()
+        self.stats.begin(endpoint)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, params=params, data=data, timeout=timeout, stream=True)
+            wait = time.perf_counter() - start
+            read_start = time.perf_counter()
+            content = response.content
+            read = time.perf_counter() - read_start
+        except requests.exceptions.RequestException:
+            self.stats.record_request(endpoint, time.perf_counter() - start, 0.0, 0, error=True)
+            raise
+
+        self.stats.record_request(endpoint, wait, read, len(content), error=not response.ok)
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After')
+            self.rate_limiter.record_throttled(float(retry_after) if retry_after and retry_after.isdigit() else None)
+        else:
+            self.rate_limiter.update(response.headers)
+        return response
+
+    def headroom(self) -> Dict:
+        """Rate-limit quota left in the current window and local pacing state"""
+        return self.rate_limiter.headroom()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,183 @@
+"""
+Columnar engine for MarketDataCollector.process_options_data.
+
+Builds the same rows as the per-contract Python loop, but parses each Tradier field
+once into a NumPy column and computes mids, widths, straddles, strategy values,
+greeks and intrinsic/extrinsic values as whole-array operations. Output is identical
+to the Python engine, including which values come out as int 0 instead of 0.0, and is
+returned as a ContractTable of those columns rather than one dict per contract.
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from contracts import ContractTable
+from numeric import parse_floats, round2, with_int_zero
+from strategies import DEFAULT_STRATEGIES, ROW_HEAD, ROW_TAIL, Strategy, compute_strategy_columns
+from strike_index import StrikeIndex
+
+GREEK_FIELDS = [('Delta', 'delta'), ('Gamma', 'gamma'), ('Theta', 'theta'),
+                ('Vega', 'vega'), ('Rho', 'rho'), ('Phi', 'phi')]
+
+# Tradier numeric fields written as round(float(x), 2), or int 0 when missing
+ROUNDED_FIELDS = {
+    'Last Price': 'last', 'Change': 'change', 'Open': 'open', 'High': 'high',
+    'Low': 'low', 'Close': 'close', 'Change Percentage': 'change_percentage',
+    'Prev Close': 'prevclose', 'Week 52 High': 'week_52_high', 'Week 52 Low': 'week_52_low',
+}
+
+# Tradier numeric fields written as int(float(x)), with the default used when missing
+INT_FIELDS = {
+    'Volume': ('volume', 0), 'Average Volume': ('average_volume', 0),
+    'Last Volume': ('last_volume', 0), 'Bid Size': ('bid_size', 0),
+    'Ask Size': ('ask_size', 0), 'Open Interest': ('open_interest', 0),
+    'Contract Size': ('contract_size', 100),
+}
+
+# Tradier string fields, written as-is with 'N/A' when the key is absent
+STRING_FIELDS = {
+    'Description': 'description', 'Exchange': 'exchange', 'Trade Date': 'trade_date',
+    'Bid Exchange': 'bid_exchange', 'Bid Date': 'bid_date', 'Ask Exchange': 'ask_exchange',
+    'Ask Date': 'ask_date', 'Expiration Type': 'expiration_type', 'Root Symbol': 'root_symbol',
+}
+
+def build_option_rows(options_data: List[Dict], symbol: str, current_price: float, vix: float,
+                      vix1d: float, expiration_date: date, current_time: str,
+                      today: Optional[date] = None, strike_tolerance: float = 0.0,
+                      strategies: Optional[List[Strategy]] = None) -> ContractTable:
+    """
+    Build the processed rows for one options chain.
+
+    Contracts that the Python engine would skip (unparseable strike, quote or numeric
+    fields) are dropped the same way. Returns an empty table when nothing is valid.
+    strike_tolerance lets wing legs snap to the nearest listed strike (see StrikeIndex),
+    and strategies selects the strategy value columns (default: DEFAULT_STRATEGIES).
+    """
+    today = today or date.today()
+    strategies = DEFAULT_STRATEGIES if strategies is None else strategies
+
+    strikes, strike_missing, strike_ok = parse_floats([o.get('strike', 0) for o in options_data])
+    strike_ok &= ~strike_missing
+
+    raw_types = [o.get('option_type', '') for o in options_data]
+    type_is_str = np.array([isinstance(t, str) for t in raw_types], dtype=bool)
+    lower_types = [t.lower() if isinstance(t, str) else '' for t in raw_types]
+    is_call = np.array([t == 'call' for t in lower_types], dtype=bool)
+    is_put = np.array([t == 'put' for t in lower_types], dtype=bool)
+
+    bid, bid_missing, bid_ok = parse_floats([o.get('bid') for o in options_data])
+    ask, ask_missing, ask_ok = parse_floats([o.get('ask') for o in options_data])
+
+    has_quote = (bid > 0) | (ask > 0)
+    mid = np.where(has_quote, round2((bid + ask) / 2), 0.0)
+    width = np.where(has_quote, round2(ask - bid), 0.0)
+
+    # Contracts the first pass of the Python engine would have put in option_buffer
+    buffered = strike_ok & type_is_str & bid_ok & ask_ok
+
+    atm_strike = None
+    with np.errstate(invalid='ignore'):
+        distance = np.abs(strikes - current_price)
+    distance = np.where(buffered & ~np.isnan(distance), distance, np.inf)
+    if len(distance) and np.isfinite(distance.min()):
+        atm_strike = strikes[int(np.argmin(distance))]
+
+    strike_index = StrikeIndex.from_arrays(strikes, mid, has_quote,
+                                           {'call': buffered & is_call, 'put': buffered & is_put},
+                                           strike_tolerance)
+
+    # Contracts the second pass would turn into rows
+    row_ok = strike_ok & bid_ok & ask_ok & type_is_str
+    row_ok &= np.array(['option_type' in o for o in options_data], dtype=bool)
+
+    rounded = {}
+    for column, field in ROUNDED_FIELDS.items():
+        values, missing, valid = parse_floats([o.get(field) for o in options_data])
+        row_ok &= valid
+        rounded[column] = (values, missing)
+
+    integers = {}
+    for column, (field, default) in INT_FIELDS.items():
+        values, _, valid = parse_floats([o.get(field) for o in options_data], default)
+        valid &= np.isfinite(values)
+        row_ok &= valid
+        integers[column] = np.where(valid, values, 0).astype(np.int64)
+
+    greek_source = [o.get('greeks') or {} for o in options_data]
+    greeks = {}
+    greeks_bad = np.zeros(len(options_data), dtype=bool)
+    for column, field in GREEK_FIELDS:
+        values, missing, valid = parse_floats([g.get(field, 0) for g in greek_source])
+        greeks_bad |= missing | ~valid
+        greeks[column] = values
+    mid_iv, iv_missing, iv_valid = parse_floats([g.get('mid_iv') for g in greek_source])
+    mid_iv = np.where(iv_missing | ~iv_valid, 0.0, mid_iv)
+
+    rows = np.flatnonzero(row_ok)
+    if len(rows) == 0:
+        return ContractTable({})
+
+    row_strikes = strikes[rows]
+    center_call, has_center_call, quoted_center_call = strike_index.lookup('call', row_strikes, 0)
+    center_put, has_center_put, quoted_center_put = strike_index.lookup('put', row_strikes, 0)
+    has_center = has_center_call & has_center_put
+    quoted_center = quoted_center_call | quoted_center_put
+
+    # The straddle is 0.00 when a leg is missing, and int 0 when both legs are unquoted
+    straddle = with_int_zero(np.where(has_center, round2(center_call + center_put), 0.0),
+                             ~has_center | quoted_center)
+
+    strategy_columns = compute_strategy_columns(strike_index, row_strikes, strategies)
+
+    row_bid, row_ask = bid[rows], ask[rows]
+    row_mid, row_quoted = mid[rows], has_quote[rows]
+
+    # Intrinsic value comes out as int 0 unless positive, extrinsic likewise
+    row_calls = is_call[rows]
+    intrinsic = np.where(row_calls, current_price - row_strikes, row_strikes - current_price)
+    intrinsic_positive = intrinsic > 0
+    intrinsic = np.where(intrinsic_positive, intrinsic, 0.0)
+    extrinsic = row_mid - intrinsic
+    extrinsic_positive = extrinsic > 0
+
+    def pick(values):
+        return [values[i] for i in rows]
+
+    count = len(rows)
+    columns = {
+        'Time': [current_time] * count,
+        'Symbol': [symbol] * count,
+        'Price': [round(current_price, 2)] * count,
+        'VIX': [round(vix, 2)] * count,
+        'VIX1D': [round(vix1d, 2)] * count,
+        'Option': pick([o.get('symbol', 'N/A') for o in options_data]),
+        'Type': pick([o.get('option_type', 'N/A') for o in options_data]),
+        'Strike Price': round2(row_strikes).tolist(),
+        'Bid': with_int_zero(round2(row_bid), ~bid_missing[rows]),
+        'Ask': with_int_zero(round2(row_ask), ~ask_missing[rows]),
+        'Mid': with_int_zero(row_mid, row_quoted),
+        'Width': with_int_zero(width[rows], row_quoted),
+        'Expiration': [expiration_date.strftime('%Y-%m-%d')] * count,
+        'DTE': [(expiration_date - today).days] * count,
+        'Straddle Value': straddle,
+        'ATM': [0] * count if atm_strike is None
+               else (row_strikes == atm_strike).astype(int).tolist(),
+        'Intrinsic Value': with_int_zero(round2(intrinsic), intrinsic_positive),
+        'Extrinsic Value': with_int_zero(round2(extrinsic), extrinsic_positive),
+    }
+    columns.update(strategy_columns)
+
+    bad = greeks_bad[rows]
+    for column, _ in GREEK_FIELDS:
+        columns[column] = np.where(bad, 0.0, round2(greeks[column][rows])).tolist()
+    columns['IV'] = mid_iv[rows].tolist()
+    for column, (values, missing) in rounded.items():
+        columns[column] = with_int_zero(round2(values[rows]), ~missing[rows])
+    for column, values in integers.items():
+        columns[column] = values[rows].tolist()
+    for column, field in STRING_FIELDS.items():
+        columns[column] = pick([o.get(field, 'N/A') for o in options_data])
+
+    keys = ROW_HEAD + list(strategy_columns) + ROW_TAIL
+    return ContractTable({key: columns[key] for key in keys})